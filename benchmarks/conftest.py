@@ -0,0 +1,13 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def event_loop_runner():
+    """Run coroutines on one long-lived loop so loop setup is not measured."""
+    loop = asyncio.new_event_loop()
+    try:
+        yield loop.run_until_complete
+    finally:
+        loop.close()
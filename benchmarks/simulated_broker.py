@@ -0,0 +1,218 @@
+"""In-process stand-in for the router's MQTT broker and USP Agent.
+
+Replaces ``aiomqtt.Client`` so the full client stack (serial fetch, connect,
+subscribe, publish, response wait, decode) can be benchmarked without a
+network.  Latency is modelled in round trips: ``connect`` costs two (TLS +
+MQTT CONNECT), ``subscribe`` and QoS 1 publishes cost one each, and the
+Agent answers a Get one round trip after it is published.
+"""
+
+import asyncio
+from unittest.mock import patch
+
+from ee_smarthub.proto.usp import (
+    Body,
+    GetResp,
+    GetRespRequestedPathResult,
+    GetRespResolvedPathResult,
+    Header,
+    HeaderMsgType,
+    Msg,
+    Response,
+)
+from ee_smarthub.proto.usp_record import (
+    NoSessionContextRecord,
+    Record,
+    RecordPayloadSecurity,
+)
+
+SERIAL = "CP2231BENCH"
+
+_PATCH_TARGET = "ee_smarthub._mqtt.aiomqtt.Client"
+
+
+def host_params(index: int) -> tuple[dict[str, str], dict[str, str]]:
+    """Return (host, WANStats) parameter maps for a realistic host entry."""
+    radio = (index % 3) + 1
+    host = {
+        "PhysAddress": f"AA:BB:CC:{index >> 16 & 0xFF:02X}:{index >> 8 & 0xFF:02X}:{index & 0xFF:02X}",
+        "IPAddress": f"192.168.{index >> 8 & 0xFF}.{index & 0xFF}",
+        "HostName": f"device-{index}",
+        "X_BT-COM_UserHostName": f"Device {index}" if index % 2 else "",
+        "Active": "1" if index % 4 else "0",
+        "InterfaceType": "Wi-Fi" if radio != 3 else "Ethernet",
+        "Layer1Interface": f"Device.WiFi.Radio.{radio}.Interface",
+    }
+    stats = {"BytesSent": str(index * 1024), "BytesReceived": str(index * 2048)}
+    return host, stats
+
+
+def build_get_resp_body(n_hosts: int) -> Body:
+    """Build a GetResp body listing ``n_hosts`` hosts with WANStats sub-paths."""
+    resolved = []
+    for i in range(1, n_hosts + 1):
+        host, stats = host_params(i)
+        resolved.append(
+            GetRespResolvedPathResult(
+                resolved_path=f"Device.Hosts.Host.{i}.", result_params=host
+            )
+        )
+        resolved.append(
+            GetRespResolvedPathResult(
+                resolved_path=f"Device.Hosts.Host.{i}.WANStats.", result_params=stats
+            )
+        )
+    get_resp = GetResp(
+        req_path_results=[
+            GetRespRequestedPathResult(
+                requested_path="Device.Hosts.Host.",
+                err_code=0,
+                resolved_path_results=resolved,
+            )
+        ]
+    )
+    return Body(response=Response(get_resp=get_resp))
+
+
+def wrap_msg(msg_bytes: bytes) -> bytes:
+    """Frame an encoded Msg in a plaintext NoSessionContext Record."""
+    record = Record(
+        version="1.4",
+        to_id="usp-gui-admin",
+        from_id="os::012345-" + SERIAL,
+        payload_security=RecordPayloadSecurity.PLAINTEXT,
+        no_session_context=NoSessionContextRecord(payload=msg_bytes),
+    )
+    return bytes(record)
+
+
+def build_get_response(n_hosts: int, msg_id: str = "bench") -> bytes:
+    """Build a complete Record-framed GetResp for ``n_hosts`` hosts."""
+    header = Header(msg_id=msg_id, msg_type=HeaderMsgType.GET_RESP)
+    msg = Msg(header=header, body=build_get_resp_body(n_hosts))
+    return wrap_msg(bytes(msg))
+
+
+class _Message:
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic: str, payload: bytes) -> None:
+        self.topic = topic
+        self.payload = payload
+
+
+class SimulatedBroker:
+    """Answers every USP Get with a pre-encoded GetResp of ``n_hosts`` hosts.
+
+    The response body is encoded once; only the header (carrying the
+    request's msg_id) is re-encoded per request, so the simulated Agent
+    adds as little CPU time as possible to the measurements.
+    """
+
+    def __init__(self, n_hosts: int = 100, *, rtt: float = 0.0) -> None:
+        self.rtt = rtt
+        self.publish_count = 0
+        self.connect_count = 0
+        self._body_bytes = bytes(Msg(body=build_get_resp_body(n_hosts)))
+
+    def respond(self, request: bytes) -> bytes | None:
+        record = Record().parse(request)
+        if record.no_session_context is None:
+            return None  # MqttConnectRecord and friends need no reply
+        msg = Msg().parse(record.no_session_context.payload)
+        header = Msg(
+            header=Header(msg_id=msg.header.msg_id, msg_type=HeaderMsgType.GET_RESP)
+        )
+        # Concatenating encoded fields is equivalent to encoding the merged Msg.
+        return wrap_msg(bytes(header) + self._body_bytes)
+
+    def client_factory(self, **kwargs) -> "SimulatedClient":
+        return SimulatedClient(self)
+
+    def patch(self):
+        """Patch ``aiomqtt.Client`` in the transport to use this broker."""
+        return patch(_PATCH_TARGET, side_effect=self.client_factory)
+
+
+class SimulatedClient:
+    """Minimal ``aiomqtt.Client`` look-alike bound to a SimulatedBroker."""
+
+    def __init__(self, broker: SimulatedBroker) -> None:
+        self._broker = broker
+        self._queue: asyncio.Queue[_Message] = asyncio.Queue()
+        self._topics: list[str] = []
+        self.messages = self._iter_messages()
+
+    async def _round_trips(self, count: int) -> None:
+        if self._broker.rtt:
+            await asyncio.sleep(self._broker.rtt * count)
+
+    async def __aenter__(self) -> "SimulatedClient":
+        self._broker.connect_count += 1
+        await self._round_trips(2)
+        return self
+
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+
+    async def subscribe(self, topic: str, qos: int = 0, **kwargs) -> None:
+        self._topics.append(topic)
+        await self._round_trips(1)
+
+    async def unsubscribe(self, topic: str, **kwargs) -> None:
+        await self._round_trips(1)
+
+    async def publish(
+        self, topic: str, payload: bytes = b"", qos: int = 0, **kwargs
+    ) -> None:
+        self._broker.publish_count += 1
+        response = self._broker.respond(payload)
+        if response is not None:
+            self._deliver(response)
+        if qos > 0:
+            await self._round_trips(1)
+
+    def _deliver(self, payload: bytes) -> None:
+        message = _Message(self._topics[-1] if self._topics else "", payload)
+        if self._broker.rtt:
+            asyncio.get_running_loop().call_later(
+                self._broker.rtt, self._queue.put_nowait, message
+            )
+        else:
+            self._queue.put_nowait(message)
+
+    async def _iter_messages(self):
+        while True:
+            yield await self._queue.get()
+
+
+class FakeSession:
+    """Stand-in for ``aiohttp.ClientSession`` serving ``config.json``."""
+
+    def __init__(self, serial: str = SERIAL, *, rtt: float = 0.0) -> None:
+        self._serial = serial
+        self._rtt = rtt
+
+    def get(self, url: str, **kwargs) -> "_FakeResponse":
+        return _FakeResponse({"SerialNumber": self._serial}, self._rtt)
+
+
+class _FakeResponse:
+    def __init__(self, data: dict, rtt: float) -> None:
+        self._data = data
+        self._rtt = rtt
+
+    async def __aenter__(self) -> "_FakeResponse":
+        if self._rtt:
+            # TCP + TLS handshake + request
+            await asyncio.sleep(self._rtt * 3)
+        return self
+
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+
+    def raise_for_status(self) -> None:
+        pass
+
+    async def json(self, content_type=None) -> dict:
+        return self._data
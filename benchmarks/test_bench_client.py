@@ -0,0 +1,81 @@
+"""End-to-end benchmarks of SmartHubClient against a simulated broker."""
+
+import asyncio
+
+import pytest
+from simulated_broker import FakeSession, SimulatedBroker
+
+from ee_smarthub import SmartHubClient
+
+FLEET_SIZE = 50
+FLEET_CONCURRENCY = 10
+
+
+@pytest.mark.parametrize("n_hosts", [10, 100, 1_000])
+def test_get_hosts(benchmark, event_loop_runner, n_hosts):
+    broker = SimulatedBroker(n_hosts)
+    session = FakeSession()
+
+    async def poll():
+        client = SmartHubClient("192.168.1.1", "secret", session)
+        return await client.get_hosts()
+
+    with broker.patch():
+        hosts = benchmark(lambda: event_loop_runner(poll()))
+    assert len(hosts) == n_hosts
+
+
+def test_fleet_polling(benchmark, event_loop_runner):
+    """Poll a fleet of routers with bounded concurrency, as a collector would."""
+    broker = SimulatedBroker(50)
+    session = FakeSession()
+    clients = [
+        SmartHubClient(f"10.0.{i >> 8}.{i & 0xFF}", "secret", session)
+        for i in range(FLEET_SIZE)
+    ]
+
+    async def poll_fleet():
+        slots = asyncio.Semaphore(FLEET_CONCURRENCY)
+
+        async def poll(client):
+            async with slots:
+                return await client.get_hosts()
+
+        return await asyncio.gather(*(poll(c) for c in clients))
+
+    with broker.patch():
+        results = benchmark(lambda: event_loop_runner(poll_fleet()))
+    benchmark.extra_info["routers_per_round"] = FLEET_SIZE
+    assert len(results) == FLEET_SIZE
+
+
+@pytest.mark.parametrize("read_qos", [1, 0])
+def test_get_hosts_qos(benchmark, event_loop_runner, read_qos):
+    """Short-lived get_hosts() over a LAN-like link: QoS 0 skips the PUBACK waits."""
+    broker = SimulatedBroker(100, rtt=0.002)
+    session = FakeSession()
+
+    async def poll():
+        client = SmartHubClient("192.168.1.1", "secret", session, read_qos=read_qos)
+        return await client.get_hosts()
+
+    with broker.patch():
+        hosts = benchmark(lambda: event_loop_runner(poll()))
+    benchmark.extra_info["rtt_ms"] = broker.rtt * 1000
+    assert len(hosts) == 100
+
+
+@pytest.mark.parametrize("read_qos", [1, 0])
+def test_persistent_get_hosts_qos(benchmark, event_loop_runner, read_qos):
+    """get_hosts() on a persistent connection, where only the request publish remains."""
+    broker = SimulatedBroker(100, rtt=0.002)
+    client = SmartHubClient(
+        "192.168.1.1", "secret", FakeSession(), persistent=True, read_qos=read_qos
+    )
+
+    with broker.patch():
+        event_loop_runner(client.get_hosts())  # connect outside the measurement
+        hosts = benchmark(lambda: event_loop_runner(client.get_hosts()))
+        event_loop_runner(client.aclose())
+    benchmark.extra_info["rtt_ms"] = broker.rtt * 1000
+    assert len(hosts) == 100
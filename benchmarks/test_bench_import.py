@@ -0,0 +1,39 @@
+"""Cold-start import cost, as seen by CLI tools and serverless functions."""
+
+import subprocess
+import sys
+
+import pytest
+
+SCENARIOS = {
+    # What every user pays, including those who only call validate_connection().
+    "package": "import ee_smarthub",
+    # What the first get_hosts() call additionally pays for the USP codec.
+    "usp_codec": "import ee_smarthub, ee_smarthub._usp",
+}
+
+
+def _import_times(statement: str) -> dict[str, int]:
+    """Return cumulative import time in microseconds per module, via -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_import_time(benchmark, scenario):
+    statement = SCENARIOS[scenario]
+    times = benchmark.pedantic(_import_times, args=(statement,), rounds=5)
+    benchmark.extra_info["ee_smarthub_us"] = times["ee_smarthub"]
+    benchmark.extra_info["proto_loaded"] = "ee_smarthub.proto.usp" in times
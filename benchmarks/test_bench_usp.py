@@ -0,0 +1,52 @@
+"""Encode/decode benchmarks for the USP layer."""
+
+import pytest
+from simulated_broker import build_get_response, host_params
+
+from ee_smarthub._usp import (
+    _group_hosts,
+    _params_to_host,
+    build_get_request,
+    iter_get_response,
+    parse_get_response,
+)
+
+HOST_COUNTS = [10, 100, 1_000, 10_000]
+
+
+def test_build_get_request(benchmark):
+    benchmark(
+        build_get_request,
+        to_id="os::012345-CP2231BENCH",
+        from_id="usp-gui-admin",
+        path="Device.Hosts.Host.",
+    )
+
+
+@pytest.mark.parametrize("n_hosts", HOST_COUNTS)
+def test_parse_get_response(benchmark, n_hosts):
+    data = build_get_response(n_hosts)
+    benchmark.extra_info["payload_bytes"] = len(data)
+    hosts = benchmark(parse_get_response, data)
+    assert len(hosts) == n_hosts
+
+
+def test_params_to_host(benchmark):
+    host, stats = host_params(7)
+    params = {**host, **stats}
+    result = benchmark(_params_to_host, params)
+    assert result is not None
+
+
+@pytest.mark.parametrize("n_hosts", [1_000, 10_000])
+def test_group_hosts(benchmark, n_hosts):
+    """Grouping and Host construction alone, without the wire decode."""
+    results = list(iter_get_response(build_get_response(n_hosts)))
+
+    def group():
+        # Grouping keeps the first dict of each host, so work on copies.
+        grouped = _group_hosts((path, dict(params)) for path, params in results)
+        return [_params_to_host(params) for params in grouped.values()]
+
+    hosts = benchmark(group)
+    assert len(hosts) == n_hosts
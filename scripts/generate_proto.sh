@@ -4,6 +4,13 @@ set -euo pipefail
 
 SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 OUTPUT_DIR="$(cd "$SCRIPT_DIR/.." && pwd)/src/ee_smarthub/proto"
+
+# --minimal generates only the USP messages the client uses (see trim_proto.py).
+MINIMAL=0
+if [[ "${1:-}" == "--minimal" ]]; then
+    MINIMAL=1
+    shift
+fi
 VERSION="${1:-1-4}"
 
 mkdir -p "$OUTPUT_DIR"
@@ -28,6 +35,9 @@ echo "=================================================="
 echo "USP Python Code Generator"
 echo "=================================================="
 echo "USP version: $VERSION"
+if [[ "$MINIMAL" == 1 ]]; then
+    echo "Mode: minimal (client message subset)"
+fi
 echo ""
 
 cd "$TEMP_DIR"
@@ -42,6 +52,11 @@ for PROTO_FILE in "${PROTO_FILES[@]}"; do
     curl -sSf "$REPO_URL/$PROTO_FILE" -o "$PROTO_FILE"
 done
 
+if [[ "$MINIMAL" == 1 ]]; then
+    echo "Trimming usp-msg-$VERSION.proto to the client message subset..."
+    python "$SCRIPT_DIR/trim_proto.py" "usp-msg-$VERSION.proto" "usp-msg-$VERSION.proto"
+fi
+
 echo "Generating Python code from proto files..."
 python -m grpc_tools.protoc \
     -I . \
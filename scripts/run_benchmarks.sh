@@ -0,0 +1,37 @@
+#!/bin/bash
+
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+ROOT_DIR="$(cd "$SCRIPT_DIR/.." && pwd)"
+STORAGE="$ROOT_DIR/benchmarks/baselines"
+MODE="${1:-compare}"
+# Maximum allowed slowdown of the mean versus the stored baseline.
+THRESHOLD="${BENCH_THRESHOLD:-15%}"
+
+if ! python -c "import pytest_benchmark" &> /dev/null; then
+    echo "pytest-benchmark is not installed. Please install it with 'pip install pytest-benchmark'." >&2
+    exit 1
+fi
+
+cd "$ROOT_DIR"
+
+case "$MODE" in
+    save)
+        # Record a new baseline, e.g. when cutting a release.
+        python -m pytest benchmarks \
+            --benchmark-storage="file://$STORAGE" \
+            --benchmark-save=baseline
+        ;;
+    compare)
+        # Fail if any benchmark regressed beyond THRESHOLD against the latest baseline.
+        python -m pytest benchmarks \
+            --benchmark-storage="file://$STORAGE" \
+            --benchmark-compare \
+            --benchmark-compare-fail="mean:$THRESHOLD"
+        ;;
+    *)
+        echo "Usage: $0 [save|compare]" >&2
+        exit 1
+        ;;
+esac
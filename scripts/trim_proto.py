@@ -0,0 +1,173 @@
+"""Trim a USP .proto file down to the messages the client actually uses.
+
+USP ``Request``, ``Response`` and ``Body`` select their payload with a
+``oneof``, so every message type in the spec is reachable from ``Msg``.
+This script keeps the given root messages plus everything they reference
+through regular fields, and drops ``oneof`` members whose type was not kept.
+Field numbers are unchanged, so trimmed code stays wire-compatible: a
+dropped ``oneof`` member simply parses as unset.
+
+Usage:
+    python scripts/trim_proto.py <input.proto> <output.proto> [ROOT ...]
+"""
+
+import re
+import sys
+
+# Top-level messages the client sends or receives.  Keep in sync with
+# src/ee_smarthub/_usp.py when adding support for another message type.
+DEFAULT_ROOTS = (
+    "Msg",
+    "Header",
+    "Body",
+    "Request",
+    "Response",
+    "Error",
+    "Get",
+    "GetResp",
+    "Set",
+    "SetResp",
+    "Add",
+    "AddResp",
+    "Delete",
+    "DeleteResp",
+    "Operate",
+    "OperateResp",
+    "Notify",
+    "NotifyResp",
+)
+
+_DEFINITION_RE = re.compile(r"^(message|enum)\s+(\w+)\s*\{", re.MULTILINE)
+_FIELD_RE = re.compile(
+    r"^\s*(?:repeated\s+|optional\s+)?(?:map<\s*\w+\s*,\s*)?([\w.]+)\s*>?\s+\w+\s*=\s*\d+"
+)
+_ONEOF_RE = re.compile(r"^\s*oneof\s+\w+\s*\{")
+
+
+def _strip_comment(line: str) -> str:
+    return line.split("//", 1)[0]
+
+
+def _find_definitions(text: str) -> dict[str, tuple[int, int]]:
+    """Map each top-level message/enum name to its (start, end) offsets."""
+    definitions = {}
+    pos = 0
+    while match := _DEFINITION_RE.search(text, pos):
+        depth = 0
+        for i in range(match.start(), len(text)):
+            line_start = text.rfind("\n", 0, i) + 1
+            if "//" in text[line_start:i]:
+                continue  # braces inside comments
+            if text[i] == "{":
+                depth += 1
+            elif text[i] == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+        else:
+            raise ValueError(f"Unbalanced braces in definition of {match.group(2)}")
+        # Include the comment block directly above the definition.
+        start = match.start()
+        while start > 0:
+            prev_line = text.rfind("\n", 0, start - 1) + 1
+            if not text[prev_line:start].lstrip().startswith("//"):
+                break
+            start = prev_line
+        definitions[match.group(2)] = (start, i + 1)
+        pos = i + 1
+    return definitions
+
+
+def _field_references(body: str, names: set[str]) -> list[tuple[str, bool]]:
+    """Return (type name, inside oneof) for fields referencing top-level ``names``."""
+    refs = []
+    depth = 0
+    oneof_depth = None
+    for raw in body.splitlines():
+        line = _strip_comment(raw)
+        if _ONEOF_RE.match(line):
+            oneof_depth = depth + 1
+        match = _FIELD_RE.match(line)
+        if match and match.group(1) in names:
+            refs.append((match.group(1), oneof_depth == depth))
+        depth += line.count("{") - line.count("}")
+        if oneof_depth is not None and depth < oneof_depth:
+            oneof_depth = None
+    return refs
+
+
+def _prune_oneofs(body: str, kept: set[str], names: set[str]) -> str:
+    """Remove oneof members whose top-level type is not in ``kept``."""
+    lines = []
+    depth = 0
+    oneof_depth = None
+    pending_comments: list[str] = []
+    for raw in body.splitlines(keepends=True):
+        line = _strip_comment(raw)
+        if _ONEOF_RE.match(line):
+            oneof_depth = depth + 1
+        match = _FIELD_RE.match(line)
+        if (
+            match
+            and oneof_depth == depth
+            and match.group(1) in names
+            and match.group(1) not in kept
+        ):
+            pending_comments.clear()  # drop the member's doc comment too
+            continue
+        if raw.lstrip().startswith("//"):
+            pending_comments.append(raw)
+        else:
+            lines.extend(pending_comments)
+            pending_comments.clear()
+            lines.append(raw)
+        depth += line.count("{") - line.count("}")
+        if oneof_depth is not None and depth < oneof_depth:
+            oneof_depth = None
+    lines.extend(pending_comments)
+    return "".join(lines)
+
+
+def trim(text: str, roots: tuple[str, ...] = DEFAULT_ROOTS) -> str:
+    definitions = _find_definitions(text)
+    names = set(definitions)
+    missing = set(roots) - names
+    if missing:
+        raise ValueError(f"Unknown root message(s): {', '.join(sorted(missing))}")
+
+    kept = set(roots)
+    queue = list(roots)
+    while queue:
+        start, end = definitions[queue.pop()]
+        for ref, in_oneof in _field_references(text[start:end], names):
+            if ref not in kept and not in_oneof:
+                kept.add(ref)
+                queue.append(ref)
+
+    ordered = sorted(definitions.items(), key=lambda item: item[1][0])
+    preamble_end = ordered[0][1][0] if ordered else len(text)
+    parts = [text[:preamble_end].rstrip() + "\n"]
+    for name, (start, end) in ordered:
+        if name in kept:
+            parts.append("\n" + _prune_oneofs(text[start:end], kept, names) + "\n")
+    return "".join(parts)
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) < 3:
+        print(__doc__.strip(), file=sys.stderr)
+        return 1
+    roots = tuple(argv[3:]) or DEFAULT_ROOTS
+    with open(argv[1]) as f:
+        text = f.read()
+    trimmed = trim(text, roots)
+    with open(argv[2], "w") as f:
+        f.write(trimmed)
+    kept = len(_find_definitions(trimmed))
+    total = len(_find_definitions(text))
+    print(f"Kept {kept} of {total} top-level definitions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,22 +1,69 @@
-from importlib.metadata import version
-
+from .breaker import CircuitBreaker, CircuitState
 from .client import SmartHubClient
+from .datamodel import ParamTypes
+from .deadline import deadline
 from .exceptions import (
     AuthenticationError,
+    CircuitOpenError,
     CommunicationError,
+    DeadlineExceededError,
     ProtocolError,
     SmartHubError,
 )
-from .models import Host
+from .hedging import HedgePolicy
+from .metrics import MetricsRegistry
+from .models import (
+    AddResult,
+    DeleteResult,
+    Host,
+    OperationResult,
+    ParameterResult,
+)
+from .pool import SmartHubConnectionPool
+from .query import SearchPath
+from .serial_store import JsonFileSerialStore, MemorySerialStore, SerialStore
+from .snapshots import Snapshot, SnapshotReader, SnapshotWriter
+from .tracing import OpenTelemetryTracer, Span, Tracer
 
-__version__ = version("ee-smarthub")
 
 __all__ = [
+    "AddResult",
     "AuthenticationError",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "CircuitState",
     "CommunicationError",
+    "DeadlineExceededError",
+    "DeleteResult",
+    "HedgePolicy",
     "Host",
+    "JsonFileSerialStore",
+    "MemorySerialStore",
+    "MetricsRegistry",
+    "OpenTelemetryTracer",
+    "OperationResult",
+    "ParamTypes",
+    "ParameterResult",
     "ProtocolError",
+    "SearchPath",
+    "SerialStore",
     "SmartHubClient",
+    "SmartHubConnectionPool",
     "SmartHubError",
+    "Snapshot",
+    "SnapshotReader",
+    "SnapshotWriter",
+    "Span",
+    "Tracer",
     "__version__",
+    "deadline",
 ]
+
+
+def __getattr__(name: str) -> str:
+    # importlib.metadata is slow to import; only pay for it when asked.
+    if name == "__version__":
+        from importlib.metadata import version
+
+        return version("ee-smarthub")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
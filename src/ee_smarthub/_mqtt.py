@@ -4,16 +4,15 @@ import asyncio
 import logging
 import ssl
 import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager, suppress
 
 import aiomqtt
 
+from ._session import UspSession
+from ._wire import peek_header
 from .exceptions import AuthenticationError, CommunicationError, ProtocolError
-from .proto.usp_record import (
-    MqttConnectRecord,
-    MqttConnectRecordMqttVersion,
-    Record,
-    RecordPayloadSecurity,
-)
+from .tracing import Tracer, _phase
 
 CONTROLLER_ID = "usp-gui-admin"
 AGENT_ID_PREFIX = "os::012345-"
@@ -21,6 +20,13 @@ AGENT_ID_PREFIX = "os::012345-"
 _TOPIC_REQUEST = "/{serial}/usp/admin/request"
 _TOPIC_RESPONSE = "/{serial}/usp/admin/response"
 _USERNAME = "admin"
+# Bound on the DisconnectRecord and UNSUBSCRIBE sent when closing, so an
+# unresponsive broker cannot hold up shutdown.
+_CLOSE_TIMEOUT = 2.0
+# Default cap on a single response; a full host table is a few hundred KiB.
+MAX_RESPONSE_BYTES = 4 * 1024 * 1024
+# Default wait for the Agent's response when no deadline applies.
+RESPONSE_TIMEOUT = 10.0
 _WS_PATH = "/ws"
 
 logger = logging.getLogger(__name__)
@@ -35,6 +41,14 @@ def _create_insecure_ssl_context() -> ssl.SSLContext:
 
 def _build_connect_record(agent_id: str, subscribe_topic: str) -> bytes:
     """Build the USP MqttConnectRecord that tells the Agent our reply topic."""
+    # Deferred so credential checks never load the protobuf runtime.
+    from .proto.usp_record import (
+        MqttConnectRecord,
+        MqttConnectRecordMqttVersion,
+        Record,
+        RecordPayloadSecurity,
+    )
+
     mqtt_connect = MqttConnectRecord(
         version=MqttConnectRecordMqttVersion.V3_1_1,
         subscribed_topic=subscribe_topic,
@@ -49,28 +63,48 @@ def _build_connect_record(agent_id: str, subscribe_topic: str) -> bytes:
     return bytes(record)
 
 
-async def test_credentials(hostname: str, password: str) -> None:
-    """Connect and immediately disconnect to verify the router is reachable and password is correct.
+def _build_disconnect_record(agent_id: str, reason: str) -> bytes:
+    """Build the USP DisconnectRecord telling the Agent we are going away."""
+    from .proto.usp_record import DisconnectRecord, Record, RecordPayloadSecurity
 
-    Raises AuthenticationError on bad credentials, CommunicationError on network failure.
-    """
-    ssl_ctx = _create_insecure_ssl_context()
+    record = Record(
+        version="1.4",
+        to_id=agent_id,
+        from_id=CONTROLLER_ID,
+        payload_security=RecordPayloadSecurity.PLAINTEXT,
+        disconnect=DisconnectRecord(reason=reason),
+    )
+    return bytes(record)
+
+
+def _create_client(hostname: str, password: str) -> aiomqtt.Client:
     client_id = f"ee-smarthub-{uuid.uuid4().hex[:8]}"
+    logger.debug(f"Creating MQTT client for {hostname} (client_id={client_id})")
+    return aiomqtt.Client(
+        hostname=hostname,
+        port=443,
+        username=_USERNAME,
+        password=password,
+        identifier=client_id,
+        transport="websockets",
+        tls_context=_create_insecure_ssl_context(),
+        websocket_path=_WS_PATH,
+    )
 
-    logger.debug(f"Testing credentials for {hostname} (client_id={client_id})")
+
+@contextmanager
+def _translate_errors(*, connecting: bool = False) -> Iterator[None]:
+    """Raise aiomqtt errors as CommunicationError.
+
+    Only around the CONNECT handshake (``connecting``) does an error code
+    mean the router refused our credentials; elsewhere it is a transport
+    failure, e.g. publishing after the link dropped.
+    """
     try:
-        async with aiomqtt.Client(
-            hostname=hostname,
-            port=443,
-            username=_USERNAME,
-            password=password,
-            identifier=client_id,
-            transport="websockets",
-            tls_context=ssl_ctx,
-            websocket_path=_WS_PATH,
-        ):
-            pass  # successful connect + auto-disconnect proves credentials
+        yield
     except aiomqtt.MqttCodeError as exc:
+        if not connecting:
+            raise CommunicationError(f"MQTT communication failed: {exc}") from exc
         raise AuthenticationError(
             f"Router rejected MQTT connection: {exc}"
         ) from exc
@@ -78,57 +112,408 @@ async def test_credentials(hostname: str, password: str) -> None:
         raise CommunicationError(f"MQTT communication failed: {exc}") from exc
 
 
-async def send_request(
-    hostname: str,
-    password: str,
+async def _pipeline(*calls: Awaitable[object]) -> None:
+    """Issue MQTT calls back to back, then wait for all of their acks.
+
+    aiomqtt writes each packet before its first await, and tasks first run
+    in the order they were created, so the packets go out in the order
+    given without waiting for each other's acknowledgements.  MQTT keeps
+    them in order, so a SUBSCRIBE still takes effect before a later PUBLISH.
+    Each call must write its packet when first run, so must not itself
+    start further tasks.
+    """
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # retrieved, so asyncio does not log it
+
+
+async def _traced(tracer: Tracer | None, name: str, call: Awaitable[object]) -> None:
+    with _phase(tracer, name):
+        await call
+
+
+async def _resend(publish: Callable[[], Awaitable[None]], interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        logger.debug(f"No USP response after {interval:.1f}s, re-sending request")
+        try:
+            await publish()
+        except aiomqtt.MqttError as exc:
+            logger.debug(f"Could not re-send USP request: {exc}")
+            return
+
+
+@asynccontextmanager
+async def _resending(
+    publish: Callable[[], Awaitable[None]], interval: float | None
+) -> AsyncIterator[None]:
+    """Re-publish a request every ``interval`` seconds until the block exits.
+
+    With QoS 0 the broker does not redeliver a lost publish, so an
+    unanswered request is retried at the USP level instead.  The Agent
+    answers each copy with the same msg_id; extra answers are ignored.
+    """
+    if interval is None:
+        yield
+        return
+    task = asyncio.create_task(_resend(publish, interval))
+    try:
+        yield
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+@asynccontextmanager
+async def connect(
+    hostname: str, password: str, *, tracer: Tracer | None = None
+) -> AsyncIterator[aiomqtt.Client]:
+    """Open an authenticated MQTT-over-WebSocket connection to the router.
+
+    Raises AuthenticationError on bad credentials, CommunicationError on network failure.
+    """
+    with _translate_errors():
+        async with AsyncExitStack() as stack:
+            with _translate_errors(connecting=True), _phase(tracer, "mqtt.connect"):
+                client = await stack.enter_async_context(
+                    _create_client(hostname, password)
+                )
+            yield client
+
+
+async def test_credentials(
+    hostname: str, password: str, *, tracer: Tracer | None = None
+) -> None:
+    """Connect and immediately disconnect to verify the router is reachable and password is correct.
+
+    Raises AuthenticationError on bad credentials, CommunicationError on network failure.
+    """
+    logger.debug(f"Testing credentials for {hostname}")
+    async with connect(hostname, password, tracer=tracer):
+        pass  # successful connect + auto-disconnect proves credentials
+
+
+async def exchange(
+    client: aiomqtt.Client,
     serial: str,
     request_payload: bytes,
     *,
-    timeout: float = 10.0,
+    timeout: float | None = RESPONSE_TIMEOUT,
+    tracer: Tracer | None = None,
+    max_response_bytes: int | None = MAX_RESPONSE_BYTES,
+    qos: int = 1,
+    retry_interval: float | None = None,
 ) -> bytes:
-    """Send a USP request over MQTT-over-WebSocket and return the raw response.
+    """Send a USP request on a connected client and return the raw response.
 
-    Raises CommunicationError, AuthenticationError, or ProtocolError on failure.
+    Waits up to ``timeout`` seconds for the response (None to wait until
+    cancelled).  Raises CommunicationError or ProtocolError on failure,
+    including a response larger than ``max_response_bytes`` (None for no
+    limit).
+
+    The subscription and publishes use MQTT ``qos``.  With
+    ``retry_interval``, the request is re-published whenever that many
+    seconds pass without a response.
     """
-    ssl_ctx = _create_insecure_ssl_context()
-    client_id = f"ee-smarthub-{uuid.uuid4().hex[:8]}"
     agent_id = AGENT_ID_PREFIX + serial
     topic_request = _TOPIC_REQUEST.format(serial=serial)
     topic_response = _TOPIC_RESPONSE.format(serial=serial)
 
-    logger.debug(f"Sending USP request to {hostname} (client_id={client_id}, timeout={timeout:.1f}s)")
+    logger.debug(f"Sending USP request to {agent_id} (timeout={timeout}s)")
     try:
-        async with aiomqtt.Client(
-            hostname=hostname,
-            port=443,
-            username=_USERNAME,
-            password=password,
-            identifier=client_id,
-            transport="websockets",
-            tls_context=ssl_ctx,
-            websocket_path=_WS_PATH,
-        ) as client:
-            await client.subscribe(topic_response, qos=1)
-            logger.debug(f"Subscribed to {topic_response}")
+        with _translate_errors():
 
-            connect_record = _build_connect_record(agent_id, topic_response)
-            await client.publish(topic_request, payload=connect_record, qos=1)
-
-            await client.publish(topic_request, payload=request_payload, qos=1)
-            logger.debug(f"Published request to {topic_request}")
+            async def publish_request() -> None:
+                await client.publish(topic_request, payload=request_payload, qos=qos)
 
-            async with asyncio.timeout(timeout):
-                async for message in client.messages:
-                    logger.debug(f"Received response ({len(message.payload)} bytes)")
-                    return message.payload
+            connect_record = _build_connect_record(agent_id, topic_response)
+            # One round trip for all three, rather than one each.
+            with _phase(tracer, "mqtt.publish", request_bytes=len(request_payload)):
+                await _pipeline(
+                    _traced(
+                        tracer, "mqtt.subscribe", client.subscribe(topic_response, qos=qos)
+                    ),
+                    client.publish(topic_request, payload=connect_record, qos=qos),
+                    publish_request(),
+                )
+            logger.debug(f"Subscribed to {topic_response}, published request to {topic_request}")
 
-    except aiomqtt.MqttCodeError as exc:
-        raise AuthenticationError(
-            f"Router rejected MQTT connection: {exc}"
-        ) from exc
-    except aiomqtt.MqttError as exc:
-        raise CommunicationError(f"MQTT communication failed: {exc}") from exc
+            session = UspSession(max_payload_bytes=max_response_bytes)
+            with _phase(tracer, "usp.wait") as attributes:
+                async with (
+                    asyncio.timeout(timeout),
+                    _resending(publish_request, retry_interval),
+                ):
+                    async for message in client.messages:
+                        responses, replies = session.receive(message.payload)
+                        for reply in replies:
+                            await client.publish(topic_request, payload=reply, qos=qos)
+                        if responses:
+                            response = responses[0]
+                            attributes["response_bytes"] = len(response)
+                            logger.debug(f"Received response ({len(response)} bytes)")
+                            return response
     except TimeoutError as exc:
         raise CommunicationError("Timed out waiting for USP response") from exc
 
     raise ProtocolError("No response received from router")
+
+
+async def send_request(
+    hostname: str,
+    password: str,
+    serial: str,
+    request_payload: bytes,
+    *,
+    timeout: float | None = RESPONSE_TIMEOUT,
+    tracer: Tracer | None = None,
+    max_response_bytes: int | None = MAX_RESPONSE_BYTES,
+    qos: int = 1,
+    retry_interval: float | None = None,
+) -> bytes:
+    """Send a USP request over MQTT-over-WebSocket and return the raw response.
+
+    Opens a connection for this request only and closes it afterwards.
+    Raises CommunicationError, AuthenticationError, or ProtocolError on failure.
+    """
+    async with connect(hostname, password, tracer=tracer) as client:
+        return await exchange(
+            client,
+            serial,
+            request_payload,
+            timeout=timeout,
+            tracer=tracer,
+            max_response_bytes=max_response_bytes,
+            qos=qos,
+            retry_interval=retry_interval,
+        )
+
+
+class UspConnection:
+    """A long-lived MQTT connection to the router's USP Agent.
+
+    Responses are routed to the waiting request by USP msg_id, so several
+    requests may be in flight at once.  Messages that answer no pending
+    request (e.g. Notify requests from the Agent) are passed to
+    ``on_message``.  A response larger than ``max_response_bytes`` fails
+    the request waiting for it with ProtocolError.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        password: str,
+        *,
+        tracer: Tracer | None = None,
+        on_message: Callable[[bytes], None] | None = None,
+        max_response_bytes: int | None = MAX_RESPONSE_BYTES,
+    ) -> None:
+        self.hostname = hostname
+        self.serial: str | None = None
+        self._password = password
+        self._tracer = tracer
+        self._on_message = on_message
+        self._stack = AsyncExitStack()
+        self._client: aiomqtt.Client | None = None
+        self._reader: asyncio.Task | None = None
+        self._pending: dict[str, asyncio.Future[bytes]] = {}
+        self._session = UspSession(max_payload_bytes=max_response_bytes)
+        self._topic_request = ""
+        self._topic_response = ""
+        self._closed = asyncio.get_running_loop().create_future()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.done()
+
+    async def wait_closed(self) -> None:
+        """Wait until the connection has been closed or lost."""
+        await asyncio.shield(self._closed)
+
+    async def connect(self) -> None:
+        """Open the MQTT connection.  The Agent is not addressed until start()."""
+        with _translate_errors(connecting=True):
+            with _phase(self._tracer, "mqtt.connect"):
+                self._client = await self._stack.enter_async_context(
+                    _create_client(self.hostname, self._password)
+                )
+
+    async def start(self, serial: str) -> None:
+        """Subscribe to the Agent's response topic and announce it."""
+        assert self._client is not None, "connect() must be called first"
+        agent_id = AGENT_ID_PREFIX + serial
+        self._topic_request = _TOPIC_REQUEST.format(serial=serial)
+        self._topic_response = topic_response = _TOPIC_RESPONSE.format(serial=serial)
+
+        connect_record = _build_connect_record(agent_id, topic_response)
+        with _translate_errors():
+            await _pipeline(
+                _traced(
+                    self._tracer,
+                    "mqtt.subscribe",
+                    self._client.subscribe(topic_response, qos=1),
+                ),
+                self._client.publish(self._topic_request, payload=connect_record, qos=1),
+            )
+            logger.debug(f"Subscribed to {topic_response}")
+        self.serial = serial
+        self._reader = asyncio.create_task(self._read())
+
+    async def open(self, serial: str) -> None:
+        """Connect and start in one step."""
+        await self.connect()
+        await self.start(serial)
+
+    async def publish(self, payload: bytes, *, qos: int = 1) -> None:
+        """Publish a Record to the Agent without waiting for a response."""
+        if self.closed or self._client is None:
+            raise CommunicationError("USP connection is closed")
+        with _translate_errors():
+            await self._client.publish(self._topic_request, payload=payload, qos=qos)
+
+    async def request(
+        self,
+        payload: bytes,
+        *,
+        timeout: float | None = RESPONSE_TIMEOUT,
+        qos: int = 1,
+        retry_interval: float | None = None,
+    ) -> bytes:
+        """Publish a Record-framed USP request and return the matching response.
+
+        Waits up to ``timeout`` seconds for the response (None to wait until
+        cancelled).  Raises CommunicationError on timeout or if the
+        connection is lost.  The request is published with MQTT ``qos`` and,
+        with ``retry_interval``, re-published whenever that many seconds
+        pass without a response.  Raises ValueError if the Msg's msg_id is
+        empty or already in use by a pending request.
+        """
+        header = peek_header(payload)
+        if header is None:
+            raise ValueError("Request payload is not a NoSessionContext USP Record")
+        msg_id = header[0]
+        # Responses are matched by msg_id, so it must identify this request.
+        if not msg_id:
+            raise ValueError("Request Msg has no msg_id")
+        if msg_id in self._pending:
+            raise ValueError(f"A request with msg_id {msg_id!r} is already pending")
+        future = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = future
+        try:
+            with _phase(self._tracer, "mqtt.publish", request_bytes=len(payload)):
+                await self.publish(payload, qos=qos)
+            with _phase(self._tracer, "usp.wait") as attributes:
+                async with (
+                    asyncio.timeout(timeout),
+                    _resending(
+                        lambda: self._client.publish(
+                            self._topic_request, payload=payload, qos=qos
+                        ),
+                        retry_interval,
+                    ),
+                ):
+                    response = await future
+                attributes["response_bytes"] = len(response)
+            return response
+        except TimeoutError as exc:
+            raise CommunicationError("Timed out waiting for USP response") from exc
+        finally:
+            self._pending.pop(msg_id, None)
+
+    async def _read(self) -> None:
+        error = CommunicationError("USP connection closed")
+        try:
+            async for message in self._client.messages:
+                data = bytes(message.payload)
+                try:
+                    payloads, replies = self._session.receive(data)
+                except ProtocolError as exc:
+                    logger.warning(f"Dropping message from {self.hostname}: {exc}")
+                    self._reject(data, exc)
+                    continue
+                for reply in replies:
+                    await self._client.publish(self._topic_request, payload=reply, qos=1)
+                for payload in payloads:
+                    self._dispatch(payload)
+        except aiomqtt.MqttError as exc:
+            error = CommunicationError(f"MQTT communication failed: {exc}")
+            logger.debug(f"USP connection to {self.hostname} lost: {exc}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            if not self._closed.done():
+                self._closed.set_result(None)
+
+    def _reject(self, data: bytes, error: ProtocolError) -> None:
+        """Fail the request a rejected Record answers, if it can be identified.
+
+        A segmented response is identified by the header in its first
+        segment; failing that, the only request waiting is assumed to be
+        the one answered.
+        """
+        msg_id = self._session.rejected_msg_id
+        if msg_id is None:
+            header = peek_header(data)
+            msg_id = header[0] if header else None
+        if msg_id is not None:
+            future = self._pending.get(msg_id)
+        elif len(self._pending) == 1:
+            [future] = self._pending.values()
+        else:
+            future = None
+        if future is not None and not future.done():
+            future.set_exception(error)
+
+    def _dispatch(self, payload: bytes) -> None:
+        """Route a complete Record to its pending request or ``on_message``."""
+        header = peek_header(payload)
+        future = self._pending.get(header[0]) if header else None
+        if future is not None and not future.done():
+            future.set_result(payload)
+        elif self._on_message is not None:
+            try:
+                self._on_message(payload)
+            except Exception:
+                logger.exception("Unhandled error processing USP message")
+        else:
+            logger.debug(f"Dropping unsolicited message ({len(payload)} bytes)")
+
+    async def close(self) -> None:
+        """Close the connection, failing any requests still waiting.
+
+        If the Agent was addressed and the connection is still up, it is
+        sent a DisconnectRecord and the response topic is unsubscribed
+        before the MQTT DISCONNECT, so the router can release the session.
+        """
+        was_open = not self._closed.done()
+        if self._reader is not None:
+            self._reader.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reader
+        if not self._closed.done():
+            self._closed.set_result(None)
+        if was_open and self.serial is not None:
+            await self._say_goodbye()
+        try:
+            await self._stack.aclose()
+        except aiomqtt.MqttError as exc:
+            logger.debug(f"Error closing USP connection to {self.hostname}: {exc}")
+
+    async def _say_goodbye(self) -> None:
+        disconnect = _build_disconnect_record(
+            AGENT_ID_PREFIX + self.serial, "Controller closing connection"
+        )
+        try:
+            async with asyncio.timeout(_CLOSE_TIMEOUT):
+                await self._client.publish(self._topic_request, payload=disconnect, qos=1)
+                await self._client.unsubscribe(self._topic_response)
+        except (aiomqtt.MqttError, TimeoutError) as exc:
+            logger.debug(f"Could not disconnect cleanly from {self.hostname}: {exc!r}")
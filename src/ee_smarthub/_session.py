@@ -0,0 +1,229 @@
+"""USP session context handling for Records received from the Agent.
+
+Most responses arrive in NoSessionContext Records and pass straight
+through.  An Agent may instead use a SessionContext, in which Records are
+numbered and a large Msg may be segmented across several of them (SAR).
+``UspSession`` puts such Records back in order, reassembles segmented
+payloads and hands each complete Msg on re-framed as a NoSessionContext
+Record, so the rest of the client only ever sees one kind of Record.
+"""
+
+import logging
+
+from ._wire import get_message, msg_header
+from .exceptions import ProtocolError
+
+_RECORD_SESSION_CONTEXT = 8
+
+# Records received ahead of a gap in the sequence, kept until it is filled.
+_MAX_EARLY_RECORDS = 32
+# Records we sent, kept so they can be retransmitted on request.
+_MAX_SENT_RECORDS = 16
+
+logger = logging.getLogger(__name__)
+
+
+class UspSession:
+    """Receive side of a USP session context with one Agent.
+
+    Feed each Record received from the Agent to :meth:`receive`.  Records
+    are delivered in ``sequence_id`` order; when one is missing, a Record
+    asking the Agent to retransmit it is returned for the caller to publish,
+    and later Records are held back until it arrives.
+
+    Records, and reassembled payloads, larger than ``max_payload_bytes`` are
+    rejected with ProtocolError before they are decoded or buffered further.
+    The rest of a rejected segmented payload is discarded as it arrives, and
+    ``rejected_msg_id`` names the Msg it carried, when its header could be
+    read from the first segment.
+    """
+
+    def __init__(self, *, max_payload_bytes: int | None = None) -> None:
+        self.session_id: int | None = None
+        self._max_payload_bytes = max_payload_bytes
+        self._expected_id = 0
+        self._sequence_id = 0
+        self._early: dict[int, object] = {}
+        self._segments: list[bytes] = []
+        self._segment_bytes = 0
+        self._segment_msg_id: str | None = None
+        self._discarding = False
+        self.rejected_msg_id: str | None = None
+        self._sent: dict[int, bytes] = {}
+        self._retransmit_requested: int | None = None
+
+    def receive(self, data: bytes) -> tuple[list[bytes], list[bytes]]:
+        """Process one Record from the Agent.
+
+        Returns (messages, replies): Records carrying complete Msgs, ready
+        for ``_usp`` to parse, and Records to publish back to the Agent.
+        Raises ProtocolError if the Record cannot be decoded or is too large.
+        """
+        self.rejected_msg_id = None
+        self._check_size(len(data))
+        try:
+            in_session = get_message(data, _RECORD_SESSION_CONTEXT) is not None
+        except ValueError as exc:
+            raise ProtocolError(f"Malformed USP Record: {exc}") from exc
+        if not in_session:
+            return [data], []
+
+        from .proto.usp_record import Record
+
+        try:
+            record = Record().parse(data)
+        except Exception as exc:
+            raise ProtocolError(f"Malformed USP Record: {exc}") from exc
+        context = record.session_context
+
+        if context.session_id != self.session_id:
+            logger.debug(f"Starting USP session {context.session_id}")
+            self._reset(context.session_id, context.sequence_id)
+
+        replies = []
+        if context.retransmit_id:
+            sent = self._sent.get(context.retransmit_id)
+            if sent is not None:
+                replies.append(sent)
+            else:
+                logger.debug(
+                    f"Agent asked for unknown record {context.retransmit_id} "
+                    f"in session {self.session_id}"
+                )
+
+        if context.sequence_id < self._expected_id:
+            logger.debug(f"Dropping duplicate record {context.sequence_id}")
+            return [], replies
+        if context.sequence_id > self._expected_id:
+            if len(self._early) >= _MAX_EARLY_RECORDS:
+                raise ProtocolError(
+                    f"USP session {self.session_id} stalled waiting for "
+                    f"record {self._expected_id}"
+                )
+            self._early[context.sequence_id] = context
+            if self._retransmit_requested != self._expected_id:
+                self._retransmit_requested = self._expected_id
+                replies.append(
+                    self._send(record.from_id, record.to_id, self._expected_id)
+                )
+            return [], replies
+
+        messages = []
+        error = None
+        while context is not None:
+            try:
+                messages.extend(self._payloads(record.to_id, record.from_id, context))
+            except ProtocolError as exc:
+                # Keep going, so the sequence stays in step with the Agent.
+                error = error or exc
+            self._expected_id += 1
+            context = self._early.pop(self._expected_id, None)
+        if error is not None:
+            if messages:
+                logger.warning(
+                    f"Dropping {len(messages)} messages released along with "
+                    f"a rejected payload in session {self.session_id}"
+                )
+            raise error
+        return messages, replies
+
+    def _check_size(self, size: int) -> None:
+        if self._max_payload_bytes is not None and size > self._max_payload_bytes:
+            raise ProtocolError(
+                f"USP response of {size} bytes exceeds the "
+                f"{self._max_payload_bytes} byte limit"
+            )
+
+    def _reset(self, session_id: int, sequence_id: int) -> None:
+        self.session_id = session_id
+        self._expected_id = sequence_id
+        self._sequence_id = 0
+        self._early.clear()
+        self._clear_segments()
+        self._discarding = False
+        self._sent.clear()
+        self._retransmit_requested = None
+
+    def _payloads(self, to_id: str, from_id: str, context) -> list[bytes]:
+        """Return the Msgs completed by ``context``, framed for ``_usp``."""
+        from .proto.usp_record import SessionContextRecordPayloadSarState as Sar
+
+        state = context.payload_sar_state
+        if state in (Sar.NONE, Sar.BEGIN):
+            if self._segments:
+                logger.warning(
+                    f"Discarding incomplete segmented payload in session {self.session_id}"
+                )
+                self._clear_segments()
+            self._discarding = False
+        elif self._discarding:
+            # The rest of a payload that was too large.
+            return []
+        if state == Sar.NONE:
+            return [_frame(to_id, from_id, payload) for payload in context.payload]
+
+        if state == Sar.BEGIN and context.payload:
+            header = msg_header(context.payload[0])
+            self._segment_msg_id = header[0] if header else None
+        self._segments.extend(context.payload)
+        self._segment_bytes += sum(len(segment) for segment in context.payload)
+        try:
+            self._check_size(self._segment_bytes)
+        except ProtocolError:
+            self.rejected_msg_id = self._segment_msg_id
+            self._clear_segments()
+            self._discarding = state != Sar.COMPLETE
+            raise
+        if state != Sar.COMPLETE or context.payloadrec_sar_state not in (
+            Sar.NONE,
+            Sar.COMPLETE,
+        ):
+            return []
+        # Joined once at the end: a single allocation of the final size.
+        payload = b"".join(self._segments)
+        self._clear_segments()
+        return [_frame(to_id, from_id, payload)]
+
+    def _clear_segments(self) -> None:
+        self._segments = []
+        self._segment_bytes = 0
+        self._segment_msg_id = None
+
+    def _send(self, to_id: str, from_id: str, retransmit_id: int) -> bytes:
+        """Build a Record asking the Agent to retransmit ``retransmit_id``."""
+        from .proto.usp_record import (
+            Record,
+            RecordPayloadSecurity,
+            SessionContextRecord,
+        )
+
+        self._sequence_id += 1
+        record = Record(
+            version="1.4",
+            to_id=to_id,
+            from_id=from_id,
+            payload_security=RecordPayloadSecurity.PLAINTEXT,
+            session_context=SessionContextRecord(
+                session_id=self.session_id,
+                sequence_id=self._sequence_id,
+                expected_id=self._expected_id,
+                retransmit_id=retransmit_id,
+            ),
+        )
+        data = bytes(record)
+        self._sent[self._sequence_id] = data
+        self._sent.pop(self._sequence_id - _MAX_SENT_RECORDS, None)
+        return data
+
+
+def _frame(to_id: str, from_id: str, payload: bytes) -> bytes:
+    from .proto.usp_record import NoSessionContextRecord, Record, RecordPayloadSecurity
+
+    record = Record(
+        version="1.4",
+        to_id=to_id,
+        from_id=from_id,
+        payload_security=RecordPayloadSecurity.PLAINTEXT,
+        no_session_context=NoSessionContextRecord(payload=payload),
+    )
+    return bytes(record)
@@ -1,29 +1,71 @@
-"""USP protobuf encoding and decoding for Get requests and responses."""
+"""USP protobuf encoding and decoding for requests and responses."""
 
 import logging
-import re
 import uuid
+from collections.abc import Iterable, Iterator, Mapping
+from functools import lru_cache
 
+from ._wire import get_message, iter_fields, iter_messages, read_string_pair
 from .exceptions import ProtocolError
-from .models import Host
-from .proto.usp import Body, Get, Header, HeaderMsgType, Msg, Request
+from .models import (
+    AddResult,
+    DeleteResult,
+    Host,
+    OperationResult,
+    ParameterResult,
+)
+from .proto.usp import (
+    Add,
+    AddCreateObject,
+    AddCreateParamSetting,
+    Body,
+    Delete,
+    Get,
+    Header,
+    HeaderMsgType,
+    Msg,
+    Notify,
+    NotifyResp,
+    Operate,
+    Request,
+    Response,
+    Set,
+    SetUpdateObject,
+    SetUpdateParamSetting,
+)
 from .proto.usp_record import NoSessionContextRecord, Record, RecordPayloadSecurity
 
 logger = logging.getLogger(__name__)
 
-_HOST_PATH_RE = re.compile(r"^(Device\.Hosts\.Host\.\d+\.)")
+_HOST_PATH = "Device.Hosts.Host."
+
+# Field numbers walked by iter_get_response (see usp-msg-1-4.proto).
+_RECORD_NO_SESSION_CONTEXT = 7
+_NO_SESSION_CONTEXT_PAYLOAD = 2
+_MSG_BODY = 2
+_BODY_RESPONSE = 2
+_BODY_ERROR = 3
+_RESPONSE_GET_RESP = 1
+_GET_RESP_REQ_PATH_RESULTS = 1
+_REQ_PATH_ERR_CODE = 2
+_REQ_PATH_ERR_MSG = 3
+_REQ_PATH_RESOLVED_PATH_RESULTS = 4
+_RESOLVED_PATH = 1
+_RESOLVED_RESULT_PARAMS = 2
+
+# Agents report booleans as "1" or "true".
+_TRUE = frozenset({"1", "true"})
 
 _FREQUENCY_BANDS = {"Radio.1": "2.4GHz", "Radio.2": "5GHz", "Radio.3": "6GHz"}
 
 
-def build_get_request(to_id: str, from_id: str, path: str) -> bytes:
-    """Build a Record-framed USP Get request for the given path."""
-    get = Get(param_paths=[path], max_depth=0)
-    request = Request(get=get)
-    body = Body(request=request)
-    msg_id = str(uuid.uuid4())
-    header = Header(msg_id=msg_id, msg_type=HeaderMsgType.GET)
-    msg = Msg(header=header, body=body)
+def _new_msg(msg_type: HeaderMsgType, body: Body) -> Msg:
+    header = Header(msg_id=str(uuid.uuid4()), msg_type=msg_type)
+    return Msg(header=header, body=body)
+
+
+def _wrap_msg(to_id: str, from_id: str, msg: Msg) -> bytes:
+    """Frame a USP Msg in a plaintext NoSessionContext Record."""
     msg_bytes = bytes(msg)
     no_session_context = NoSessionContextRecord(payload=msg_bytes)
     record = Record(
@@ -36,10 +78,10 @@ def build_get_request(to_id: str, from_id: str, path: str) -> bytes:
     return bytes(record)
 
 
-def parse_get_response(data: bytes) -> list[Host]:
-    """Parse a USP GetResponse Record into Host objects.
+def parse_msg(data: bytes) -> Msg:
+    """Unwrap a response Record and return its Msg.
 
-    Raises ProtocolError on USP errors or malformed responses.
+    Raises ProtocolError if the Record is malformed or the Msg is a USP Error.
     """
     record = Record().parse(data)
 
@@ -51,30 +93,93 @@ def parse_get_response(data: bytes) -> list[Host]:
 
     if msg.body is not None and msg.body.error is not None:
         err = msg.body.error
-        raise ProtocolError(f"USP error {err.err_code}: {err.err_msg}")
+        details = "".join(
+            f"; {e.param_path}: {e.err_code} {e.err_msg}" for e in err.param_errs
+        )
+        raise ProtocolError(f"USP error {err.err_code}: {err.err_msg}{details}")
 
-    if msg.body is None or msg.body.response is None or msg.body.response.get_resp is None:
-        raise ProtocolError("Response missing expected get_resp structure")
+    return msg
 
-    get_resp = msg.body.response.get_resp
-    for req_path_result in get_resp.req_path_results:
-        if req_path_result.err_code != 0:
-            raise ProtocolError(
-                f"USP error {req_path_result.err_code}: {req_path_result.err_msg}"
-            )
 
-    # Group resolved paths by host (e.g. Device.Hosts.Host.1.)
-    # so sub-paths like WANStats get merged into the parent host.
-    grouped: dict[str, dict[str, str]] = {}
-    for req_path_result in get_resp.req_path_results:
-        for resolved in req_path_result.resolved_path_results:
-            match = _HOST_PATH_RE.match(resolved.resolved_path)
-            if not match:
-                continue
-            host_prefix = match.group(1)
-            params = grouped.setdefault(host_prefix, {})
-            params.update(resolved.result_params)
+def build_get_request(to_id: str, from_id: str, path: str | Iterable[str]) -> bytes:
+    """Build a Record-framed USP Get request for the given path or paths."""
+    param_paths = [path] if isinstance(path, str) else list(path)
+    get = Get(param_paths=param_paths, max_depth=0)
+    body = Body(request=Request(get=get))
+    return _wrap_msg(to_id, from_id, _new_msg(HeaderMsgType.GET, body))
+
+
+def iter_get_response(data: bytes) -> Iterator[tuple[str, dict[str, str]]]:
+    """Yield (resolved path, parameters) for each resolved path in a GetResp Record.
+
+    The encoded Record is walked one resolved path at a time rather than
+    decoded into message objects up front, so memory use beyond the raw
+    response is bounded by what the caller keeps.
+    Raises ProtocolError on USP errors or malformed responses, including a
+    failed requested path once iteration reaches it.
+    """
+    try:
+        context = get_message(data, _RECORD_NO_SESSION_CONTEXT)
+        if context is None:
+            raise ProtocolError("Record missing no_session_context")
+        body = get_message(context, _NO_SESSION_CONTEXT_PAYLOAD)
+        body = get_message(body, _MSG_BODY) if body is not None else None
+        if body is not None and get_message(body, _BODY_ERROR) is not None:
+            parse_msg(data)  # raises with the error's details
+        response = get_message(body, _BODY_RESPONSE) if body is not None else None
+        get_resp = get_message(response, _RESPONSE_GET_RESP) if response is not None else None
+        if get_resp is None:
+            raise ProtocolError("Response missing expected get_resp structure")
+
+        for req_path_result in iter_messages(get_resp, _GET_RESP_REQ_PATH_RESULTS):
+            err_code = 0
+            err_msg = ""
+            resolved_path_results = []
+            for number, value in iter_fields(req_path_result):
+                if number == _REQ_PATH_ERR_CODE:
+                    err_code = int.from_bytes(value, "little")
+                elif number == _REQ_PATH_ERR_MSG:
+                    err_msg = str(value, "utf-8")
+                elif number == _REQ_PATH_RESOLVED_PATH_RESULTS:
+                    resolved_path_results.append(value)
+            if err_code != 0:
+                raise ProtocolError(f"USP error {err_code}: {err_msg}")
+
+            for resolved in resolved_path_results:
+                path = ""
+                params = {}
+                for number, value in iter_fields(resolved):
+                    if number == _RESOLVED_PATH:
+                        path = str(value, "utf-8")
+                    elif number == _RESOLVED_RESULT_PARAMS:
+                        key, item = read_string_pair(value)
+                        params[key] = item
+                yield path, params
+    except (TypeError, ValueError) as exc:
+        raise ProtocolError(f"Malformed GetResp: {exc}") from exc
+
+
+def parse_get_params(data: bytes) -> dict[str, dict[str, str]]:
+    """Parse a USP GetResp Record into parameters keyed by resolved object path.
+
+    Raises ProtocolError on USP errors or malformed responses.
+    """
+    objects: dict[str, dict[str, str]] = {}
+    for resolved_path, result_params in iter_get_response(data):
+        params = objects.get(resolved_path)
+        if params is None:
+            objects[resolved_path] = result_params
+        else:
+            params.update(result_params)
+    return objects
+
+
+def parse_get_response(data: bytes) -> list[Host]:
+    """Parse a USP GetResponse Record into Host objects.
 
+    Raises ProtocolError on USP errors or malformed responses.
+    """
+    grouped = _group_hosts(iter_get_response(data))
     hosts = []
     for prefix, params in grouped.items():
         host = _params_to_host(params)
@@ -86,6 +191,363 @@ def parse_get_response(data: bytes) -> list[Host]:
     return hosts
 
 
+def _group_hosts(
+    results: Iterable[tuple[str, dict[str, str]]],
+) -> dict[str, dict[str, str]]:
+    """Merge resolved paths into one parameter dict per host.
+
+    Sub-paths like ``Device.Hosts.Host.1.WANStats.`` are merged into their
+    host, keyed by the host's path (``Device.Hosts.Host.1.``).  Paths outside
+    the host table are ignored.
+    """
+    start = len(_HOST_PATH)
+    grouped: dict[str, dict[str, str]] = {}
+    for path, params in results:
+        end = path.find(".", start)
+        if end <= start or not path.startswith(_HOST_PATH):
+            continue
+        prefix = path[: end + 1]
+        host = grouped.get(prefix)
+        if host is not None:
+            host.update(params)
+        elif path[start:end].isdecimal():
+            # Each result is a fresh dict, so the first one can be kept as is.
+            grouped[prefix] = params
+    return grouped
+
+
+def _split_param_path(path: str) -> tuple[str, str]:
+    """Split "Device.Hosts.Host.1.HostName" into ("Device.Hosts.Host.1.", "HostName")."""
+    obj_path, sep, param = path.rpartition(".")
+    if not sep or not obj_path or not param:
+        raise ValueError(f"Not a parameter path: {path!r}")
+    return obj_path + ".", param
+
+
+def build_set_request(
+    to_id: str,
+    from_id: str,
+    updates: Mapping[str, str],
+    *,
+    allow_partial: bool = False,
+) -> bytes:
+    """Build a Record-framed USP Set request for the given parameter values.
+
+    Parameters are grouped by object so each object appears once in the
+    Set, however many of its parameters are updated.
+    """
+    grouped: dict[str, list[SetUpdateParamSetting]] = {}
+    for path, value in updates.items():
+        obj_path, param = _split_param_path(path)
+        grouped.setdefault(obj_path, []).append(
+            SetUpdateParamSetting(param=param, value=value, required=True)
+        )
+    update_objs = [
+        SetUpdateObject(obj_path=obj_path, param_settings=settings)
+        for obj_path, settings in grouped.items()
+    ]
+    set_ = Set(allow_partial=allow_partial, update_objs=update_objs)
+    body = Body(request=Request(set=set_))
+    return _wrap_msg(to_id, from_id, _new_msg(HeaderMsgType.SET, body))
+
+
+def parse_set_response(
+    data: bytes, updates: Mapping[str, str]
+) -> list[ParameterResult]:
+    """Parse a USP SetResp Record into one result per updated parameter.
+
+    ``updates`` is the mapping the request was built from; it is used to
+    report failures for objects whose error does not list each parameter.
+    Raises ProtocolError on USP errors or malformed responses.
+    """
+    msg = parse_msg(data)
+
+    if msg.body is None or msg.body.response is None or msg.body.response.set_resp is None:
+        raise ProtocolError("Response missing expected set_resp structure")
+
+    results = []
+    for obj_result in msg.body.response.set_resp.updated_obj_results:
+        status = obj_result.oper_status
+        if status is not None and status.oper_success is not None:
+            for inst in status.oper_success.updated_inst_results:
+                for param, value in inst.updated_params.items():
+                    results.append(
+                        ParameterResult(inst.affected_path + param, True, value)
+                    )
+                for err in inst.param_errs:
+                    results.append(
+                        ParameterResult(
+                            inst.affected_path + err.param,
+                            False,
+                            err_code=err.err_code,
+                            err_msg=err.err_msg,
+                        )
+                    )
+        elif status is not None and status.oper_failure is not None:
+            failure = status.oper_failure
+            inst_errs = [
+                (inst.affected_path + err.param, err)
+                for inst in failure.updated_inst_failures
+                for err in inst.param_errs
+            ]
+            for path, err in inst_errs:
+                results.append(
+                    ParameterResult(
+                        path, False, err_code=err.err_code, err_msg=err.err_msg
+                    )
+                )
+            if not inst_errs:
+                # No per-parameter detail: every requested parameter failed.
+                for path in updates:
+                    if _split_param_path(path)[0] == obj_result.requested_path:
+                        results.append(
+                            ParameterResult(
+                                path,
+                                False,
+                                err_code=failure.err_code,
+                                err_msg=failure.err_msg,
+                            )
+                        )
+        else:
+            raise ProtocolError(
+                f"Set result for {obj_result.requested_path} missing oper_status"
+            )
+    return results
+
+
+def build_add_request(
+    to_id: str,
+    from_id: str,
+    objects: Iterable[tuple[str, Mapping[str, str]]],
+    *,
+    allow_partial: bool = False,
+) -> bytes:
+    """Build a Record-framed USP Add request creating one object per entry.
+
+    Each entry is a (table path, parameter values) pair; a table may appear
+    more than once to create several instances in it.
+    """
+    create_objs = [
+        AddCreateObject(
+            obj_path=obj_path,
+            param_settings=[
+                AddCreateParamSetting(param=param, value=value, required=True)
+                for param, value in params.items()
+            ],
+        )
+        for obj_path, params in objects
+    ]
+    add = Add(allow_partial=allow_partial, create_objs=create_objs)
+    body = Body(request=Request(add=add))
+    return _wrap_msg(to_id, from_id, _new_msg(HeaderMsgType.ADD, body))
+
+
+def parse_add_response(data: bytes) -> list[AddResult]:
+    """Parse a USP AddResp Record into one result per requested object.
+
+    Raises ProtocolError on USP errors or malformed responses.
+    """
+    msg = parse_msg(data)
+
+    if msg.body is None or msg.body.response is None or msg.body.response.add_resp is None:
+        raise ProtocolError("Response missing expected add_resp structure")
+
+    results = []
+    for obj_result in msg.body.response.add_resp.created_obj_results:
+        status = obj_result.oper_status
+        if status is not None and status.oper_success is not None:
+            success = status.oper_success
+            results.append(
+                AddResult(
+                    obj_result.requested_path,
+                    True,
+                    success.instantiated_path,
+                    dict(success.unique_keys),
+                    [
+                        ParameterResult(
+                            success.instantiated_path + err.param,
+                            False,
+                            err_code=err.err_code,
+                            err_msg=err.err_msg,
+                        )
+                        for err in success.param_errs
+                    ],
+                )
+            )
+        elif status is not None and status.oper_failure is not None:
+            failure = status.oper_failure
+            results.append(
+                AddResult(
+                    obj_result.requested_path,
+                    False,
+                    err_code=failure.err_code,
+                    err_msg=failure.err_msg,
+                )
+            )
+        else:
+            raise ProtocolError(
+                f"Add result for {obj_result.requested_path} missing oper_status"
+            )
+    return results
+
+
+def build_delete_request(
+    to_id: str,
+    from_id: str,
+    paths: Iterable[str],
+    *,
+    allow_partial: bool = False,
+) -> bytes:
+    """Build a Record-framed USP Delete request for the given object paths."""
+    delete = Delete(allow_partial=allow_partial, obj_paths=list(paths))
+    body = Body(request=Request(delete=delete))
+    return _wrap_msg(to_id, from_id, _new_msg(HeaderMsgType.DELETE, body))
+
+
+def parse_delete_response(data: bytes) -> list[DeleteResult]:
+    """Parse a USP DeleteResp Record into one result per requested path.
+
+    Raises ProtocolError on USP errors or malformed responses.
+    """
+    msg = parse_msg(data)
+
+    if msg.body is None or msg.body.response is None or msg.body.response.delete_resp is None:
+        raise ProtocolError("Response missing expected delete_resp structure")
+
+    results = []
+    for obj_result in msg.body.response.delete_resp.deleted_obj_results:
+        status = obj_result.oper_status
+        if status is not None and status.oper_success is not None:
+            success = status.oper_success
+            results.append(
+                DeleteResult(
+                    obj_result.requested_path,
+                    True,
+                    list(success.affected_paths),
+                    [
+                        ParameterResult(
+                            err.unaffected_path,
+                            False,
+                            err_code=err.err_code,
+                            err_msg=err.err_msg,
+                        )
+                        for err in success.unaffected_path_errs
+                    ],
+                )
+            )
+        elif status is not None and status.oper_failure is not None:
+            failure = status.oper_failure
+            results.append(
+                DeleteResult(
+                    obj_result.requested_path,
+                    False,
+                    err_code=failure.err_code,
+                    err_msg=failure.err_msg,
+                )
+            )
+        else:
+            raise ProtocolError(
+                f"Delete result for {obj_result.requested_path} missing oper_status"
+            )
+    return results
+
+
+def build_operate_request(
+    to_id: str,
+    from_id: str,
+    command: str,
+    input_args: Mapping[str, str],
+    command_key: str,
+) -> bytes:
+    """Build a Record-framed USP Operate request for a command."""
+    operate = Operate(
+        command=command,
+        command_key=command_key,
+        send_resp=True,
+        input_args=dict(input_args),
+    )
+    body = Body(request=Request(operate=operate))
+    return _wrap_msg(to_id, from_id, _new_msg(HeaderMsgType.OPERATE, body))
+
+
+def parse_operate_response(data: bytes, command_key: str) -> list[OperationResult]:
+    """Parse a USP OperateResp Record into one result per executed command.
+
+    Commands the Agent runs asynchronously are returned with
+    ``completed=False``; their output arrives later in a Notify.
+    Raises ProtocolError on USP errors, command failures or malformed responses.
+    """
+    msg = parse_msg(data)
+
+    if msg.body is None or msg.body.response is None or msg.body.response.operate_resp is None:
+        raise ProtocolError("Response missing expected operate_resp structure")
+
+    results = []
+    for result in msg.body.response.operate_resp.operation_results:
+        if result.cmd_failure is not None:
+            failure = result.cmd_failure
+            raise ProtocolError(
+                f"Command {result.executed_command} failed: "
+                f"USP error {failure.err_code}: {failure.err_msg}"
+            )
+        if result.req_output_args is not None:
+            results.append(
+                OperationResult(
+                    result.executed_command,
+                    command_key,
+                    output_args=dict(result.req_output_args.output_args),
+                )
+            )
+        else:
+            results.append(
+                OperationResult(result.executed_command, command_key, completed=False)
+            )
+    return results
+
+
+def parse_notify(data: bytes) -> tuple[str, Notify] | None:
+    """Return (msg_id, Notify) if ``data`` is a Notify request, else None."""
+    try:
+        msg = parse_msg(data)
+    except ProtocolError:
+        return None
+    if msg.body is None or msg.body.request is None or msg.body.request.notify is None:
+        return None
+    return msg.header.msg_id if msg.header else "", msg.body.request.notify
+
+
+def operation_complete_result(notify: Notify) -> OperationResult | None:
+    """Convert an OperationComplete Notify into an OperationResult.
+
+    Returns None for other notification types.  Raises ProtocolError if the
+    command failed.
+    """
+    complete = notify.oper_complete
+    if complete is None:
+        return None
+    command = complete.obj_path + complete.command_name
+    if complete.cmd_failure is not None:
+        failure = complete.cmd_failure
+        raise ProtocolError(
+            f"Command {command} failed: USP error {failure.err_code}: {failure.err_msg}"
+        )
+    output_args = (
+        dict(complete.req_output_args.output_args)
+        if complete.req_output_args is not None
+        else {}
+    )
+    return OperationResult(command, complete.command_key, output_args=output_args)
+
+
+def build_notify_response(
+    to_id: str, from_id: str, msg_id: str, subscription_id: str
+) -> bytes:
+    """Build the NotifyResp acknowledging a Notify that requested one."""
+    header = Header(msg_id=msg_id, msg_type=HeaderMsgType.NOTIFY_RESP)
+    body = Body(response=Response(notify_resp=NotifyResp(subscription_id=subscription_id)))
+    return _wrap_msg(to_id, from_id, Msg(header=header, body=body))
+
+
 def _safe_int(value: str) -> int:
     try:
         return int(value)
@@ -93,6 +555,8 @@ def _safe_int(value: str) -> int:
         return 0
 
 
+# Hosts share a handful of Layer1Interface values, so results are memoised.
+@lru_cache(maxsize=64)
 def _extract_frequency(layer1_interface: str) -> str | None:
     for key, band in _FREQUENCY_BANDS.items():
         if key in layer1_interface:
@@ -101,18 +565,19 @@ def _extract_frequency(layer1_interface: str) -> str | None:
 
 
 def _params_to_host(params: dict[str, str]) -> Host | None:
-    mac = params.get("PhysAddress")
+    get = params.get
+    mac = get("PhysAddress")
     if not mac:
         return None
 
     return Host(
         mac_address=mac,
-        ip_address=params.get("IPAddress", ""),
-        hostname=params.get("HostName", ""),
-        user_friendly_name=params.get("X_BT-COM_UserHostName", ""),
-        active=params.get("Active", "0") == "1",
-        interface_type=params.get("InterfaceType", ""),
-        frequency_band=_extract_frequency(params.get("Layer1Interface", "")),
-        bytes_sent=_safe_int(params.get("BytesSent", "")),
-        bytes_received=_safe_int(params.get("BytesReceived", "")),
+        ip_address=get("IPAddress", ""),
+        hostname=get("HostName", ""),
+        user_friendly_name=get("X_BT-COM_UserHostName", ""),
+        active=get("Active") in _TRUE,
+        interface_type=get("InterfaceType", ""),
+        frequency_band=_extract_frequency(get("Layer1Interface", "")),
+        bytes_sent=_safe_int(get("BytesSent", "")),
+        bytes_received=_safe_int(get("BytesReceived", "")),
     )
@@ -0,0 +1,189 @@
+"""Minimal protobuf wire-format reader for inspecting USP Records cheaply.
+
+Used where decoding a whole message with the generated classes would be
+wasted work, e.g. reading the msg_id of a response to route it to the
+request waiting for it.  ``frame_record`` is the matching writer for the
+one Record the client sends most: an already-encoded Msg in a
+NoSessionContext Record.
+"""
+
+from collections.abc import Iterator
+
+_VARINT = 0
+_I64 = 1
+_LEN = 2
+_I32 = 5
+
+_RECORD_VERSION = 1
+_RECORD_TO_ID = 2
+_RECORD_FROM_ID = 3
+_RECORD_NO_SESSION_CONTEXT = 7
+_NO_SESSION_CONTEXT_PAYLOAD = 2
+_MSG_HEADER = 1
+_HEADER_MSG_ID = 1
+_HEADER_MSG_TYPE = 2
+
+
+def read_varint(buf: bytes | memoryview, pos: int) -> tuple[int, int]:
+    """Decode a varint at ``pos``, returning (value, position after it)."""
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("Varint too long")
+
+
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _encode_len(number: int, value: bytes) -> bytes:
+    return _encode_varint(number << 3 | _LEN) + _encode_varint(len(value)) + value
+
+
+def frame_record(to_id: str, from_id: str, msg: bytes) -> bytes:
+    """Encode a plaintext USP 1.4 NoSessionContext Record carrying ``msg``.
+
+    Produces the same bytes as the generated Record class, without building
+    message objects or copying ``msg`` more than once.
+    """
+    context = _encode_len(_NO_SESSION_CONTEXT_PAYLOAD, msg) if msg else b""
+    return b"".join((
+        _encode_len(_RECORD_VERSION, b"1.4"),
+        _encode_len(_RECORD_TO_ID, to_id.encode()) if to_id else b"",
+        _encode_len(_RECORD_FROM_ID, from_id.encode()) if from_id else b"",
+        _encode_len(_RECORD_NO_SESSION_CONTEXT, context),
+    ))
+
+
+def iter_fields(buf: bytes | memoryview) -> Iterator[tuple[int, int | memoryview]]:
+    """Yield (field number, value) for each top-level field in ``buf``.
+
+    Length-delimited values are zero-copy memoryview slices; varints are
+    ints; fixed-width values are returned as raw memoryview slices.
+    Raises ValueError on malformed input.
+    """
+    view = memoryview(buf)
+    pos = 0
+    end = len(view)
+    try:
+        while pos < end:
+            key, pos = read_varint(view, pos)
+            number, wire_type = key >> 3, key & 0x7
+            if wire_type == _VARINT:
+                value, pos = read_varint(view, pos)
+                yield number, value
+            elif wire_type == _LEN:
+                length, pos = read_varint(view, pos)
+                if pos + length > end:
+                    raise ValueError("Truncated length-delimited field")
+                yield number, view[pos:pos + length]
+                pos += length
+            elif wire_type == _I64:
+                yield number, view[pos:pos + 8]
+                pos += 8
+            elif wire_type == _I32:
+                yield number, view[pos:pos + 4]
+                pos += 4
+            else:
+                raise ValueError(f"Unsupported wire type {wire_type}")
+    except IndexError as exc:
+        raise ValueError("Truncated protobuf message") from exc
+
+
+def get_field(buf: bytes | memoryview, number: int) -> int | memoryview | None:
+    """Return the last value of field ``number`` in ``buf``, or None."""
+    found = None
+    for field_number, value in iter_fields(buf):
+        if field_number == number:
+            found = value
+    return found
+
+
+def get_message(buf: bytes | memoryview, number: int) -> memoryview | None:
+    """Return embedded message/bytes field ``number``, or None if absent or not length-delimited."""
+    value = get_field(buf, number)
+    return value if isinstance(value, memoryview) else None
+
+
+def iter_messages(buf: bytes | memoryview, number: int) -> Iterator[memoryview]:
+    """Yield each occurrence of repeated message/bytes field ``number``."""
+    for field_number, value in iter_fields(buf):
+        if field_number == number and isinstance(value, memoryview):
+            yield value
+
+
+def read_string_pair(buf: memoryview) -> tuple[str, str]:
+    """Decode a map<string, string> entry into (key, value).
+
+    Entries are almost always a short key (field 1) followed by a short
+    value (field 2), which is decoded directly; anything else goes through
+    iter_fields.
+    """
+    end = len(buf)
+    if end >= 4 and buf[0] == 0x0A and buf[1] < 0x80:
+        key_end = 2 + buf[1]
+        if key_end + 2 <= end and buf[key_end] == 0x12 and buf[key_end + 1] < 0x80:
+            if key_end + 2 + buf[key_end + 1] == end:
+                return str(buf[2:key_end], "utf-8"), str(buf[key_end + 2:], "utf-8")
+    key = value = ""
+    for number, field_value in iter_fields(buf):
+        if number == 1:
+            key = str(field_value, "utf-8")
+        elif number == 2:
+            value = str(field_value, "utf-8")
+    return key, value
+
+
+def record_msg(record: bytes | memoryview) -> memoryview | None:
+    """Return the encoded Msg in a NoSessionContext Record, or None.
+
+    Raises ValueError if the Record is malformed.
+    """
+    context = get_message(record, _RECORD_NO_SESSION_CONTEXT)
+    if context is None:
+        return None
+    return get_message(context, _NO_SESSION_CONTEXT_PAYLOAD)
+
+
+def msg_header(msg: bytes | memoryview) -> tuple[str, int] | None:
+    """Return (msg_id, msg_type) from an encoded Msg, or None.
+
+    Only reads as far as the header, so ``msg`` may be just the leading
+    segment of a segmented Msg.
+    """
+    try:
+        for number, value in iter_fields(msg):
+            if number == _MSG_HEADER and isinstance(value, memoryview):
+                msg_id = get_message(value, _HEADER_MSG_ID)
+                msg_type = get_field(value, _HEADER_MSG_TYPE)
+                return (
+                    bytes(msg_id).decode() if msg_id is not None else "",
+                    msg_type if isinstance(msg_type, int) else 0,
+                )
+    except (ValueError, UnicodeDecodeError):
+        pass
+    return None
+
+
+def peek_header(record: bytes | memoryview) -> tuple[str, int] | None:
+    """Return (msg_id, msg_type) of the Msg in a NoSessionContext Record.
+
+    Returns None if the Record carries no such Msg or is malformed.
+    """
+    try:
+        msg = record_msg(record)
+    except ValueError:
+        return None
+    return msg_header(msg) if msg is not None else None
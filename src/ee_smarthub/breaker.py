@@ -0,0 +1,96 @@
+"""Per-router circuit breaker, so an offline router fails fast.
+
+Without a breaker, every request to a router that has gone offline waits
+for the connection or response to time out.  A ``CircuitBreaker`` counts
+consecutive communication failures and, past ``failure_threshold``, opens:
+requests then fail immediately with ``CircuitOpenError`` for
+``reset_timeout`` seconds.  After that the circuit is half-open and the
+next request first probes the router with a bare MQTT connect; if that
+succeeds the circuit closes again, otherwise it stays open for another
+``reset_timeout``.
+
+Only ``CommunicationError`` counts as a failure: a router that answers,
+even with an error, is up.
+"""
+
+import enum
+import time
+
+
+class CircuitState(enum.Enum):
+    """State of a circuit breaker."""
+
+    CLOSED = "closed"
+    """Requests go through; failures are counted."""
+    OPEN = "open"
+    """Requests fail immediately."""
+    HALF_OPEN = "half_open"
+    """The next request probes the router; others fail until it is done."""
+
+
+class CircuitBreaker:
+    """Tracks the health of one router.
+
+    The client calls :meth:`admit` before a request and then reports its
+    outcome with :meth:`record_success`, :meth:`record_failure` or, if the
+    request was abandoned without a verdict, :meth:`release`.
+    """
+
+    def __init__(self, *, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        """Initialise the breaker.
+
+        Args:
+            failure_threshold: Consecutive failures after which the circuit
+                opens.
+            reset_timeout: Seconds the circuit stays open before a probe is
+                allowed.
+        """
+        if failure_threshold < 1:
+            raise ValueError(f"Failure threshold must be at least 1: {failure_threshold}")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> CircuitState:
+        if self._opened_at is None:
+            return CircuitState.CLOSED
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+            return CircuitState.HALF_OPEN
+        return CircuitState.OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until the open circuit allows a probe (0.0 if it does now)."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def admit(self) -> bool:
+        """Whether a request may go ahead now.
+
+        In the half-open state a single request is admitted, as the probe.
+        """
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if state is CircuitState.OPEN or self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """Forget an admitted request that ended without a verdict."""
+        self._probing = False
@@ -1,15 +1,58 @@
 """High-level async client for querying EE SmartHub routers."""
 
+import asyncio
 import logging
+import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any
 
 import aiohttp
 
-from ._mqtt import AGENT_ID_PREFIX, CONTROLLER_ID, send_request, test_credentials
-from ._usp import build_get_request, parse_get_response
-from .exceptions import CommunicationError, ProtocolError
-from .models import Host
+from ._mqtt import (
+    AGENT_ID_PREFIX,
+    CONTROLLER_ID,
+    MAX_RESPONSE_BYTES,
+    RESPONSE_TIMEOUT,
+    UspConnection,
+    connect,
+    exchange,
+    test_credentials,
+)
+from ._wire import frame_record, msg_header, record_msg
+from .breaker import CircuitBreaker, CircuitState
+from .datamodel import ParamTypes
+from .deadline import Deadline, _enforce, current_deadline, deadline
+from .exceptions import (
+    CircuitOpenError,
+    CommunicationError,
+    DeadlineExceededError,
+    ProtocolError,
+    SmartHubError,
+)
+from .hedging import HedgePolicy
+from .metrics import REGISTRY, MetricsRegistry, _ClientMetrics
+from .models import (
+    AddResult,
+    DeleteResult,
+    Host,
+    OperationResult,
+    ParameterResult,
+)
+from .query import SearchPath, expand_paths
+from .serial_store import MemorySerialStore, SerialStore
+from .tracing import Tracer, _bind, _phase
+
+if TYPE_CHECKING:
+    from .proto.usp import Msg
 
 _HOST_PATH = "Device.Hosts.Host."
+# How long a connection kept open by validate_connection() waits to be used.
+_WARM_CONNECTION_TIMEOUT = 30.0
+# With QoS 0 reads, how long to wait for a response before re-sending.
+_QOS0_RETRY_INTERVAL = 2.0
+_ACTIVE_HOST_PATH = str(SearchPath(_HOST_PATH).where("Active", True))
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +61,19 @@ class SmartHubClient:
     """Async client for querying an EE SmartHub router via USP over MQTT."""
 
     def __init__(
-        self, hostname: str, password: str, session: aiohttp.ClientSession
+        self,
+        hostname: str,
+        password: str,
+        session: aiohttp.ClientSession,
+        *,
+        tracer: Tracer | None = None,
+        metrics: MetricsRegistry = REGISTRY,
+        serial_store: SerialStore | None = None,
+        persistent: bool = False,
+        max_response_bytes: int | None = MAX_RESPONSE_BYTES,
+        hedge: HedgePolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        read_qos: int = 1,
     ) -> None:
         """Initialise the client.
 
@@ -27,23 +82,89 @@ class SmartHubClient:
             password: The admin password for the router.
             session: A caller-managed aiohttp session.  The client does not
                 close this session; the caller is responsible for its lifecycle.
+            tracer: Optional callable receiving a ``Span`` for each request
+                phase (see ``ee_smarthub.tracing``).
+            metrics: Registry to record request counters and histograms in.
+                Defaults to the shared ``ee_smarthub.metrics.REGISTRY``.
+            serial_store: Where to cache the router serial number.  Defaults
+                to an in-memory store private to this client; pass a shared
+                ``MemorySerialStore`` or a ``JsonFileSerialStore`` to skip the
+                ``config.json`` fetch for new clients or after a restart.
+            persistent: Keep one MQTT connection open and reuse it for all
+                requests, instead of connecting per request.  Use the client
+                as an async context manager, or call ``aclose()`` when done.
+            max_response_bytes: Reject responses larger than this many bytes
+                with ProtocolError before decoding them.  None disables the
+                limit.
+            hedge: Send a duplicate Get when the first is slow to be
+                answered, and use whichever response arrives first (see
+                ``ee_smarthub.hedging``).  Requires ``persistent``.
+            breaker: Fail requests fast with CircuitOpenError while the
+                router is failing (see ``ee_smarthub.breaker``).  Share one
+                breaker between all clients of the same router.
+            read_qos: MQTT QoS for read-only requests (Gets).  0 saves the
+                broker acknowledgement round trips; an unanswered request is
+                then re-sent every 2 seconds instead.  Writes and commands
+                always use QoS 1.
         """
+        if read_qos not in (0, 1):
+            raise ValueError(f"read_qos must be 0 or 1: {read_qos}")
+        if hedge is not None and not persistent:
+            raise ValueError("Hedged requests require a persistent client")
         self._hostname = hostname
         self._password = password
         self._session = session
-        self._serial: str | None = None
+        self._tracer = _bind(tracer, hostname=hostname)
+        self._metrics = _ClientMetrics(metrics)
+        self._serial_store = serial_store if serial_store is not None else MemorySerialStore()
+        # Whether the serial has been confirmed by config.json or a response
+        # since this client was created, rather than only read from the store.
+        self._serial_verified = False
+        self._persistent = persistent
+        self._max_response_bytes = max_response_bytes
+        self._hedge = hedge
+        self._breaker = breaker
+        self._read_qos = read_qos
+        self._connection: UspConnection | None = None
+        self._connection_lock = asyncio.Lock()
+        # Operations in progress that need the connection kept open even
+        # when the client is not persistent.
+        self._connection_holds = 0
+        self._warm_expiry: asyncio.TimerHandle | None = None
+        self._notifications: dict[str, asyncio.Queue] = {}
+        self._background: set[asyncio.Task] = set()
+        self._in_flight = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._closing = False
+
+    async def __aenter__(self) -> "SmartHubClient":
+        return self
 
-    async def _fetch_serial(self) -> str:
-        """Fetch the router serial number, caching it for subsequent calls."""
-        if self._serial is not None:
-            return self._serial
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    async def _fetch_serial(self, *, refresh: bool = False) -> str:
+        """Fetch the router serial number, caching it for subsequent calls.
+
+        With ``refresh``, the cached serial is discarded and fetched again.
+        """
+        if refresh:
+            self._serial_store.discard(self._hostname)
+        else:
+            serial = self._serial_store.get(self._hostname)
+            if serial is not None:
+                self._metrics.serial_cache.inc(result="hit")
+                return serial
+        self._metrics.serial_cache.inc(result="miss")
 
         url = f"https://{self._hostname}/config.json"
         logger.debug(f"Fetching serial number from {url}")
         try:
-            async with self._session.get(url, ssl=False) as resp:
-                resp.raise_for_status()
-                data = await resp.json(content_type=None)
+            with _phase(self._tracer, "fetch_serial"):
+                async with self._session.get(url, ssl=False) as resp:
+                    resp.raise_for_status()
+                    data = await resp.json(content_type=None)
         except aiohttp.ClientError as exc:
             raise CommunicationError(
                 f"Failed to fetch serial number from {url}: {exc}"
@@ -56,27 +177,757 @@ class SmartHubClient:
         serial = data.get("SerialNumber")
         if not serial:
             raise ProtocolError("SerialNumber missing from config.json response")
-        self._serial = serial
+        self._serial_store.set(self._hostname, serial)
+        self._serial_verified = True
         logger.debug(f"Router serial number: {serial}")
         return serial
 
-    async def validate_connection(self) -> None:
-        """Verify that the router is reachable and credentials are valid."""
+    async def validate_connection(
+        self, *, keep_connection: bool = False, timeout: float | None = None
+    ) -> None:
+        """Verify that the router is reachable and credentials are valid.
+
+        Args:
+            keep_connection: Keep the verified connection open and use it
+                for the next request, saving that request the TLS and MQTT
+                handshakes.  If no request follows within 30 seconds, it is
+                closed (unless the client is persistent).
+            timeout: Seconds the whole call may take, including the serial
+                number fetch and MQTT connect.  Defaults to the enclosing
+                ``deadline()``, if any.
+        """
         logger.debug(f"Validating connection to {self._hostname}")
-        await self._fetch_serial()
-        await test_credentials(self._hostname, self._password)
+        with self._metrics.track("validate"), deadline(timeout):
+            if keep_connection:
+                # The connection outlives this call, so aclose() must know of it.
+                async with (
+                    self._in_flight_request(),
+                    _enforce(f"Validating {self._hostname}"),
+                    self._circuit(),
+                ):
+                    await self._get_connection(self._fetch_serial())
+                    if not self._persistent:
+                        self._expire_warm_connection_later()
+            else:
+                async with _enforce(f"Validating {self._hostname}"):
+                    await self._fetch_serial()
+                    await test_credentials(
+                        self._hostname, self._password, tracer=self._tracer
+                    )
         logger.debug(f"Connection to {self._hostname} validated successfully")
 
-    async def get_hosts(self) -> list[Host]:
-        """Fetch the list of connected hosts from the router."""
-        serial = await self._fetch_serial()
-        agent_id = AGENT_ID_PREFIX + serial
-        request = build_get_request(
-            to_id=agent_id, from_id=CONTROLLER_ID, path=_HOST_PATH
-        )
-        response = await send_request(
-            self._hostname, self._password, serial, request
-        )
-        hosts = parse_get_response(response)
+    async def get_hosts(
+        self, *, active_only: bool = False, timeout: float | None = None
+    ) -> list[Host]:
+        """Fetch the list of hosts known to the router.
+
+        Args:
+            active_only: Only fetch currently connected hosts.  The router
+                filters its host table, so the response omits the (often
+                much longer) history of inactive devices.
+            timeout: Seconds the whole call may take, from fetching the
+                serial number to decoding the response.  Defaults to the
+                enclosing ``deadline()``, if any.
+        """
+        # ``._usp`` pulls in the generated USP message classes, which dominate
+        # import time, so request methods import it on first use rather than
+        # at module load.
+        from ._usp import build_get_request, parse_get_response
+
+        path = _ACTIVE_HOST_PATH if active_only else _HOST_PATH
+        with self._metrics.track("get"), deadline(timeout):
+            response = await self._request(
+                lambda agent_id: build_get_request(
+                    to_id=agent_id, from_id=CONTROLLER_ID, path=path
+                ),
+                idempotent=True,
+            )
+            hosts = self._decode(parse_get_response, response)
         logger.debug(f"Fetched {len(hosts)} host(s) from router")
         return hosts
+
+    async def get_params(
+        self,
+        paths: str | SearchPath | Iterable[str | SearchPath],
+        *,
+        types: ParamTypes | None = None,
+        timeout: float | None = None,
+    ) -> dict[str, dict[str, Any]]:
+        """Fetch data model parameters in a single USP Get request.
+
+        Args:
+            paths: Object, parameter or search paths, e.g.
+                ``SearchPath("Device.NAT.PortMapping.").where("Enable", True)``.
+            types: Converts the values of the parameters it declares from
+                strings to Python types.
+            timeout: Seconds the whole call may take, from fetching the
+                serial number to decoding the response.  Defaults to the
+                enclosing ``deadline()``, if any.
+
+        Returns:
+            Parameter values keyed by resolved object path, e.g.
+            ``{"Device.NAT.PortMapping.2.": {"Enable": "true", ...}}``.
+        """
+        from ._usp import build_get_request, parse_get_params
+
+        param_paths = expand_paths(paths)
+        if not param_paths:
+            return {}
+        with self._metrics.track("get"), deadline(timeout):
+            response = await self._request(
+                lambda agent_id: build_get_request(
+                    to_id=agent_id, from_id=CONTROLLER_ID, path=param_paths
+                ),
+                idempotent=True,
+            )
+            parse = (
+                parse_get_params
+                if types is None
+                else lambda data: types.convert_all(parse_get_params(data))
+            )
+            objects = self._decode(parse, response)
+        logger.debug(f"Fetched {len(objects)} object(s) from router")
+        return objects
+
+    async def set_params(
+        self,
+        updates: Mapping[str, str],
+        *,
+        allow_partial: bool = False,
+        timeout: float | None = None,
+    ) -> list[ParameterResult]:
+        """Set data model parameter values in a single USP Set request.
+
+        Args:
+            updates: Parameter paths mapped to their new values, e.g.
+                ``{"Device.Hosts.Host.3.X_BT-COM_UserHostName": "Kitchen"}``.
+                Parameters of the same object are sent together.
+            allow_partial: If true, objects that fail to update do not
+                prevent the others from being updated, and their failures
+                are reported in the results.  If false, any failure aborts
+                the whole request and raises ProtocolError.
+            timeout: Seconds the whole call may take, from fetching the
+                serial number to decoding the response.  Defaults to the
+                enclosing ``deadline()``, if any.
+
+        Returns:
+            One ParameterResult per updated or failed parameter.
+        """
+        from ._usp import build_set_request, parse_set_response
+
+        if not updates:
+            return []
+        with self._metrics.track("set"), deadline(timeout):
+            response = await self._request(
+                lambda agent_id: build_set_request(
+                    agent_id, CONTROLLER_ID, updates, allow_partial=allow_partial
+                )
+            )
+            results = self._decode(
+                lambda data: parse_set_response(data, updates), response
+            )
+        logger.debug(f"Set {len(updates)} parameter(s) on router")
+        return results
+
+    async def add_objects(
+        self,
+        objects: Iterable[tuple[str, Mapping[str, str]]],
+        *,
+        allow_partial: bool = False,
+        timeout: float | None = None,
+    ) -> list[AddResult]:
+        """Create data model objects in a single USP Add request.
+
+        Args:
+            objects: (table path, parameter values) pairs, one per object to
+                create, e.g. ``[("Device.NAT.PortMapping.", {"ExternalPort":
+                "8080", ...})]``.  A table may appear several times.
+            allow_partial: If true, objects that cannot be created do not
+                prevent the others from being created, and their failures
+                are reported in the results.  If false, any failure aborts
+                the whole request and raises ProtocolError.
+            timeout: Seconds the whole call may take, from fetching the
+                serial number to decoding the response.  Defaults to the
+                enclosing ``deadline()``, if any.
+
+        Returns:
+            One AddResult per requested object, in request order.
+        """
+        from ._usp import build_add_request, parse_add_response
+
+        objects = list(objects)
+        if not objects:
+            return []
+        with self._metrics.track("add"), deadline(timeout):
+            response = await self._request(
+                lambda agent_id: build_add_request(
+                    agent_id, CONTROLLER_ID, objects, allow_partial=allow_partial
+                )
+            )
+            results = self._decode(parse_add_response, response)
+        logger.debug(f"Added {sum(r.success for r in results)} object(s) on router")
+        return results
+
+    async def delete_objects(
+        self,
+        paths: Iterable[str],
+        *,
+        allow_partial: bool = False,
+        timeout: float | None = None,
+    ) -> list[DeleteResult]:
+        """Delete data model objects in a single USP Delete request.
+
+        Args:
+            paths: Object instance paths or search paths, e.g.
+                ``"Device.NAT.PortMapping.4."``.
+            allow_partial: If true, paths that cannot be deleted do not
+                prevent the others from being deleted, and their failures
+                are reported in the results.  If false, any failure aborts
+                the whole request and raises ProtocolError.
+            timeout: Seconds the whole call may take, from fetching the
+                serial number to decoding the response.  Defaults to the
+                enclosing ``deadline()``, if any.
+
+        Returns:
+            One DeleteResult per requested path, in request order.
+        """
+        from ._usp import build_delete_request, parse_delete_response
+
+        paths = list(paths)
+        if not paths:
+            return []
+        with self._metrics.track("delete"), deadline(timeout):
+            response = await self._request(
+                lambda agent_id: build_delete_request(
+                    agent_id, CONTROLLER_ID, paths, allow_partial=allow_partial
+                )
+            )
+            results = self._decode(parse_delete_response, response)
+        logger.debug(f"Deleted objects at {len(paths)} path(s) on router")
+        return results
+
+    async def operate(
+        self,
+        command: str,
+        input_args: Mapping[str, str] | None = None,
+        *,
+        wait: bool = True,
+        timeout: float | None = None,
+    ) -> list[OperationResult]:
+        """Execute a USP command, e.g. ``"Device.WiFi.NeighboringWiFiDiagnostic()"``.
+
+        Synchronous commands return their output immediately.  Asynchronous
+        commands report completion later with a Notify; with ``wait`` the
+        client keeps the connection open and returns once a Notify for each
+        executed command has arrived, which requires the Agent to have an
+        OperationComplete subscription for the command.
+
+        Args:
+            command: Command path, optionally with a search path to run the
+                command on several objects.
+            input_args: Command input arguments.
+            wait: Wait for asynchronous commands to complete.  If false,
+                they are returned with ``completed=False``.
+            timeout: Seconds the whole call may take, including waiting for
+                asynchronous commands to complete.  Defaults to the
+                enclosing ``deadline()``, if any; with neither, asynchronous
+                commands are waited for until they complete or the
+                connection is lost, so pass one for commands that may never
+                report completion.
+
+        Returns:
+            One OperationResult per executed command.
+
+        Raises ProtocolError if a command fails and DeadlineExceededError if
+        the command does not complete within the timeout or deadline.
+        """
+        from ._usp import build_operate_request, parse_operate_response
+
+        command_key = uuid.uuid4().hex
+        # Registered before sending, as the Notify may overtake the response.
+        notifications: asyncio.Queue = asyncio.Queue()
+        self._notifications[command_key] = notifications
+        try:
+            async with self._in_flight_request(), self._hold_connection():
+                with self._metrics.track("operate"), deadline(timeout) as budget:
+                    response = await self._request(
+                        lambda agent_id: build_operate_request(
+                            agent_id, CONTROLLER_ID, command, input_args or {}, command_key
+                        )
+                    )
+                    results = self._decode(
+                        lambda data: parse_operate_response(data, command_key), response
+                    )
+                    if wait and not all(r.completed for r in results):
+                        await self._await_completion(results, notifications, budget)
+        finally:
+            del self._notifications[command_key]
+        return results
+
+    async def _await_completion(
+        self,
+        results: list[OperationResult],
+        notifications: asyncio.Queue,
+        budget: Deadline | None,
+    ) -> None:
+        """Replace pending results in place with their OperationComplete output."""
+        from ._usp import operation_complete_result
+
+        waiting = {r.command: i for i, r in enumerate(results) if not r.completed}
+        connection = self._connection
+        try:
+            async with asyncio.timeout(budget.remaining() if budget else None):
+                while waiting:
+                    notify = await _next_notification(notifications, connection)
+                    result = operation_complete_result(notify)
+                    index = waiting.pop(result.command, None) if result else None
+                    if index is not None:
+                        results[index] = result
+        except TimeoutError as exc:
+            raise DeadlineExceededError(
+                f"Timed out waiting for {', '.join(waiting)} to complete"
+            ) from exc
+
+    async def request(self, msg: "Msg", *, timeout: float | None = None) -> "Msg":
+        """Send any USP Msg and return the Agent's response Msg.
+
+        For requests the typed methods do not cover.  Build ``msg`` with the
+        classes in ``ee_smarthub.proto.usp``; its header needs a unique
+        msg_id.  The request is addressed, framed and sent like any other,
+        over the persistent connection if the client has one.
+
+        Args:
+            msg: The request Msg.
+            timeout: Seconds the whole call may take.  Defaults to the
+                enclosing ``deadline()``, if any.
+
+        Raises ProtocolError if the response is a USP Error.
+        """
+        from ._usp import parse_msg
+
+        if msg.header is None or not msg.header.msg_id:
+            raise ValueError("Msg needs a header with a msg_id")
+        payload = bytes(msg)
+        with self._metrics.track(msg.header.msg_type.name.lower()), deadline(timeout):
+            response = await self._request(
+                lambda agent_id: frame_record(agent_id, CONTROLLER_ID, payload)
+            )
+            started = time.perf_counter()
+            with _phase(self._tracer, "usp.decode", response_bytes=len(response)):
+                reply = parse_msg(response)
+            self._metrics.decode_seconds.observe(time.perf_counter() - started)
+        return reply
+
+    async def request_raw(self, msg: bytes, *, timeout: float | None = None) -> bytes:
+        """Send an encoded USP Msg and return the encoded response Msg.
+
+        Like :meth:`request`, but nothing is decoded: ``msg`` is framed in a
+        Record as is, and the response Msg is returned without being
+        parsed, USP Errors included.  ``msg`` must carry a unique msg_id;
+        ValueError is raised if it has none.
+
+        Raises ProtocolError if the response is not a NoSessionContext Record.
+        """
+        header = msg_header(msg)
+        if header is None or not header[0]:
+            raise ValueError("Msg needs a header with a msg_id")
+        with self._metrics.track("raw"), deadline(timeout):
+            response = await self._request(
+                lambda agent_id: frame_record(agent_id, CONTROLLER_ID, msg)
+            )
+            try:
+                reply = record_msg(response)
+            except ValueError as exc:
+                raise ProtocolError(f"Malformed USP Record: {exc}") from exc
+            if reply is None:
+                raise ProtocolError("Record missing no_session_context")
+        return bytes(reply)
+
+    @property
+    def connected(self) -> bool:
+        """Whether a kept-open connection to the router is currently up."""
+        return self._connection is not None and not self._connection.closed
+
+    async def aclose(self, *, drain_timeout: float = 10.0) -> None:
+        """Shut the client down gracefully.
+
+        New requests are refused with RuntimeError; requests already in
+        flight are given up to ``drain_timeout`` seconds to finish.  The open
+        connection, if any, is then closed after telling the router with a
+        USP DisconnectRecord and unsubscribing, so it frees the MQTT client
+        slot straight away.  Also called on leaving ``async with client``.
+        """
+        self._closing = True
+        if self._in_flight:
+            logger.debug(f"Draining {self._in_flight} request(s) to {self._hostname}")
+            try:
+                async with asyncio.timeout(drain_timeout):
+                    await self._drained.wait()
+            except TimeoutError:
+                logger.warning(
+                    f"Closing connection to {self._hostname} with "
+                    f"{self._in_flight} request(s) still in flight"
+                )
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self._close_connection()
+
+    async def _close_connection(self) -> None:
+        """Close the kept-open connection, if one is open."""
+        if self._warm_expiry is not None:
+            self._warm_expiry.cancel()
+            self._warm_expiry = None
+        async with self._connection_lock:
+            connection, self._connection = self._connection, None
+        if connection is not None:
+            await connection.close()
+
+    def _expire_warm_connection_later(self) -> None:
+        """Close the connection kept by validate_connection() if left unused."""
+        if self._warm_expiry is not None:
+            self._warm_expiry.cancel()
+        self._warm_expiry = asyncio.get_running_loop().call_later(
+            _WARM_CONNECTION_TIMEOUT, self._expire_warm_connection
+        )
+
+    def _expire_warm_connection(self) -> None:
+        self._warm_expiry = None
+        if self._connection_holds or self._persistent:
+            return
+        logger.debug(f"Closing unused connection to {self._hostname}")
+        task = asyncio.create_task(self._close_connection())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @asynccontextmanager
+    async def _in_flight_request(self) -> AsyncIterator[None]:
+        """Count the enclosed request as in flight so aclose() can drain it."""
+        if self._closing:
+            raise RuntimeError("SmartHubClient is closed")
+        self._in_flight += 1
+        self._drained.clear()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._drained.set()
+
+    @asynccontextmanager
+    async def _hold_connection(self) -> AsyncIterator[None]:
+        """Route requests over a kept-open connection for the enclosed block."""
+        self._connection_holds += 1
+        try:
+            yield
+        finally:
+            self._connection_holds -= 1
+            if not self._connection_holds and not self._persistent:
+                await self._close_connection()
+
+    @asynccontextmanager
+    async def _circuit(self) -> AsyncIterator[None]:
+        """Pass the enclosed request through the circuit breaker, if any.
+
+        A half-open circuit is probed with a bare MQTT connect before the
+        request is sent.
+        """
+        breaker = self._breaker
+        if breaker is None:
+            yield
+            return
+        if not breaker.admit():
+            self._metrics.circuit_rejections.inc()
+            raise CircuitOpenError(
+                f"Circuit open for {self._hostname} after {breaker.failures} "
+                f"failure(s); retry in {breaker.retry_after():.1f}s"
+            )
+        before = breaker.state
+        try:
+            if before is CircuitState.HALF_OPEN:
+                logger.debug(f"Probing {self._hostname} before closing its circuit")
+                await test_credentials(self._hostname, self._password, tracer=self._tracer)
+            yield
+        except CommunicationError:
+            breaker.record_failure()
+            raise
+        except SmartHubError:
+            # The router answered, so it is up.
+            breaker.record_success()
+            raise
+        except asyncio.CancelledError:
+            budget = current_deadline()
+            if budget is not None and budget.expired:
+                breaker.record_failure()
+            else:
+                breaker.release()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+        finally:
+            after = breaker.state
+            if after is not before and after is not CircuitState.HALF_OPEN:
+                logger.debug(f"Circuit for {self._hostname} is now {after.value}")
+                self._metrics.circuit_transitions.inc(state=after.value)
+
+    def _on_message(self, payload: bytes) -> None:
+        """Handle a message from the Agent that answers no pending request."""
+        from ._usp import build_notify_response, parse_notify
+
+        parsed = parse_notify(payload)
+        if parsed is None:
+            logger.debug(f"Ignoring unsolicited USP message ({len(payload)} bytes)")
+            return
+        msg_id, notify = parsed
+        connection = self._connection
+        if notify.send_resp and connection is not None:
+            ack = build_notify_response(
+                AGENT_ID_PREFIX + connection.serial,
+                CONTROLLER_ID,
+                msg_id,
+                notify.subscription_id,
+            )
+            task = asyncio.create_task(connection.publish(ack))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        if notify.oper_complete is not None:
+            queue = self._notifications.get(notify.oper_complete.command_key)
+            if queue is not None:
+                queue.put_nowait(notify)
+
+    async def _request(
+        self, build: Callable[[str], bytes], *, idempotent: bool = False
+    ) -> bytes:
+        """Send the request built by ``build(agent_id)`` and return the response.
+
+        ``build`` must give each request a new msg_id.  Only ``idempotent``
+        requests are hedged, as the router may receive both copies.
+
+        A serial read from the store but not yet confirmed may be stale (e.g.
+        the router was replaced), in which case the Agent never answers.  On
+        the first communication failure with such a serial, it is re-fetched
+        and, if it changed, the request is retried once.
+
+        The current deadline, if any, bounds all of this; otherwise only the
+        wait for each response is limited.
+        """
+        async with (
+            self._in_flight_request(),
+            _enforce(f"Request to {self._hostname}"),
+            self._circuit(),
+        ):
+            serial = self._serial_store.get(self._hostname)
+            if serial is None:
+                return await self._send(self._fetch_serial(), build, idempotent)
+            self._metrics.serial_cache.inc(result="hit")
+
+            try:
+                response = await self._send(serial, build, idempotent)
+            except CommunicationError:
+                if self._serial_verified:
+                    raise
+                stale = serial
+                serial = await self._fetch_serial(refresh=True)
+                if serial == stale:
+                    raise
+                logger.debug(f"Stored serial {stale} is stale, retrying with {serial}")
+                response = await self._send(serial, build, idempotent)
+            self._serial_verified = True
+            return response
+
+    async def _send(
+        self,
+        serial: str | Awaitable[str],
+        build: Callable[[str], bytes],
+        idempotent: bool = False,
+    ) -> bytes:
+        """Exchange one request, on the kept-open connection if there is one.
+
+        If ``serial`` is still being fetched, it is awaited only once the MQTT
+        connection is up, so the config.json fetch overlaps the TLS and MQTT
+        handshakes instead of preceding them.
+        """
+        qos = self._read_qos if idempotent else 1
+        retry_interval = _QOS0_RETRY_INTERVAL if qos == 0 else None
+        if self._persistent or self._connection_holds:
+            connection = await self._get_connection(serial)
+            if idempotent and self._hedge is not None:
+                return await self._hedged_request(
+                    connection, build, self._hedge, qos, retry_interval
+                )
+            request = build(AGENT_ID_PREFIX + connection.serial)
+            response = await connection.request(
+                request,
+                timeout=_response_timeout(),
+                qos=qos,
+                retry_interval=retry_interval,
+            )
+            self._metrics.transferred(len(request), len(response))
+            return response
+        if self._connection is not None:
+            # Left open by validate_connection(); used once, then closed.
+            async with self._hold_connection():
+                return await self._send(serial, build, idempotent)
+
+        pending = None if isinstance(serial, str) else asyncio.ensure_future(serial)
+        self._metrics.connections.inc(reused="false")
+        try:
+            async with connect(
+                self._hostname, self._password, tracer=self._tracer
+            ) as mqtt:
+                if pending is not None:
+                    serial = await pending
+                request = build(AGENT_ID_PREFIX + serial)
+                response = await exchange(
+                    mqtt,
+                    serial,
+                    request,
+                    timeout=_response_timeout(),
+                    tracer=self._tracer,
+                    max_response_bytes=self._max_response_bytes,
+                    qos=qos,
+                    retry_interval=retry_interval,
+                )
+        finally:
+            if pending is not None:
+                _discard(pending)
+        self._metrics.transferred(len(request), len(response))
+        return response
+
+    async def _hedged_request(
+        self,
+        connection: UspConnection,
+        build: Callable[[str], bytes],
+        hedge: HedgePolicy,
+        qos: int,
+        retry_interval: float | None,
+    ) -> bytes:
+        """Send a request, and a duplicate if it is slow; return the first answer.
+
+        A copy that fails is ignored while the other may still succeed.
+        """
+        agent_id = AGENT_ID_PREFIX + connection.serial
+        timeout = _response_timeout()
+        sent = []
+
+        def send() -> asyncio.Task:
+            request = build(agent_id)
+            sent.append(len(request))
+            return asyncio.ensure_future(
+                connection.request(
+                    request, timeout=timeout, qos=qos, retry_interval=retry_interval
+                )
+            )
+
+        started = time.perf_counter()
+        tasks = [send()]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge.delay())
+            if not done:
+                logger.debug(f"No response from {self._hostname} yet, hedging")
+                tasks.append(send())
+            winner, response = await _first_success(tasks)
+        finally:
+            for task in tasks:
+                _discard(task)
+
+        hedge.observe(time.perf_counter() - started)
+        if len(tasks) > 1:
+            self._metrics.hedges.inc(winner="original" if winner is tasks[0] else "hedge")
+        self._metrics.transferred(sum(sent), len(response))
+        return response
+
+    async def _get_connection(self, serial: str | Awaitable[str]) -> UspConnection:
+        """Return the open connection for ``serial``, (re)connecting if needed."""
+        async with self._connection_lock:
+            connection = self._connection
+            if connection is not None and not connection.closed:
+                if not isinstance(serial, str):
+                    serial = await serial
+                if connection.serial == serial:
+                    self._metrics.connections.inc(reused="true")
+                    return connection
+                await connection.close()
+
+            self._metrics.connections.inc(reused="false")
+            connection = UspConnection(
+                self._hostname,
+                self._password,
+                tracer=self._tracer,
+                on_message=self._on_message,
+                max_response_bytes=self._max_response_bytes,
+            )
+            pending = None if isinstance(serial, str) else asyncio.ensure_future(serial)
+            try:
+                await connection.connect()
+                await connection.start(serial if pending is None else await pending)
+            except BaseException:
+                await connection.close()
+                raise
+            finally:
+                if pending is not None:
+                    _discard(pending)
+            self._connection = connection
+            return connection
+
+    def _decode(self, parse, response: bytes):
+        """Run ``parse`` on a response, recording decode time and size."""
+        started = time.perf_counter()
+        with _phase(
+            self._tracer,
+            "usp.decode",
+            response_bytes=len(response),
+        ) as attributes:
+            result = parse(response)
+            attributes["results"] = len(result)
+        self._metrics.decode_seconds.observe(time.perf_counter() - started)
+        return result
+
+
+def _response_timeout() -> float | None:
+    """How long to wait for a response: no limit of its own under a deadline."""
+    return None if current_deadline() is not None else RESPONSE_TIMEOUT
+
+
+async def _first_success(tasks: list[asyncio.Task]) -> tuple[asyncio.Task, Any]:
+    """Return the first of ``tasks`` to succeed and its result.
+
+    If all of them fail, the first error raised is re-raised.
+    """
+    pending = set(tasks)
+    error = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                return task, task.result()
+            error = error or task.exception()
+    raise error
+
+
+def _discard(task: asyncio.Future) -> None:
+    """Cancel ``task`` if still running, or consume its exception if it failed."""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+async def _next_notification(
+    notifications: asyncio.Queue, connection: UspConnection | None
+):
+    """Wait for the next queued Notify, failing if the connection is lost."""
+    if connection is None:
+        return await notifications.get()
+    get = asyncio.ensure_future(notifications.get())
+    closed = asyncio.ensure_future(connection.wait_closed())
+    try:
+        await asyncio.wait({get, closed}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        get.cancel()
+        closed.cancel()
+    if get.done() and not get.cancelled():
+        return get.result()
+    raise CommunicationError("USP connection lost while waiting for operation to complete")
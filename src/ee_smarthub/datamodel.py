@@ -0,0 +1,114 @@
+"""Convert USP parameter values from strings to Python types.
+
+USP transports every parameter value as a string.  ``ParamTypes`` maps
+parameter names to their data model types (as named in TR-181, e.g.
+``"boolean"``, ``"unsignedInt"``, ``"dateTime"``, ``"list of string"``)
+and resolves each to a converter once, up front, so converting a response
+is a dict lookup and a call per value::
+
+    types = ParamTypes({"Enable": "boolean", "ExternalPort": "unsignedInt"})
+    rules = types.convert_all(await client.get_params("Device.NAT.PortMapping."))
+
+Parameters without a declared type are left as strings; values that do not
+parse as their declared type become None.
+"""
+
+import base64
+from collections.abc import Callable, Mapping
+from datetime import datetime
+from typing import Any
+
+_BOOLEANS = {"true": True, "1": True, "false": False, "0": False}
+
+
+def _boolean(value: str) -> bool:
+    try:
+        return _BOOLEANS[value]
+    except KeyError:
+        raise ValueError(f"Not a boolean: {value!r}") from None
+
+
+def _unsigned(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise ValueError(f"Not an unsigned integer: {value!r}")
+    return number
+
+
+def _list_of(convert: Callable[[str], Any]) -> Callable[[str], list[Any]]:
+    def convert_list(value: str) -> list[Any]:
+        return [convert(item.strip()) for item in value.split(",")] if value else []
+
+    return convert_list
+
+
+CONVERTERS: dict[str, Callable[[str], Any]] = {
+    "string": str,
+    "boolean": _boolean,
+    "int": int,
+    "long": int,
+    "unsignedInt": _unsigned,
+    "unsignedLong": _unsigned,
+    "decimal": float,
+    "dateTime": datetime.fromisoformat,
+    "base64": base64.b64decode,
+    "hexBinary": bytes.fromhex,
+}
+"""Converters for the USP/TR-106 primitive types, keyed by type name."""
+
+
+def converter_for(type_name: str) -> Callable[[str], Any]:
+    """Return the converter for a type name such as ``"list of unsignedInt"``.
+
+    Raises ValueError for unknown types.
+    """
+    item_type = type_name.removeprefix("list of ").strip()
+    if type_name == "list":
+        return _list_of(str)
+    if item_type not in CONVERTERS:
+        raise ValueError(f"Unknown parameter type: {type_name!r}")
+    convert = CONVERTERS[item_type]
+    return _list_of(convert) if item_type != type_name else convert
+
+
+class ParamTypes:
+    """Precompiled converters for a set of parameters, keyed by name."""
+
+    def __init__(self, types: Mapping[str, str]) -> None:
+        self._converters = {name: converter_for(t) for name, t in types.items()}
+
+    def convert(self, params: Mapping[str, str]) -> dict[str, Any]:
+        """Return ``params`` with each declared parameter converted."""
+        converters = self._converters
+        typed: dict[str, Any] = dict(params)
+        for name in converters.keys() & typed.keys():
+            try:
+                typed[name] = converters[name](typed[name])
+            except ValueError:
+                typed[name] = None
+        return typed
+
+    def convert_all(
+        self, objects: Mapping[str, Mapping[str, str]]
+    ) -> dict[str, dict[str, Any]]:
+        """Convert every object of a ``get_params`` result."""
+        convert = self.convert
+        return {path: convert(params) for path, params in objects.items()}
+
+
+HOST_TYPES = ParamTypes(
+    {
+        "Active": "boolean",
+        "ActiveLastChange": "dateTime",
+        "LeaseTimeRemaining": "int",
+        "BytesSent": "unsignedLong",
+        "BytesReceived": "unsignedLong",
+        "PacketsSent": "unsignedLong",
+        "PacketsReceived": "unsignedLong",
+        "ErrorsSent": "unsignedInt",
+        "RetransCount": "unsignedInt",
+        "IPv4AddressNumberOfEntries": "unsignedInt",
+        "IPv6AddressNumberOfEntries": "unsignedInt",
+    }
+)
+"""Types of the Device.Hosts.Host parameters (and its WANStats) that are not strings."""
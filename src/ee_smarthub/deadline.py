@@ -0,0 +1,107 @@
+"""Deadlines that bound whole operations rather than single phases.
+
+A deadline covers everything a request does — fetching the serial number,
+connecting, subscribing, publishing, waiting for and decoding the
+response — and is inherited by every request made inside its block,
+including those in tasks started there, so a fleet poller can bound a
+whole polling cycle::
+
+    with deadline(25.0):
+        results = await asyncio.gather(
+            *(client.get_hosts() for client in clients), return_exceptions=True
+        )
+
+Each request gets whatever budget is left when it starts.  Deadlines nest:
+an inner deadline, such as the ``timeout`` of a single client call, can
+only shorten the enclosing one.  Requests that start with no budget left
+fail immediately with DeadlineExceededError instead of connecting.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from .exceptions import CommunicationError, DeadlineExceededError
+
+
+@dataclass(frozen=True)
+class Deadline:
+    """A point in time, on the monotonic clock, by which work must finish."""
+
+    expires: float
+    """``time.monotonic()`` value at which the deadline expires."""
+    timeout: float
+    """The budget, in seconds, the deadline was created with."""
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, or 0.0 once it has passed."""
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+
+_current: ContextVar[Deadline | None] = ContextVar("ee_smarthub_deadline", default=None)
+
+
+def current_deadline() -> Deadline | None:
+    """Return the deadline that applies to requests made here, if any."""
+    return _current.get()
+
+
+@contextmanager
+def deadline(timeout: float | None) -> Iterator[Deadline | None]:
+    """Bound every request made in the block to ``timeout`` seconds in total.
+
+    With ``timeout=None`` the enclosing deadline, if any, applies unchanged.
+    Yields the deadline in effect.
+    """
+    outer = _current.get()
+    if timeout is None:
+        yield outer
+        return
+    inner = Deadline(time.monotonic() + timeout, timeout)
+    if outer is not None and outer.expires <= inner.expires:
+        yield outer
+        return
+    token = _current.set(inner)
+    try:
+        yield inner
+    finally:
+        _current.reset(token)
+
+
+@asynccontextmanager
+async def _enforce(description: str) -> AsyncIterator[None]:
+    """Cancel the enclosed block when the current deadline expires.
+
+    Raises DeadlineExceededError, mentioning ``description``, immediately if
+    no budget is left and otherwise once the deadline passes.
+    """
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    if current.expired:
+        raise DeadlineExceededError(
+            f"{description} not started: its {current.timeout:.1f}s deadline has passed"
+        )
+    try:
+        async with asyncio.timeout(current.remaining()):
+            yield
+    except TimeoutError as exc:
+        raise DeadlineExceededError(
+            f"{description} did not finish within its {current.timeout:.1f}s deadline"
+        ) from exc
+    except CommunicationError as exc:
+        # A wait inside the block may time out just ahead of the deadline.
+        if not current.expired or isinstance(exc, DeadlineExceededError):
+            raise
+        raise DeadlineExceededError(
+            f"{description} did not finish within its {current.timeout:.1f}s "
+            f"deadline: {exc}"
+        ) from exc
@@ -12,3 +12,11 @@ class AuthenticationError(SmartHubError):
 
 class ProtocolError(SmartHubError):
     """USP protocol-level error in the response."""
+
+
+class DeadlineExceededError(CommunicationError):
+    """The operation did not finish within its deadline."""
+
+
+class CircuitOpenError(CommunicationError):
+    """Request refused without contacting the router, as it recently failed."""
@@ -0,0 +1,66 @@
+"""Hedged requests: re-send a slow read instead of waiting out the tail.
+
+Some routers occasionally sit on a Get for seconds while an identical Get
+sent a moment later is answered straight away.  With a ``HedgePolicy``, a
+persistent client sends a duplicate of an idempotent request (a Get) once
+the first has gone unanswered for longer than a high percentile of recent
+response times, and uses whichever response arrives first::
+
+    client = SmartHubClient(host, password, session, persistent=True, hedge=HedgePolicy())
+
+Responses are matched to requests by USP msg_id, so the loser is simply
+dropped.  How often each copy wins is counted in
+``smarthub_hedged_requests_total``.
+"""
+
+import math
+from collections import deque
+
+
+class HedgePolicy:
+    """Decides when to hedge, from the response times of one router.
+
+    Give each client its own policy: the threshold tracks that client's
+    router.
+    """
+
+    def __init__(
+        self,
+        *,
+        percentile: float = 95.0,
+        min_delay: float = 0.05,
+        initial_delay: float = 1.0,
+        window: int = 100,
+        min_samples: int = 20,
+    ) -> None:
+        """Initialise the policy.
+
+        Args:
+            percentile: Hedge once a request has been waiting longer than
+                this percentile of recent response times.
+            min_delay: Never hedge sooner than this many seconds, however
+                fast the router has been.
+            initial_delay: Seconds to wait before hedging until
+                ``min_samples`` response times have been observed.
+            window: Number of recent response times to keep.
+            min_samples: Response times needed before the percentile is used.
+        """
+        if not 0 < percentile <= 100:
+            raise ValueError(f"Percentile must be in (0, 100]: {percentile}")
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        """Record the time taken to receive a response."""
+        self._samples.append(seconds)
+
+    def delay(self) -> float:
+        """Seconds to wait for a response before sending a hedge."""
+        if len(self._samples) < self.min_samples:
+            return max(self.initial_delay, self.min_delay)
+        ordered = sorted(self._samples)
+        rank = math.ceil(self.percentile / 100 * len(ordered)) - 1
+        return max(ordered[rank], self.min_delay)
@@ -0,0 +1,219 @@
+"""Lightweight counters and histograms exportable in Prometheus text format.
+
+Instruments are plain dicts updated without locks, which is safe for the
+single-event-loop use this library is designed for and keeps the cost of
+an update to a dict lookup.  Every ``SmartHubClient`` records into
+``REGISTRY`` unless given its own registry, so one registry aggregates a
+whole fleet of clients.
+"""
+
+import math
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+
+from .exceptions import SmartHubError
+
+_DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+_SIZE_BUCKETS = (
+    1_024, 4_096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304,
+)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing value, optionally split by labels."""
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._values: dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def _render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Observations counted into fixed cumulative buckets."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = _DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._counts: dict[LabelKey, list[int]] = {}
+        self._sums: dict[LabelKey, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self._sums[key] += value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(_label_key(labels), ()))
+
+    def sum(self, **labels: str) -> float:
+        return self._sums.get(_label_key(labels), 0.0)
+
+    def _render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(self._sums[key])}"
+            yield f"{self.name}_count{_format_labels(key)} {cumulative}"
+
+
+class MetricsRegistry:
+    """A named collection of instruments."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram] = {}
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        """Return the counter called ``name``, creating it if needed."""
+        return self._get_or_create(name, Counter, documentation)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = _DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Return the histogram called ``name``, creating it if needed."""
+        return self._get_or_create(name, Histogram, documentation, buckets)
+
+    def _get_or_create(self, name, cls, *args):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name!r} already registered as {type(metric).__name__}")
+        return metric
+
+    def render(self) -> str:
+        """Render all instruments in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric._render())
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+REGISTRY = MetricsRegistry()
+"""Default registry shared by all clients."""
+
+
+class _ClientMetrics:
+    """The instruments recorded by SmartHubClient."""
+
+    def __init__(self, registry: MetricsRegistry) -> None:
+        self.requests = registry.counter(
+            "smarthub_requests_total", "USP requests sent, by message type."
+        )
+        self.errors = registry.counter(
+            "smarthub_errors_total", "Failed operations, by exception class."
+        )
+        self.request_seconds = registry.histogram(
+            "smarthub_request_seconds", "End-to-end request latency, by message type."
+        )
+        self.decode_seconds = registry.histogram(
+            "smarthub_decode_seconds", "Time spent decoding USP responses."
+        )
+        self.bytes_sent = registry.counter(
+            "smarthub_bytes_sent_total", "USP request payload bytes published."
+        )
+        self.bytes_received = registry.counter(
+            "smarthub_bytes_received_total", "USP response payload bytes received."
+        )
+        self.response_bytes = registry.histogram(
+            "smarthub_response_bytes", "USP response payload size.", _SIZE_BUCKETS
+        )
+        self.connections = registry.counter(
+            "smarthub_connections_total",
+            "MQTT connections used for requests, by whether they were reused.",
+        )
+        self.serial_cache = registry.counter(
+            "smarthub_serial_cache_total", "Router serial lookups, by cache result."
+        )
+        self.hedges = registry.counter(
+            "smarthub_hedged_requests_total",
+            "Requests re-sent after a slow response, by which copy answered first.",
+        )
+        self.circuit_rejections = registry.counter(
+            "smarthub_circuit_rejections_total",
+            "Requests failed fast because the router's circuit was open.",
+        )
+        self.circuit_transitions = registry.counter(
+            "smarthub_circuit_transitions_total",
+            "Circuit breaker state changes, by new state.",
+        )
+
+    @contextmanager
+    def track(self, msg_type: str) -> Iterator[None]:
+        """Count a request of ``msg_type``, its latency and any SmartHubError."""
+        self.requests.inc(type=msg_type)
+        started = time.perf_counter()
+        try:
+            yield
+        except SmartHubError as exc:
+            self.errors.inc(exception=type(exc).__name__)
+            raise
+        finally:
+            self.request_seconds.observe(time.perf_counter() - started, type=msg_type)
+
+    def transferred(self, sent: int, received: int) -> None:
+        self.bytes_sent.inc(sent)
+        self.bytes_received.inc(received)
+        self.response_bytes.observe(received)
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -19,3 +19,57 @@ class Host:
     def name(self) -> str:
         """Return the best available name for the device."""
         return self.user_friendly_name or self.hostname or self.mac_address
+
+
+@dataclass
+class ParameterResult:
+    """Outcome of setting a single data model parameter."""
+
+    path: str
+    success: bool
+    value: str | None = None
+    """The value the Agent reports having set, when successful."""
+    err_code: int = 0
+    err_msg: str = ""
+
+
+@dataclass
+class OperationResult:
+    """Outcome of a USP command executed with Operate."""
+
+    command: str
+    """The executed command path, e.g. "Device.IP.Diagnostics.IPPing()"."""
+    command_key: str = ""
+    completed: bool = True
+    """False for an asynchronous command that has been started but not awaited."""
+    output_args: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class AddResult:
+    """Outcome of creating one object with Add."""
+
+    requested_path: str
+    """The table the object was added to, e.g. "Device.NAT.PortMapping."."""
+    success: bool
+    instantiated_path: str = ""
+    """Path of the new instance, e.g. "Device.NAT.PortMapping.4."."""
+    unique_keys: dict[str, str] = field(default_factory=dict)
+    param_errs: list[ParameterResult] = field(default_factory=list)
+    """Optional parameters the Agent could not set on the new instance."""
+    err_code: int = 0
+    err_msg: str = ""
+
+
+@dataclass
+class DeleteResult:
+    """Outcome of deleting the objects matching one path with Delete."""
+
+    requested_path: str
+    success: bool
+    affected_paths: list[str] = field(default_factory=list)
+    """Instances that were deleted."""
+    unaffected_paths: list[ParameterResult] = field(default_factory=list)
+    """Matching instances that could not be deleted, with the reason."""
+    err_code: int = 0
+    err_msg: str = ""
@@ -0,0 +1,219 @@
+"""Share warm persistent SmartHub clients between callers.
+
+A service answering requests for many users, each with their own router,
+would otherwise open a new MQTT connection for every call.  The pool keeps
+one persistent ``SmartHubClient`` per (router, password) and hands it to
+every caller for that router::
+
+    pool = SmartHubConnectionPool(session, max_size=64)
+    async with pool.acquire("192.168.1.1", password) as client:
+        hosts = await client.get_hosts()
+    ...
+    await pool.aclose()
+
+Clients idle for longer than ``idle_timeout`` are closed to free the
+router's MQTT client slots.  When more than ``max_size`` routers are in use
+the least recently used idle client is closed.  Dead connections are
+detected by MQTT keepalive and re-established on the client's next request.
+
+Each router also gets a circuit breaker, shared by all its clients, so
+requests to a router that keeps failing fail fast instead of tying up the
+caller until they time out (see ``ee_smarthub.breaker``).
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import aiohttp
+
+from .breaker import CircuitBreaker, CircuitState
+from .client import SmartHubClient
+from .metrics import REGISTRY, MetricsRegistry
+from .serial_store import MemorySerialStore, SerialStore
+from .tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    client: SmartHubClient
+    users: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+def _key(hostname: str, password: str) -> tuple[str, str]:
+    # The password is hashed so it is not kept in the key as well as the client.
+    return hostname, hashlib.sha256(password.encode()).hexdigest()
+
+
+class SmartHubConnectionPool:
+    """Pool of persistent clients keyed by router hostname and password."""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        *,
+        max_size: int = 16,
+        idle_timeout: float = 300.0,
+        tracer: Tracer | None = None,
+        metrics: MetricsRegistry = REGISTRY,
+        serial_store: SerialStore | None = None,
+        failure_threshold: int | None = 5,
+        reset_timeout: float = 30.0,
+    ) -> None:
+        """Initialise the pool.
+
+        Args:
+            session: A caller-managed aiohttp session shared by all clients.
+            max_size: Number of routers to keep connections open to.  Clients
+                in use are never closed, so the pool may briefly exceed this.
+            idle_timeout: Seconds after its last use before a client's
+                connection is closed.
+            tracer: Passed to every client.
+            metrics: Passed to every client.
+            serial_store: Shared by all clients.  Defaults to an in-memory
+                store private to this pool.
+            failure_threshold: Consecutive communication failures after which
+                a router's circuit opens.  None disables circuit breaking.
+            reset_timeout: Seconds a router's circuit stays open before it
+                is probed.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._session = session
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._tracer = tracer
+        self._metrics = metrics
+        self._serial_store = serial_store if serial_store is not None else MemorySerialStore()
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        # Keyed by hostname: outlives the clients, which are per password.
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+        self._reaper: asyncio.Task | None = None
+        # Evicted clients still shutting down, awaited by aclose().
+        self._closing: set[asyncio.Task] = set()
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def circuit_states(self) -> dict[str, CircuitState]:
+        """Return the circuit breaker state of each router, by hostname."""
+        return {hostname: breaker.state for hostname, breaker in self._breakers.items()}
+
+    def _breaker(self, hostname: str) -> CircuitBreaker | None:
+        if self._failure_threshold is None:
+            return None
+        breaker = self._breakers.get(hostname)
+        if breaker is None:
+            breaker = self._breakers[hostname] = CircuitBreaker(
+                failure_threshold=self._failure_threshold,
+                reset_timeout=self._reset_timeout,
+            )
+        return breaker
+
+    async def __aenter__(self) -> "SmartHubConnectionPool":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    @asynccontextmanager
+    async def acquire(
+        self, hostname: str, password: str
+    ) -> AsyncIterator[SmartHubClient]:
+        """Borrow the pooled client for a router for the enclosed block.
+
+        The client may be used by other callers at the same time; it
+        multiplexes their requests over one connection.
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        key = _key(hostname, password)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _Entry(
+                SmartHubClient(
+                    hostname,
+                    password,
+                    self._session,
+                    tracer=self._tracer,
+                    metrics=self._metrics,
+                    serial_store=self._serial_store,
+                    persistent=True,
+                    breaker=self._breaker(hostname),
+                )
+            )
+            self._entries[key] = entry
+            logger.debug(f"Added {hostname} to connection pool ({len(self._entries)} routers)")
+        else:
+            self._entries.move_to_end(key)
+        entry.users += 1
+        self._start_reaper()
+        try:
+            self._evict_over_capacity()
+            yield entry.client
+        finally:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+
+    def _evict_over_capacity(self) -> None:
+        """Close least recently used idle clients until within ``max_size``."""
+        excess = len(self._entries) - self._max_size
+        if excess > 0:
+            idle = [key for key, entry in self._entries.items() if not entry.users]
+            self._evict(idle[:excess], "least recently used")
+
+    def _evict(self, keys: list[tuple[str, str]], reason: str) -> None:
+        """Remove clients from the pool and close them in the background.
+
+        Closing waits for in-flight requests and a clean MQTT disconnect, so
+        no caller waits for it.
+        """
+        entries = [self._entries.pop(key) for key in keys]
+        in_use = {hostname for hostname, _ in self._entries}
+        for hostname, _ in keys:
+            logger.debug(f"Closing pooled connection to {hostname} ({reason})")
+            # A healthy router's breaker holds nothing worth keeping.
+            breaker = self._breakers.get(hostname)
+            if hostname not in in_use and breaker is not None and not breaker.failures:
+                del self._breakers[hostname]
+        for entry in entries:
+            task = asyncio.create_task(entry.client.aclose())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    def _start_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap())
+
+    async def _reap(self) -> None:
+        """Close clients that have been idle for longer than ``idle_timeout``."""
+        while self._entries:
+            await asyncio.sleep(self._idle_timeout / 2)
+            cutoff = time.monotonic() - self._idle_timeout
+            expired = [
+                key
+                for key, entry in self._entries.items()
+                if not entry.users and entry.last_used < cutoff
+            ]
+            self._evict(expired, "idle")
+
+    async def aclose(self) -> None:
+        """Close every pooled connection.  The pool cannot be used afterwards."""
+        self._closed = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+        self._evict(list(self._entries), "pool closed")
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
@@ -0,0 +1,105 @@
+"""Build USP search paths so the router filters objects instead of the client.
+
+A search path selects instances of a multi-instance object with an
+expression, e.g. ``Device.Hosts.Host.[Active==true].``, so a Get returns
+only the matching instances::
+
+    SearchPath("Device.Hosts.Host.").where("Active", True)
+    SearchPath("Device.NAT.PortMapping.").where("Enable", True).where("Protocol", "TCP")
+    SearchPath("Device.Hosts.Host.").instances(range(1, 11)).select("WANStats.")
+
+Conditions added with ``where`` are combined with AND.  USP has no syntax
+for instance ranges, so ``instances`` expands to one path per instance,
+all sent in the same Get.
+"""
+
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass, replace
+
+_OPERATORS = frozenset({"==", "!=", "<", ">", "<=", ">="})
+_PARAM_RE = re.compile(r"^[\w-]+(\.[\w-]+)*$")
+
+
+def _literal(value: str | int | float | bool) -> str:
+    """Format a value as a search expression literal."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int | float):
+        return str(value)
+    # Strings are double-quoted; quotes and percent signs are percent-encoded.
+    return '"' + value.replace("%", "%25").replace('"', "%22") + '"'
+
+
+@dataclass(frozen=True)
+class SearchPath:
+    """An immutable USP search path over a multi-instance object table."""
+
+    table: str
+    """The table path, e.g. "Device.Hosts.Host."."""
+    conditions: tuple[str, ...] = ()
+    instance_numbers: tuple[int, ...] | None = None
+    sub_path: str = ""
+
+    def __post_init__(self) -> None:
+        if not self.table.endswith(".") or self.table.startswith("."):
+            raise ValueError(f"Not a table path: {self.table!r}")
+
+    def where(
+        self, param: str, value: str | int | float | bool, op: str = "=="
+    ) -> "SearchPath":
+        """Return a copy that also requires ``param op value``."""
+        if op not in _OPERATORS:
+            raise ValueError(f"Unsupported operator: {op!r}")
+        if not _PARAM_RE.match(param):
+            raise ValueError(f"Not a parameter name: {param!r}")
+        if self.instance_numbers is not None:
+            raise ValueError("Cannot combine instance numbers with conditions")
+        condition = f"{param}{op}{_literal(value)}"
+        return replace(self, conditions=(*self.conditions, condition))
+
+    def instances(self, numbers: Iterable[int]) -> "SearchPath":
+        """Return a copy selecting only the given instance numbers."""
+        if self.conditions:
+            raise ValueError("Cannot combine instance numbers with conditions")
+        numbers = tuple(numbers)
+        if any(n < 1 for n in numbers):
+            raise ValueError("Instance numbers start at 1")
+        return replace(self, instance_numbers=numbers)
+
+    def select(self, sub_path: str) -> "SearchPath":
+        """Return a copy selecting ``sub_path`` within each matching instance.
+
+        ``sub_path`` is an object (``"WANStats."``) or parameter
+        (``"HostName"``) path relative to the instance.
+        """
+        if not sub_path or sub_path.startswith("."):
+            raise ValueError(f"Not a relative path: {sub_path!r}")
+        return replace(self, sub_path=sub_path)
+
+    def paths(self) -> list[str]:
+        """Return the USP path(s) to send in a Get."""
+        if self.instance_numbers is not None:
+            return [f"{self.table}{n}.{self.sub_path}" for n in self.instance_numbers]
+        if self.conditions:
+            return [f"{self.table}[{'&&'.join(self.conditions)}].{self.sub_path}"]
+        return [f"{self.table}*.{self.sub_path}" if self.sub_path else self.table]
+
+    def __str__(self) -> str:
+        paths = self.paths()
+        if len(paths) != 1:
+            raise ValueError("Search path selects several instances; use paths()")
+        return paths[0]
+
+
+def expand_paths(paths: "str | SearchPath | Iterable[str | SearchPath]") -> list[str]:
+    """Flatten plain paths and SearchPaths into a list of USP paths."""
+    if isinstance(paths, str | SearchPath):
+        paths = [paths]
+    expanded = []
+    for path in paths:
+        if isinstance(path, SearchPath):
+            expanded.extend(path.paths())
+        else:
+            expanded.append(path)
+    return expanded
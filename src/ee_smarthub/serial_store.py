@@ -0,0 +1,98 @@
+"""Pluggable storage for router serial numbers, keyed by hostname.
+
+The serial number is needed to address the router's USP Agent and is
+fetched from ``config.json`` over HTTPS.  Persisting it lets new clients and
+restarted processes skip that round trip; ``SmartHubClient`` re-fetches the
+serial if the first request made with a stored value fails.
+"""
+
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Protocol
+
+logger = logging.getLogger(__name__)
+
+
+class SerialStore(Protocol):
+    """Storage backend for router serial numbers."""
+
+    def get(self, hostname: str) -> str | None:
+        """Return the stored serial for ``hostname``, or None."""
+        ...
+
+    def set(self, hostname: str, serial: str) -> None:
+        """Store the serial for ``hostname``."""
+        ...
+
+    def discard(self, hostname: str) -> None:
+        """Forget the serial for ``hostname`` if one is stored."""
+        ...
+
+
+class MemorySerialStore:
+    """Keeps serials in memory; share one instance between clients to reuse them."""
+
+    def __init__(self) -> None:
+        self._serials: dict[str, str] = {}
+
+    def get(self, hostname: str) -> str | None:
+        return self._serials.get(hostname)
+
+    def set(self, hostname: str, serial: str) -> None:
+        self._serials[hostname] = serial
+
+    def discard(self, hostname: str) -> None:
+        self._serials.pop(hostname, None)
+
+
+class JsonFileSerialStore:
+    """Persists serials to a JSON file so they survive process restarts.
+
+    The file is read once on first use and rewritten atomically on change.
+    An unreadable file is treated as empty.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self._path = Path(path).expanduser()
+        self._serials: dict[str, str] | None = None
+
+    def _load(self) -> dict[str, str]:
+        if self._serials is None:
+            try:
+                data = json.loads(self._path.read_text())
+            except FileNotFoundError:
+                data = {}
+            except (OSError, ValueError) as exc:
+                logger.warning(f"Ignoring unreadable serial store {self._path}: {exc}")
+                data = {}
+            if not isinstance(data, dict):
+                data = {}
+            self._serials = {k: v for k, v in data.items() if isinstance(v, str)}
+        return self._serials
+
+    def _save(self) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._path.parent, prefix=".serials-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._serials, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, hostname: str) -> str | None:
+        return self._load().get(hostname)
+
+    def set(self, hostname: str, serial: str) -> None:
+        serials = self._load()
+        if serials.get(hostname) != serial:
+            serials[hostname] = serial
+            self._save()
+
+    def discard(self, hostname: str) -> None:
+        if self._load().pop(hostname, None) is not None:
+            self._save()
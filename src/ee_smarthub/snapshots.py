@@ -0,0 +1,245 @@
+"""Compact on-disk archive of ``get_hosts()`` results.
+
+A snapshot log is an append-only file of length-prefixed frames, one per
+snapshot.  Strings (MAC addresses, hostnames, interface types, ...) are
+stored once, in the frame that first uses them, and referred to by index
+after that, so each host costs a fixed 41 bytes per snapshot however long
+its names are::
+
+    with SnapshotWriter("hosts.snap") as writer:
+        writer.append(await client.get_hosts())
+
+    with SnapshotReader("hosts.snap") as reader:
+        for snapshot in reader.snapshots(since=time.time() - 86400):
+            print(snapshot.timestamp, len(snapshot.hosts))
+
+The reader memory-maps the file and skips frames outside the requested
+time range without decoding their hosts.  A frame left incomplete by a
+crash is ignored by readers and dropped when a writer next opens the file.
+
+Frame layout (little-endian): payload length (u32), then timestamp
+(f64), new string count (u32), host count (u32), the new strings (u32
+length + UTF-8 each) and one fixed-width row per host.
+"""
+
+import mmap
+import os
+import struct
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO
+
+from .models import Host
+
+_MAGIC = b"EESNAP\x00\x01"
+_LENGTH = struct.Struct("<I")
+_FRAME_HEADER = struct.Struct("<dII")
+_ROW = struct.Struct("<6IQQ?")
+"""String indices of mac_address, ip_address, hostname, user_friendly_name,
+interface_type and frequency_band, then bytes_sent, bytes_received, active."""
+_NONE = 0xFFFFFFFF
+"""String index standing for a frequency_band of None."""
+_MAX_COUNTER = 2**64 - 1
+
+
+@dataclass
+class Snapshot:
+    """The hosts reported by a router at one point in time."""
+
+    timestamp: float
+    """Seconds since the epoch, as returned by ``time.time()``."""
+    hosts: list[Host]
+
+
+def _frames(data: "mmap.mmap | bytes", path: Path) -> Iterator[tuple[int, int]]:
+    """Yield the (start, end) payload offsets of each complete frame."""
+    if data[: len(_MAGIC)] != _MAGIC:
+        raise ValueError(f"Not a snapshot log: {path}")
+    offset = len(_MAGIC)
+    size = len(data)
+    while offset + _LENGTH.size <= size:
+        (length,) = _LENGTH.unpack_from(data, offset)
+        start = offset + _LENGTH.size
+        if start + length > size:
+            return
+        yield start, start + length
+        offset = start + length
+
+
+def _read_strings(data: "mmap.mmap | bytes", offset: int, count: int, strings: list[str]) -> int:
+    """Append ``count`` strings stored at ``offset``; return the offset after them."""
+    for _ in range(count):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        strings.append(data[offset : offset + length].decode())
+        offset += length
+    return offset
+
+
+class SnapshotWriter:
+    """Appends snapshots to a snapshot log, creating it if needed."""
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self._path = Path(path).expanduser()
+        self._ids: dict[str, int] = {}
+        self._size = 0
+        self._file: BinaryIO = self._open()
+
+    def _open(self) -> BinaryIO:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        file = open(self._path, "a+b")
+        try:
+            size = os.fstat(file.fileno()).st_size
+            if not size:
+                file.write(_MAGIC)
+                file.flush()
+                self._size = len(_MAGIC)
+                return file
+            strings: list[str] = []
+            end = len(_MAGIC)
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for start, end in _frames(data, self._path):
+                    _, count, _ = _FRAME_HEADER.unpack_from(data, start)
+                    _read_strings(data, start + _FRAME_HEADER.size, count, strings)
+            if end < size:
+                # Drop a frame left incomplete by an interrupted append.
+                file.truncate(end)
+            self._size = end
+            self._ids = {string: i for i, string in enumerate(strings)}
+        except BaseException:
+            file.close()
+            raise
+        return file
+
+    def append(self, hosts: Iterable[Host], timestamp: float | None = None) -> None:
+        """Append a snapshot of ``hosts``, taken now unless ``timestamp`` is given.
+
+        Byte counters outside the unsigned 64-bit range are clamped to it.
+        """
+        ids = self._ids
+        new: dict[str, int] = {}
+        first_new = len(ids)
+
+        def intern(value: str) -> int:
+            index = ids.get(value)
+            if index is None:
+                index = new.get(value)
+                if index is None:
+                    index = new[value] = first_new + len(new)
+            return index
+
+        rows = [
+            _ROW.pack(
+                intern(host.mac_address),
+                intern(host.ip_address),
+                intern(host.hostname),
+                intern(host.user_friendly_name),
+                intern(host.interface_type),
+                _NONE if host.frequency_band is None else intern(host.frequency_band),
+                min(max(host.bytes_sent, 0), _MAX_COUNTER),
+                min(max(host.bytes_received, 0), _MAX_COUNTER),
+                host.active,
+            )
+            for host in hosts
+        ]
+        parts = [
+            _FRAME_HEADER.pack(time.time() if timestamp is None else timestamp, len(new), len(rows))
+        ]
+        for string in new:
+            encoded = string.encode()
+            parts += (_LENGTH.pack(len(encoded)), encoded)
+        parts += rows
+        payload = b"".join(parts)
+        frame = _LENGTH.pack(len(payload)) + payload
+        try:
+            self._file.write(frame)
+            self._file.flush()
+        except BaseException:
+            # Don't leave a partial frame for the next append to follow.
+            self._file.truncate(self._size)
+            raise
+        self._size += len(frame)
+        # Only strings that made it into the file may be referred to later.
+        ids.update(new)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class SnapshotReader:
+    """Reads a snapshot log through a memory map.
+
+    Sees the snapshots that had been written when it was opened.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self._path = Path(path).expanduser()
+        with open(self._path, "rb") as file:
+            if not os.fstat(file.fileno()).st_size:
+                raise ValueError(f"Not a snapshot log: {self._path}")
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def snapshots(
+        self, *, since: float | None = None, until: float | None = None
+    ) -> Iterator[Snapshot]:
+        """Yield the snapshots taken in ``[since, until)``, oldest first.
+
+        Frames outside the range are skipped without decoding their hosts.
+        """
+        data = self._data
+        strings: list[str] = []
+        for start, end in _frames(data, self._path):
+            timestamp, count, _ = _FRAME_HEADER.unpack_from(data, start)
+            rows = _read_strings(data, start + _FRAME_HEADER.size, count, strings)
+            if (since is not None and timestamp < since) or (
+                until is not None and timestamp >= until
+            ):
+                continue
+            hosts = [
+                Host(
+                    mac_address=strings[mac],
+                    ip_address=strings[ip],
+                    hostname=strings[hostname],
+                    user_friendly_name=strings[friendly],
+                    interface_type=strings[interface],
+                    active=active,
+                    frequency_band=None if band == _NONE else strings[band],
+                    bytes_sent=sent,
+                    bytes_received=received,
+                )
+                for mac, ip, hostname, friendly, interface, band, sent, received, active in (
+                    _ROW.iter_unpack(data[rows:end])
+                )
+            ]
+            yield Snapshot(timestamp, hosts)
+
+    def __iter__(self) -> Iterator[Snapshot]:
+        return self.snapshots()
+
+    def close(self) -> None:
+        self._data.close()
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
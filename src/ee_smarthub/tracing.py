@@ -0,0 +1,101 @@
+"""Pluggable per-phase latency tracing for SmartHub requests.
+
+A tracer is any callable accepting a :class:`Span`.  The client reports one
+span per request phase:
+
+- ``fetch_serial`` — HTTPS fetch of ``config.json``
+- ``mqtt.connect`` — TCP, TLS, WebSocket upgrade and MQTT CONNECT
+- ``mqtt.subscribe`` — SUBSCRIBE to the response topic
+- ``mqtt.publish`` — MqttConnectRecord and request publishes, sent back to
+  back with the SUBSCRIBE, until all are acknowledged
+- ``usp.wait`` — waiting for the Agent to process the request and respond
+- ``usp.decode`` — decoding the response into Python objects
+
+Payload sizes are attached as ``request_bytes``/``response_bytes`` attributes.
+"""
+
+import logging
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """Timing of a single request phase."""
+
+    name: str
+    start: float
+    """Wall-clock start time in seconds since the epoch."""
+    duration: float
+    """Elapsed time in seconds, measured with a monotonic clock."""
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: BaseException | None = None
+
+
+Tracer = Callable[[Span], None]
+
+
+class OpenTelemetryTracer:
+    """Adapt an OpenTelemetry ``Tracer`` to the SmartHub tracer interface.
+
+    OpenTelemetry is not a dependency; any object with a compatible
+    ``start_span(name, start_time=..., attributes=...)`` method works.
+    """
+
+    def __init__(self, tracer: Any) -> None:
+        self._tracer = tracer
+
+    def __call__(self, span: Span) -> None:
+        start_ns = int(span.start * 1e9)
+        otel_span = self._tracer.start_span(
+            span.name, start_time=start_ns, attributes=span.attributes
+        )
+        if span.error is not None:
+            otel_span.record_exception(span.error)
+        otel_span.end(end_time=start_ns + int(span.duration * 1e9))
+
+
+@contextmanager
+def _phase(
+    tracer: Tracer | None, name: str, **attributes: Any
+) -> Iterator[dict[str, Any]]:
+    """Time the enclosed block and report it to ``tracer`` as a Span.
+
+    Yields the attribute dict so the block can add attributes (e.g. sizes)
+    that are only known once it has run.
+    """
+    if tracer is None:
+        yield attributes
+        return
+
+    start = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        span = Span(name, start, time.perf_counter() - started, attributes, error)
+        try:
+            tracer(span)
+        except Exception:
+            logger.exception(f"Tracer failed while recording {name!r}")
+
+
+def _bind(tracer: Tracer | None, **attributes: Any) -> Tracer | None:
+    """Wrap ``tracer`` so every span also carries ``attributes``."""
+    if tracer is None:
+        return None
+
+    def bound(span: Span) -> None:
+        span.attributes = {**attributes, **span.attributes}
+        tracer(span)
+
+    return bound
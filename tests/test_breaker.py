@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+import pytest
+
+from ee_smarthub.breaker import CircuitBreaker, CircuitState
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = _Clock()
+    with patch("ee_smarthub.breaker.time.monotonic", clock):
+        yield clock
+
+
+def _failed(breaker, times):
+    for _ in range(times):
+        assert breaker.admit()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    _failed(breaker, 2)
+    assert breaker.state is CircuitState.CLOSED
+
+    _failed(breaker, 1)
+    assert breaker.state is CircuitState.OPEN
+    assert not breaker.admit()
+    assert breaker.retry_after() == 30
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    _failed(breaker, 1)
+    breaker.record_success()
+    _failed(breaker, 1)
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_half_open_admits_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    _failed(breaker, 1)
+    clock.now += 30
+
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert breaker.admit()
+    assert not breaker.admit()
+    breaker.record_success()
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.admit()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    _failed(breaker, 1)
+    clock.now += 30
+    _failed(breaker, 1)
+
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.retry_after() == 30
+
+
+def test_released_probe_can_be_retried(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    _failed(breaker, 1)
+    clock.now += 30
+    assert breaker.admit()
+    breaker.release()
+    assert breaker.admit()
+
+
+def test_invalid_threshold():
+    with pytest.raises(ValueError, match="at least 1"):
+        CircuitBreaker(failure_threshold=0)
@@ -1,12 +1,51 @@
-from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import inspect
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 
 import aiohttp
+import aiomqtt
 import pytest
 
-from ee_smarthub._mqtt import AGENT_ID_PREFIX, CONTROLLER_ID
+from ee_smarthub._mqtt import (
+    AGENT_ID_PREFIX,
+    CONTROLLER_ID,
+    MAX_RESPONSE_BYTES,
+    RESPONSE_TIMEOUT,
+)
+from ee_smarthub.breaker import CircuitBreaker, CircuitState
 from ee_smarthub.client import SmartHubClient
-from ee_smarthub.exceptions import AuthenticationError, CommunicationError, ProtocolError
-from ee_smarthub.models import Host
+from ee_smarthub.datamodel import ParamTypes
+from ee_smarthub.deadline import deadline
+from ee_smarthub.exceptions import (
+    AuthenticationError,
+    CircuitOpenError,
+    CommunicationError,
+    DeadlineExceededError,
+    ProtocolError,
+)
+from ee_smarthub.hedging import HedgePolicy
+from ee_smarthub.metrics import MetricsRegistry
+from ee_smarthub.models import AddResult, DeleteResult, Host, ParameterResult
+from ee_smarthub.proto.usp import (
+    Body,
+    Error,
+    Get,
+    GetResp,
+    Header,
+    HeaderMsgType,
+    Msg,
+    Notify,
+    NotifyOperationComplete,
+    NotifyOperationCompleteOutputArgs,
+    OperateResp,
+    OperateRespOperationResult,
+    OperateRespOperationResultOutputArgs,
+    Request,
+    Response,
+)
+from ee_smarthub.proto.usp_record import NoSessionContextRecord, Record
+from ee_smarthub.query import SearchPath
+from ee_smarthub.serial_store import MemorySerialStore
 
 _SERIAL = "CP2231TEST"
 
@@ -31,6 +70,25 @@ def _mock_response(*, json_data=None, status=200, json_error=None):
     return mock_resp
 
 
+def _mock_connect():
+    """Create a mock for the MQTT connect() context manager."""
+    mqtt = MagicMock()
+    cm = MagicMock()
+    cm.__aenter__ = AsyncMock(return_value=mqtt)
+    cm.__aexit__ = AsyncMock(return_value=False)
+    return patch("ee_smarthub.client.connect", return_value=cm)
+
+
+def _mock_exchange(*, return_value=None, side_effect=None):
+    """Patch the MQTT request exchange used by the client."""
+    return patch(
+        "ee_smarthub.client.exchange",
+        new_callable=AsyncMock,
+        return_value=return_value,
+        side_effect=side_effect,
+    )
+
+
 def _mock_session(mock_resp=None, *, get_error=None):
     """Create a mock aiohttp session."""
     session = MagicMock()
@@ -52,7 +110,7 @@ async def test_validate_connection():
     ):
         await client.validate_connection()
 
-    mock_creds.assert_called_once_with("192.168.1.1", "secret")
+    mock_creds.assert_called_once_with("192.168.1.1", "secret", tracer=None)
 
 
 @pytest.mark.asyncio
@@ -91,9 +149,10 @@ async def test_get_hosts():
 
     with (
         patch.object(client, "_fetch_serial", new_callable=AsyncMock, return_value=_SERIAL),
-        patch("ee_smarthub.client.send_request", new_callable=AsyncMock, return_value=raw_response) as mock_send,
-        patch("ee_smarthub.client.build_get_request", return_value=b"\xaa\xbb") as mock_build,
-        patch("ee_smarthub.client.parse_get_response", return_value=expected_hosts) as mock_parse,
+        _mock_connect(),
+        _mock_exchange(return_value=raw_response) as mock_send,
+        patch("ee_smarthub._usp.build_get_request", return_value=b"\xaa\xbb") as mock_build,
+        patch("ee_smarthub._usp.parse_get_response", return_value=expected_hosts) as mock_parse,
     ):
         hosts = await client.get_hosts()
 
@@ -103,7 +162,16 @@ async def test_get_hosts():
     mock_build.assert_called_once_with(
         to_id=agent_id, from_id=CONTROLLER_ID, path="Device.Hosts.Host."
     )
-    mock_send.assert_called_once_with("192.168.1.1", "secret", _SERIAL, b"\xaa\xbb")
+    mock_send.assert_called_once_with(
+        ANY,
+        _SERIAL,
+        b"\xaa\xbb",
+        timeout=RESPONSE_TIMEOUT,
+        tracer=None,
+        max_response_bytes=MAX_RESPONSE_BYTES,
+        qos=1,
+        retry_interval=None,
+    )
     mock_parse.assert_called_once_with(raw_response)
 
 
@@ -156,3 +224,1018 @@ async def test_fetch_serial_missing_serial():
     client = SmartHubClient("192.168.1.1", "secret", session)
     with pytest.raises(ProtocolError, match="SerialNumber missing"):
         await client._fetch_serial()
+
+
+@pytest.mark.asyncio
+async def test_get_hosts_traces_decode():
+    spans = []
+    session = MagicMock()
+    client = SmartHubClient("192.168.1.1", "secret", session, tracer=spans.append)
+
+    with (
+        patch.object(client, "_fetch_serial", new_callable=AsyncMock, return_value=_SERIAL),
+        _mock_connect(),
+        _mock_exchange(return_value=b"\x01\x02"),
+        patch("ee_smarthub._usp.build_get_request", return_value=b"\xaa\xbb"),
+        patch("ee_smarthub._usp.parse_get_response", return_value=[Host(mac_address="AA:BB:CC:DD:EE:FF")]),
+    ):
+        await client.get_hosts()
+
+    assert [s.name for s in spans] == ["usp.decode"]
+    assert spans[0].attributes == {"hostname": "192.168.1.1", "response_bytes": 2, "results": 1}
+
+
+@pytest.mark.asyncio
+async def test_fetch_serial_uses_shared_store():
+    resp = _mock_response(json_data={"SerialNumber": _SERIAL})
+    session = _mock_session(resp)
+    store = MemorySerialStore()
+
+    first = SmartHubClient("192.168.1.1", "secret", session, serial_store=store)
+    second = SmartHubClient("192.168.1.1", "secret", session, serial_store=store)
+
+    assert await first._fetch_serial() == _SERIAL
+    assert await second._fetch_serial() == _SERIAL
+    session.get.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_stale_stored_serial_is_refreshed():
+    resp = _mock_response(json_data={"SerialNumber": "CP2231NEW"})
+    session = _mock_session(resp)
+    store = MemorySerialStore()
+    store.set("192.168.1.1", "CP2231OLD")
+    client = SmartHubClient("192.168.1.1", "secret", session, serial_store=store)
+
+    with (
+        _mock_connect(),
+        _mock_exchange(side_effect=[CommunicationError("Timed out"), b"\x01"]) as mock_send,
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+    ):
+        await client.get_hosts()
+
+    assert [c.args[1] for c in mock_send.call_args_list] == ["CP2231OLD", "CP2231NEW"]
+    assert store.get("192.168.1.1") == "CP2231NEW"
+
+
+@pytest.mark.asyncio
+async def test_verified_serial_is_not_refreshed():
+    session = _mock_session(get_error=AssertionError("config.json must not be fetched"))
+    store = MemorySerialStore()
+    store.set("192.168.1.1", _SERIAL)
+    client = SmartHubClient("192.168.1.1", "secret", session, serial_store=store)
+
+    with (
+        _mock_connect(),
+        _mock_exchange(side_effect=[b"\x01", CommunicationError("Timed out")]),
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+    ):
+        await client.get_hosts()
+        with pytest.raises(CommunicationError):
+            await client.get_hosts()
+
+
+@pytest.mark.asyncio
+async def test_serial_fetch_overlaps_mqtt_connect():
+    events = []
+    fetch_started = asyncio.Event()
+
+    async def fetch_serial():
+        events.append("fetch started")
+        fetch_started.set()
+        await asyncio.sleep(0)
+        events.append("fetch done")
+        return _SERIAL
+
+    async def enter_connect():
+        events.append("connect started")
+        # Only completes if the serial fetch runs concurrently with connecting.
+        await asyncio.wait_for(fetch_started.wait(), timeout=1)
+        events.append("connected")
+        return MagicMock()
+
+    cm = MagicMock()
+    cm.__aenter__ = AsyncMock(side_effect=enter_connect)
+    cm.__aexit__ = AsyncMock(return_value=False)
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+
+    with (
+        patch.object(client, "_fetch_serial", side_effect=fetch_serial),
+        patch("ee_smarthub.client.connect", return_value=cm),
+        _mock_exchange(return_value=b"\x01") as mock_send,
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+    ):
+        await client.get_hosts()
+
+    assert events.index("fetch started") < events.index("connected")
+    assert mock_send.call_args.args[1] == _SERIAL
+
+
+@pytest.mark.asyncio
+async def test_connect_failure_cancels_serial_fetch():
+    fetch_cancelled = asyncio.Event()
+
+    async def fetch_serial():
+        try:
+            await asyncio.sleep(999)
+        except asyncio.CancelledError:
+            fetch_cancelled.set()
+            raise
+
+    async def enter_connect():
+        await asyncio.sleep(0)  # let the serial fetch start
+        raise AuthenticationError("Router rejected MQTT connection")
+
+    cm = MagicMock()
+    cm.__aenter__ = AsyncMock(side_effect=enter_connect)
+    cm.__aexit__ = AsyncMock(return_value=False)
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+
+    with (
+        patch.object(client, "_fetch_serial", side_effect=fetch_serial),
+        patch("ee_smarthub.client.connect", return_value=cm),
+    ):
+        with pytest.raises(AuthenticationError):
+            await client.get_hosts()
+        await asyncio.wait_for(fetch_cancelled.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_get_hosts_active_only():
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+
+    with (
+        patch.object(client, "_fetch_serial", new_callable=AsyncMock, return_value=_SERIAL),
+        _mock_connect(),
+        _mock_exchange(return_value=b"\x01"),
+        patch("ee_smarthub._usp.build_get_request", return_value=b"\xaa") as mock_build,
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+    ):
+        await client.get_hosts(active_only=True)
+
+    mock_build.assert_called_once_with(
+        to_id=AGENT_ID_PREFIX + _SERIAL,
+        from_id=CONTROLLER_ID,
+        path="Device.Hosts.Host.[Active==true].",
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_params():
+    expected = {"Device.NAT.PortMapping.1.": {"Enable": "true"}}
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+
+    with (
+        patch.object(client, "_fetch_serial", new_callable=AsyncMock, return_value=_SERIAL),
+        _mock_connect(),
+        _mock_exchange(return_value=b"\x01"),
+        patch("ee_smarthub._usp.build_get_request", return_value=b"\xaa") as mock_build,
+        patch("ee_smarthub._usp.parse_get_params", return_value=expected) as mock_parse,
+    ):
+        result = await client.get_params([
+            "Device.DeviceInfo.SoftwareVersion",
+            SearchPath("Device.NAT.PortMapping.").where("Enable", True),
+        ])
+
+    assert result == expected
+    mock_build.assert_called_once_with(
+        to_id=AGENT_ID_PREFIX + _SERIAL,
+        from_id=CONTROLLER_ID,
+        path=["Device.DeviceInfo.SoftwareVersion", "Device.NAT.PortMapping.[Enable==true]."],
+    )
+    mock_parse.assert_called_once_with(b"\x01")
+
+
+@pytest.mark.asyncio
+async def test_get_params_with_types():
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+
+    with (
+        patch.object(client, "_fetch_serial", new_callable=AsyncMock, return_value=_SERIAL),
+        _mock_connect(),
+        _mock_exchange(return_value=b"\x01"),
+        patch("ee_smarthub._usp.build_get_request", return_value=b"\xaa"),
+        patch(
+            "ee_smarthub._usp.parse_get_params",
+            return_value={"Device.NAT.PortMapping.1.": {"Enable": "true", "ExternalPort": "22"}},
+        ),
+    ):
+        result = await client.get_params(
+            "Device.NAT.PortMapping.",
+            types=ParamTypes({"Enable": "boolean", "ExternalPort": "unsignedInt"}),
+        )
+
+    assert result == {"Device.NAT.PortMapping.1.": {"Enable": True, "ExternalPort": 22}}
+
+
+@pytest.mark.asyncio
+async def test_get_params_nothing():
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+    assert await client.get_params(SearchPath("Device.Hosts.Host.").instances([])) == {}
+
+
+@pytest.mark.asyncio
+async def test_set_params():
+    updates = {"Device.Hosts.Host.1.X_BT-COM_UserHostName": "Kitchen"}
+    expected = [ParameterResult("Device.Hosts.Host.1.X_BT-COM_UserHostName", True, "Kitchen")]
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+
+    with (
+        patch.object(client, "_fetch_serial", new_callable=AsyncMock, return_value=_SERIAL),
+        _mock_connect(),
+        _mock_exchange(return_value=b"\x01") as mock_send,
+        patch("ee_smarthub._usp.build_set_request", return_value=b"\xaa") as mock_build,
+        patch("ee_smarthub._usp.parse_set_response", return_value=expected) as mock_parse,
+    ):
+        results = await client.set_params(updates, allow_partial=True)
+
+    assert results == expected
+    mock_build.assert_called_once_with(
+        AGENT_ID_PREFIX + _SERIAL, CONTROLLER_ID, updates, allow_partial=True
+    )
+    mock_send.assert_called_once_with(
+        ANY,
+        _SERIAL,
+        b"\xaa",
+        timeout=RESPONSE_TIMEOUT,
+        tracer=None,
+        max_response_bytes=MAX_RESPONSE_BYTES,
+        qos=1,
+        retry_interval=None,
+    )
+    mock_parse.assert_called_once_with(b"\x01", updates)
+
+
+@pytest.mark.asyncio
+async def test_set_params_empty():
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+    assert await client.set_params({}) == []
+
+
+@pytest.mark.asyncio
+async def test_add_objects():
+    objects = [("Device.NAT.PortMapping.", {"ExternalPort": "8080"})]
+    expected = [AddResult("Device.NAT.PortMapping.", True, "Device.NAT.PortMapping.4.")]
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+
+    with (
+        patch.object(client, "_fetch_serial", new_callable=AsyncMock, return_value=_SERIAL),
+        _mock_connect(),
+        _mock_exchange(return_value=b"\x01") as mock_send,
+        patch("ee_smarthub._usp.build_add_request", return_value=b"\xaa") as mock_build,
+        patch("ee_smarthub._usp.parse_add_response", return_value=expected),
+    ):
+        results = await client.add_objects(iter(objects), allow_partial=True)
+
+    assert results == expected
+    mock_build.assert_called_once_with(
+        AGENT_ID_PREFIX + _SERIAL, CONTROLLER_ID, objects, allow_partial=True
+    )
+    mock_send.assert_called_once_with(
+        ANY,
+        _SERIAL,
+        b"\xaa",
+        timeout=RESPONSE_TIMEOUT,
+        tracer=None,
+        max_response_bytes=MAX_RESPONSE_BYTES,
+        qos=1,
+        retry_interval=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_delete_objects():
+    paths = ["Device.NAT.PortMapping.4."]
+    expected = [DeleteResult("Device.NAT.PortMapping.4.", True, ["Device.NAT.PortMapping.4."])]
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+
+    with (
+        patch.object(client, "_fetch_serial", new_callable=AsyncMock, return_value=_SERIAL),
+        _mock_connect(),
+        _mock_exchange(return_value=b"\x01"),
+        patch("ee_smarthub._usp.build_delete_request", return_value=b"\xaa") as mock_build,
+        patch("ee_smarthub._usp.parse_delete_response", return_value=expected),
+    ):
+        results = await client.delete_objects(paths)
+
+    assert results == expected
+    mock_build.assert_called_once_with(
+        AGENT_ID_PREFIX + _SERIAL, CONTROLLER_ID, paths, allow_partial=False
+    )
+
+
+@pytest.mark.asyncio
+async def test_add_and_delete_nothing():
+    client = SmartHubClient("192.168.1.1", "secret", MagicMock())
+    assert await client.add_objects([]) == []
+    assert await client.delete_objects([]) == []
+
+
+class _FakeConnection:
+    """Stand-in for UspConnection that answers requests with ``respond``."""
+
+    instances: list["_FakeConnection"] = []
+    respond = None
+
+    def __init__(self, hostname, password, *, tracer=None, on_message=None, **kwargs):
+        self.on_message = on_message
+        self.serial = None
+        self.closed = False
+        self.requests: list[bytes] = []
+        self.retry_intervals: list[float | None] = []
+        self.published: list[bytes] = []
+        self._lost = asyncio.Event()
+        _FakeConnection.instances.append(self)
+
+    async def connect(self):
+        pass
+
+    async def start(self, serial):
+        self.serial = serial
+
+    async def request(self, payload, *, timeout=10.0, qos=1, retry_interval=None):
+        self.requests.append(payload)
+        self.retry_intervals.append(retry_interval)
+        response = type(self).respond(self, payload)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+    async def publish(self, payload, *, qos=1):
+        self.published.append(payload)
+
+    async def wait_closed(self):
+        await self._lost.wait()
+
+    def lose(self):
+        self.closed = True
+        self._lost.set()
+
+    async def close(self):
+        self.closed = True
+
+
+def _fake_connection(respond):
+    _FakeConnection.instances = []
+    return patch(
+        "ee_smarthub.client.UspConnection",
+        type("FakeConnection", (_FakeConnection,), {"respond": staticmethod(respond)}),
+    )
+
+
+def _operate_command_key(payload: bytes) -> str:
+    msg = Msg().parse(Record().parse(payload).no_session_context.payload)
+    return msg.body.request.operate.command_key
+
+
+def _record(msg: Msg) -> bytes:
+    return bytes(Record(
+        version="1.4",
+        to_id=CONTROLLER_ID,
+        from_id=AGENT_ID_PREFIX + _SERIAL,
+        no_session_context=NoSessionContextRecord(payload=bytes(msg)),
+    ))
+
+
+def _operate_resp(msg_id: str, result: OperateRespOperationResult) -> bytes:
+    return _record(Msg(
+        header=Header(msg_id=msg_id, msg_type=HeaderMsgType.OPERATE_RESP),
+        body=Body(response=Response(operate_resp=OperateResp(operation_results=[result]))),
+    ))
+
+
+def _oper_complete(command_key: str, output_args: dict[str, str]) -> bytes:
+    notify = Notify(
+        subscription_id="sub-1",
+        send_resp=True,
+        oper_complete=NotifyOperationComplete(
+            obj_path="Device.IP.Diagnostics.",
+            command_name="IPPing()",
+            command_key=command_key,
+            req_output_args=NotifyOperationCompleteOutputArgs(output_args=output_args),
+        ),
+    )
+    return _record(Msg(
+        header=Header(msg_id="notify-1", msg_type=HeaderMsgType.NOTIFY),
+        body=Body(request=Request(notify=notify)),
+    ))
+
+
+def _stored_client(**kwargs) -> SmartHubClient:
+    store = MemorySerialStore()
+    store.set("192.168.1.1", _SERIAL)
+    return SmartHubClient("192.168.1.1", "secret", MagicMock(), serial_store=store, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_operate_sync_command():
+    def respond(connection, payload):
+        return _operate_resp("op", OperateRespOperationResult(
+            executed_command="Device.Reboot()",
+            req_output_args=OperateRespOperationResultOutputArgs(output_args={"Status": "ok"}),
+        ))
+
+    client = _stored_client()
+    with _fake_connection(respond):
+        results = await client.operate("Device.Reboot()")
+
+    assert [(r.command, r.completed, r.output_args) for r in results] == [
+        ("Device.Reboot()", True, {"Status": "ok"}),
+    ]
+    # A non-persistent client closes the connection afterwards.
+    assert _FakeConnection.instances[0].closed
+
+
+@pytest.mark.asyncio
+async def test_operate_waits_for_operation_complete():
+    def respond(connection, payload):
+        command_key = _operate_command_key(payload)
+        asyncio.get_running_loop().call_soon(
+            connection.on_message, _oper_complete(command_key, {"AverageResponseTime": "12"})
+        )
+        return _operate_resp("op", OperateRespOperationResult(
+            executed_command="Device.IP.Diagnostics.IPPing()",
+            req_obj_path="Device.LocalAgent.Request.1",
+        ))
+
+    client = _stored_client()
+    with _fake_connection(respond):
+        results = await client.operate("Device.IP.Diagnostics.IPPing()", {"Host": "1.1.1.1"})
+        await asyncio.sleep(0)  # let the NotifyResp publish run
+
+    assert results[0].completed
+    assert results[0].output_args == {"AverageResponseTime": "12"}
+    ack = Msg().parse(Record().parse(_FakeConnection.instances[0].published[0]).no_session_context.payload)
+    assert ack.header.msg_type == HeaderMsgType.NOTIFY_RESP
+    assert ack.header.msg_id == "notify-1"
+
+
+@pytest.mark.asyncio
+async def test_operate_without_wait():
+    def respond(connection, payload):
+        return _operate_resp("op", OperateRespOperationResult(
+            executed_command="Device.IP.Diagnostics.IPPing()",
+            req_obj_path="Device.LocalAgent.Request.1",
+        ))
+
+    client = _stored_client()
+    with _fake_connection(respond):
+        results = await client.operate("Device.IP.Diagnostics.IPPing()", wait=False)
+
+    assert results[0].completed is False
+
+
+@pytest.mark.asyncio
+async def test_operate_completion_timeout():
+    def respond(connection, payload):
+        return _operate_resp("op", OperateRespOperationResult(
+            executed_command="Device.IP.Diagnostics.IPPing()",
+            req_obj_path="Device.LocalAgent.Request.1",
+        ))
+
+    client = _stored_client()
+    with _fake_connection(respond):
+        with pytest.raises(DeadlineExceededError, match="IPPing\\(\\) to complete"):
+            await client.operate("Device.IP.Diagnostics.IPPing()", timeout=0.05)
+
+
+@pytest.mark.asyncio
+async def test_operate_waits_within_enclosing_deadline():
+    def respond(connection, payload):
+        return _operate_resp("op", OperateRespOperationResult(
+            executed_command="Device.IP.Diagnostics.IPPing()",
+            req_obj_path="Device.LocalAgent.Request.1",
+        ))
+
+    client = _stored_client()
+    with _fake_connection(respond), deadline(0.05):
+        with pytest.raises(DeadlineExceededError, match="IPPing\\(\\) to complete"):
+            await client.operate("Device.IP.Diagnostics.IPPing()")
+
+
+@pytest.mark.asyncio
+async def test_operate_connection_lost():
+    def respond(connection, payload):
+        asyncio.get_running_loop().call_soon(connection.lose)
+        return _operate_resp("op", OperateRespOperationResult(
+            executed_command="Device.IP.Diagnostics.IPPing()",
+            req_obj_path="Device.LocalAgent.Request.1",
+        ))
+
+    client = _stored_client()
+    with _fake_connection(respond):
+        with pytest.raises(CommunicationError, match="connection lost"):
+            await client.operate("Device.IP.Diagnostics.IPPing()")
+
+
+@pytest.mark.asyncio
+async def test_persistent_client_reuses_connection():
+    registry = MetricsRegistry()
+    client = _stored_client(persistent=True, metrics=registry)
+
+    with (
+        _fake_connection(lambda connection, payload: b"\x01"),
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+    ):
+        await client.get_hosts()
+        await client.get_hosts()
+        assert len(_FakeConnection.instances) == 1
+        assert not _FakeConnection.instances[0].closed
+        assert client.connected
+        await client.aclose()
+        assert not client.connected
+
+    assert _FakeConnection.instances[0].closed
+    assert client._metrics.connections.value(reused="true") == 1
+
+
+def _respond_ipping(delay: float | None):
+    """Answer an IPPing Operate, completing it ``delay`` seconds later."""
+
+    def respond(connection, payload):
+        if delay is not None:
+            asyncio.get_running_loop().call_later(
+                delay, connection.on_message, _oper_complete(_operate_command_key(payload), {})
+            )
+        return _operate_resp("op", OperateRespOperationResult(
+            executed_command="Device.IP.Diagnostics.IPPing()",
+            req_obj_path="Device.LocalAgent.Request.1",
+        ))
+
+    return respond
+
+
+@pytest.mark.asyncio
+async def test_context_manager_closes_persistent_connection():
+    with (
+        _fake_connection(lambda connection, payload: b"\x01"),
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+    ):
+        async with _stored_client(persistent=True) as client:
+            await client.get_hosts()
+            assert client.connected
+
+    assert not client.connected
+    assert _FakeConnection.instances[0].closed
+
+
+@pytest.mark.asyncio
+async def test_aclose_drains_in_flight_requests():
+    client = _stored_client(persistent=True)
+    with _fake_connection(_respond_ipping(delay=0.05)):
+        task = asyncio.create_task(client.operate("Device.IP.Diagnostics.IPPing()"))
+        await asyncio.sleep(0.01)
+        await client.aclose()
+
+        assert task.done()
+        assert (await task)[0].completed
+    assert _FakeConnection.instances[0].closed
+
+
+@pytest.mark.asyncio
+async def test_aclose_gives_up_after_drain_timeout():
+    client = _stored_client(persistent=True)
+    with _fake_connection(_respond_ipping(delay=None)):
+        task = asyncio.create_task(client.operate("Device.IP.Diagnostics.IPPing()"))
+        await asyncio.sleep(0.01)
+        await client.aclose(drain_timeout=0.05)
+
+        assert not task.done()
+        assert _FakeConnection.instances[0].closed
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_closed_client_refuses_requests():
+    client = _stored_client()
+    await client.aclose()
+
+    with pytest.raises(RuntimeError, match="closed"):
+        await client.get_hosts()
+
+
+@pytest.mark.asyncio
+async def test_timeout_covers_serial_fetch():
+    async def slow_json(**kwargs):
+        await asyncio.sleep(1)
+
+    mock_resp = _mock_response()
+    mock_resp.json = slow_json
+    client = SmartHubClient("192.168.1.1", "secret", _mock_session(mock_resp))
+
+    with _mock_connect(), _mock_exchange() as mock_send:
+        with pytest.raises(DeadlineExceededError, match="0.1s deadline"):
+            await client.get_hosts(timeout=0.1)
+    mock_send.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_timeout_replaces_response_wait():
+    async def slow_exchange(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    client = _stored_client()
+    with _mock_connect(), _mock_exchange(side_effect=slow_exchange) as mock_send:
+        with pytest.raises(DeadlineExceededError):
+            await client.get_hosts(timeout=0.05)
+    # The deadline, not the fixed response timeout, bounds the wait.
+    assert mock_send.call_args.kwargs["timeout"] is None
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_fails_fast():
+    client = _stored_client()
+    with _mock_connect() as mock_connect, deadline(0.0):
+        with pytest.raises(DeadlineExceededError, match="not started"):
+            await client.get_hosts()
+    mock_connect.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_concurrent_calls():
+    async def exchange(mqtt, serial, request, **kwargs):
+        await asyncio.sleep(0.01 if serial == _SERIAL else 1)
+        return b"\x01"
+
+    fast = _stored_client()
+    slow = SmartHubClient("192.168.1.2", "secret", MagicMock(), serial_store=MemorySerialStore())
+    slow._serial_store.set("192.168.1.2", "OTHER")
+    with (
+        _mock_connect(),
+        _mock_exchange(side_effect=exchange),
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+        deadline(0.2),
+    ):
+        results = await asyncio.gather(
+            fast.get_hosts(), slow.get_hosts(), return_exceptions=True
+        )
+
+    assert results[0] == []
+    assert isinstance(results[1], DeadlineExceededError)
+
+
+@pytest.mark.asyncio
+async def test_hedge_requires_persistent_client():
+    with pytest.raises(ValueError, match="persistent"):
+        _stored_client(hedge=HedgePolicy())
+
+
+@pytest.mark.asyncio
+async def test_hedged_get_uses_first_response():
+    registry = MetricsRegistry()
+    client = _stored_client(
+        persistent=True, metrics=registry, hedge=HedgePolicy(initial_delay=0.02)
+    )
+
+    async def respond(connection, payload):
+        if len(connection.requests) == 1:
+            await asyncio.sleep(1)
+        return payload
+
+    with (
+        _fake_connection(respond),
+        patch("ee_smarthub._usp.parse_get_response", side_effect=lambda data: [data]),
+    ):
+        [response] = await client.get_hosts()
+        await client.aclose()
+
+    connection = _FakeConnection.instances[0]
+    assert len(connection.requests) == 2
+    assert response == connection.requests[1]
+    assert client._metrics.hedges.value(winner="hedge") == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_qos0_gets_are_resent():
+    client = _stored_client(
+        persistent=True, read_qos=0, hedge=HedgePolicy(initial_delay=0.02)
+    )
+
+    async def respond(connection, payload):
+        if len(connection.requests) == 1:
+            await asyncio.sleep(1)
+        return payload
+
+    with (
+        _fake_connection(respond),
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+    ):
+        await client.get_hosts()
+        await client.aclose()
+
+    assert _FakeConnection.instances[0].retry_intervals == [2.0, 2.0]
+
+
+@pytest.mark.asyncio
+async def test_fast_response_is_not_hedged():
+    registry = MetricsRegistry()
+    client = _stored_client(persistent=True, metrics=registry, hedge=HedgePolicy())
+
+    with (
+        _fake_connection(lambda connection, payload: payload),
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+    ):
+        await client.get_hosts()
+        await client.aclose()
+
+    assert len(_FakeConnection.instances[0].requests) == 1
+    assert client._metrics.hedges.value(winner="hedge") == 0
+    assert client._metrics.hedges.value(winner="original") == 0
+
+
+@pytest.mark.asyncio
+async def test_hedge_survives_failed_copy():
+    client = _stored_client(persistent=True, hedge=HedgePolicy(initial_delay=0.02))
+
+    async def respond(connection, payload):
+        if len(connection.requests) == 1:
+            await asyncio.sleep(0.05)
+            raise CommunicationError("Timed out waiting for USP response")
+        await asyncio.sleep(0.1)
+        return payload
+
+    with (
+        _fake_connection(respond),
+        patch("ee_smarthub._usp.parse_get_response", side_effect=lambda data: [data]),
+    ):
+        [response] = await client.get_hosts()
+        await client.aclose()
+
+    assert response == _FakeConnection.instances[0].requests[1]
+
+
+@pytest.mark.asyncio
+async def test_writes_are_not_hedged():
+    client = _stored_client(persistent=True, hedge=HedgePolicy(initial_delay=0.01))
+
+    async def respond(connection, payload):
+        await asyncio.sleep(0.05)
+        return payload
+
+    with (
+        _fake_connection(respond),
+        patch("ee_smarthub._usp.parse_set_response", return_value=[]),
+    ):
+        await client.set_params({"Device.Hosts.Host.1.X_BT-COM_UserHostName": "TV"})
+        await client.aclose()
+
+    assert len(_FakeConnection.instances[0].requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast():
+    registry = MetricsRegistry()
+    client = _stored_client(
+        metrics=registry, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    )
+    client._serial_verified = True  # no config.json re-fetch on failure
+    offline = CommunicationError("Timed out waiting for USP response")
+
+    with _mock_connect() as mock_connect, _mock_exchange(side_effect=offline):
+        for _ in range(2):
+            with pytest.raises(CommunicationError, match="Timed out"):
+                await client.get_hosts()
+        with pytest.raises(CircuitOpenError, match="after 2 failure"):
+            await client.get_hosts()
+
+    assert mock_connect.call_count == 2
+    assert client._metrics.circuit_rejections.value() == 1
+    assert client._metrics.circuit_transitions.value(state="open") == 1
+
+
+@pytest.mark.asyncio
+async def test_protocol_errors_do_not_open_circuit():
+    client = _stored_client(breaker=CircuitBreaker(failure_threshold=1))
+
+    with _mock_connect(), _mock_exchange(return_value=b"\x01"):
+        with patch("ee_smarthub._usp.parse_get_response", side_effect=ProtocolError("bad")):
+            with pytest.raises(ProtocolError):
+                await client.get_hosts()
+
+    assert client._breaker.state is CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_dropped_mqtt_link_counts_as_circuit_failure():
+    client = _stored_client(persistent=True, breaker=CircuitBreaker(failure_threshold=1))
+    client._serial_verified = True
+
+    async def no_messages():
+        await asyncio.Event().wait()
+        yield
+
+    mqtt = MagicMock()
+    mqtt.__aenter__ = AsyncMock(return_value=mqtt)
+    mqtt.__aexit__ = AsyncMock(return_value=False)
+    mqtt.subscribe = mqtt.unsubscribe = AsyncMock()
+    mqtt.messages = no_messages()
+    # The connect record goes out; the request finds the link gone.
+    mqtt.publish = AsyncMock(
+        side_effect=[None, aiomqtt.MqttCodeError(4, "Could not publish message"), None]
+    )
+
+    with patch("ee_smarthub._mqtt.aiomqtt.Client", return_value=mqtt):
+        with pytest.raises(CommunicationError):
+            await client.get_hosts()
+        await client.aclose()
+
+    assert client._breaker.failures == 1
+    assert client._breaker.state is CircuitState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_half_open_circuit_probes_before_request():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    client = _stored_client(breaker=breaker)
+
+    with (
+        patch("ee_smarthub.client.test_credentials", new_callable=AsyncMock) as probe,
+        _mock_connect(),
+        _mock_exchange(return_value=b"\x01"),
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+    ):
+        assert await client.get_hosts() == []
+
+    probe.assert_awaited_once_with("192.168.1.1", "secret", tracer=None)
+    assert breaker.state is CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_failed_probe_skips_request():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    client = _stored_client(breaker=breaker)
+
+    with (
+        patch(
+            "ee_smarthub.client.test_credentials",
+            new_callable=AsyncMock,
+            side_effect=CommunicationError("MQTT communication failed"),
+        ),
+        _mock_connect() as mock_connect,
+    ):
+        with pytest.raises(CommunicationError, match="MQTT communication failed"):
+            await client.get_hosts()
+
+    mock_connect.assert_not_called()
+    assert breaker.failures == 2
+
+
+@pytest.mark.asyncio
+async def test_validate_connection_hands_connection_to_next_request():
+    registry = MetricsRegistry()
+    client = _stored_client(metrics=registry)
+
+    with (
+        _fake_connection(lambda connection, payload: b"\x01"),
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+        patch("ee_smarthub.client.test_credentials", new_callable=AsyncMock) as creds,
+    ):
+        await client.validate_connection(keep_connection=True)
+        assert client.connected
+        await client.get_hosts()
+
+    creds.assert_not_awaited()
+    [connection] = _FakeConnection.instances
+    assert connection.serial == _SERIAL
+    assert len(connection.requests) == 1
+    # Not persistent: the connection is closed once it has been used.
+    assert connection.closed
+    assert not client.connected
+    assert client._metrics.connections.value(reused="true") == 1
+
+
+@pytest.mark.asyncio
+async def test_unused_validated_connection_is_closed():
+    client = _stored_client()
+
+    with (
+        _fake_connection(lambda connection, payload: b"\x01"),
+        patch("ee_smarthub.client._WARM_CONNECTION_TIMEOUT", 0.01),
+    ):
+        await client.validate_connection(keep_connection=True)
+        await asyncio.sleep(0.05)
+
+    assert _FakeConnection.instances[0].closed
+    assert not client.connected
+
+
+@pytest.mark.asyncio
+async def test_closed_client_does_not_keep_validated_connection():
+    client = _stored_client(persistent=True)
+    await client.aclose()
+
+    with _fake_connection(lambda connection, payload: b"\x01"):
+        with pytest.raises(RuntimeError, match="closed"):
+            await client.validate_connection(keep_connection=True)
+
+    assert _FakeConnection.instances == []
+    assert not client.connected
+
+
+@pytest.mark.asyncio
+async def test_read_qos_applies_to_gets_only():
+    client = _stored_client(read_qos=0)
+
+    with (
+        _mock_connect(),
+        _mock_exchange(return_value=b"\x01") as mock_send,
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+        patch("ee_smarthub._usp.parse_set_response", return_value=[]),
+    ):
+        await client.get_hosts()
+        await client.set_params({"Device.Hosts.Host.1.X_BT-COM_UserHostName": "TV"})
+
+    get, set_ = mock_send.call_args_list
+    assert (get.kwargs["qos"], get.kwargs["retry_interval"]) == (0, 2.0)
+    assert (set_.kwargs["qos"], set_.kwargs["retry_interval"]) == (1, None)
+
+
+def test_invalid_read_qos():
+    with pytest.raises(ValueError, match="read_qos"):
+        _stored_client(read_qos=2)
+
+
+def _get_resp_for(payload: bytes) -> bytes:
+    """Answer the Get in ``payload`` with an empty GetResp."""
+    msg_id = Msg().parse(Record().parse(payload).no_session_context.payload).header.msg_id
+    return _record(Msg(
+        header=Header(msg_id=msg_id, msg_type=HeaderMsgType.GET_RESP),
+        body=Body(response=Response(get_resp=GetResp())),
+    ))
+
+
+def _get_msg(msg_id: str = "custom-1") -> Msg:
+    return Msg(
+        header=Header(msg_id=msg_id, msg_type=HeaderMsgType.GET),
+        body=Body(request=Request(get=Get(param_paths=["Device.DeviceInfo."]))),
+    )
+
+
+@pytest.mark.asyncio
+async def test_request_sends_msg_and_returns_response():
+    registry = MetricsRegistry()
+    client = _stored_client(persistent=True, metrics=registry)
+
+    with _fake_connection(lambda connection, payload: _get_resp_for(payload)):
+        response = await client.request(_get_msg())
+        await client.aclose()
+
+    [sent] = _FakeConnection.instances[0].requests
+    record = Record().parse(sent)
+    assert (record.to_id, record.from_id) == (AGENT_ID_PREFIX + _SERIAL, CONTROLLER_ID)
+    assert Msg().parse(record.no_session_context.payload) == _get_msg()
+    assert response.header.msg_id == "custom-1"
+    assert response.body.response.get_resp is not None
+    assert client._metrics.requests.value(type="get") == 1
+
+
+@pytest.mark.asyncio
+async def test_request_raises_on_usp_error():
+    def respond(connection, payload):
+        return _record(Msg(
+            header=Header(msg_id="custom-1", msg_type=HeaderMsgType.ERROR),
+            body=Body(error=Error(err_code=7004, err_msg="Invalid path")),
+        ))
+
+    client = _stored_client(persistent=True)
+    with _fake_connection(respond):
+        with pytest.raises(ProtocolError, match="7004: Invalid path"):
+            await client.request(_get_msg())
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_request_requires_msg_id():
+    with pytest.raises(ValueError, match="msg_id"):
+        await _stored_client().request(_get_msg(msg_id=""))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("msg", [bytes(_get_msg(msg_id="")), b""])
+async def test_request_raw_requires_msg_id(msg):
+    with pytest.raises(ValueError, match="msg_id"):
+        await _stored_client().request_raw(msg)
+
+
+@pytest.mark.asyncio
+async def test_request_raw_returns_encoded_msg():
+    client = _stored_client(persistent=True)
+
+    with _fake_connection(lambda connection, payload: _get_resp_for(payload)):
+        response = await client.request_raw(bytes(_get_msg()))
+        await client.aclose()
+
+    [sent] = _FakeConnection.instances[0].requests
+    assert Record().parse(sent).no_session_context.payload == bytes(_get_msg())
+    assert Msg().parse(response).header.msg_type == HeaderMsgType.GET_RESP
+
+
+@pytest.mark.asyncio
+async def test_request_raw_rejects_other_records():
+    client = _stored_client()
+
+    with _mock_connect(), _mock_exchange(return_value=bytes(Record(version="1.4"))):
+        with pytest.raises(ProtocolError, match="no_session_context"):
+            await client.request_raw(bytes(_get_msg()))
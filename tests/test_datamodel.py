@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from ee_smarthub.datamodel import HOST_TYPES, ParamTypes, converter_for
+
+
+@pytest.mark.parametrize(
+    ("type_name", "value", "expected"),
+    [
+        ("boolean", "true", True),
+        ("boolean", "0", False),
+        ("int", "-5", -5),
+        ("unsignedInt", "80", 80),
+        ("unsignedLong", "18446744073709551615", 2**64 - 1),
+        ("decimal", "1.5", 1.5),
+        ("dateTime", "2026-03-01T12:30:00Z", datetime(2026, 3, 1, 12, 30, tzinfo=timezone.utc)),
+        ("hexBinary", "0aff", b"\x0a\xff"),
+        ("base64", "aGk=", b"hi"),
+        ("list", "a, b,c", ["a", "b", "c"]),
+        ("list", "", []),
+        ("list of unsignedInt", "1,6,11", [1, 6, 11]),
+    ],
+)
+def test_converters(type_name, value, expected):
+    assert converter_for(type_name)(value) == expected
+
+
+@pytest.mark.parametrize(
+    ("type_name", "value"),
+    [("boolean", "yes"), ("unsignedInt", "-1"), ("int", ""), ("dateTime", "soon")],
+)
+def test_converters_reject_invalid_values(type_name, value):
+    with pytest.raises(ValueError):
+        converter_for(type_name)(value)
+
+
+def test_unknown_type():
+    with pytest.raises(ValueError, match="Unknown parameter type"):
+        converter_for("list of widgets")
+
+
+def test_convert_leaves_undeclared_params_as_strings():
+    types = ParamTypes({"Enable": "boolean", "ExternalPort": "unsignedInt"})
+    assert types.convert({"Enable": "1", "ExternalPort": "oops", "Description": "ssh"}) == {
+        "Enable": True,
+        "ExternalPort": None,
+        "Description": "ssh",
+    }
+
+
+def test_convert_all():
+    objects = {
+        "Device.Hosts.Host.1.": {"Active": "1", "HostName": "laptop"},
+        "Device.Hosts.Host.1.WANStats.": {"BytesSent": "1024"},
+    }
+    assert HOST_TYPES.convert_all(objects) == {
+        "Device.Hosts.Host.1.": {"Active": True, "HostName": "laptop"},
+        "Device.Hosts.Host.1.WANStats.": {"BytesSent": 1024},
+    }
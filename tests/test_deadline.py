@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import pytest
+
+from ee_smarthub.deadline import _enforce, current_deadline, deadline
+from ee_smarthub.exceptions import CommunicationError, DeadlineExceededError
+
+
+def test_no_deadline_by_default():
+    assert current_deadline() is None
+    with deadline(None) as budget:
+        assert budget is None
+
+
+def test_deadline_is_scoped_to_block():
+    with deadline(5.0) as budget:
+        assert current_deadline() is budget
+        assert 4.0 < budget.remaining() <= 5.0
+    assert current_deadline() is None
+
+
+def test_inner_deadline_can_only_shorten():
+    with deadline(5.0) as outer:
+        with deadline(10.0) as inner:
+            assert inner is outer
+        with deadline(1.0) as inner:
+            assert inner.remaining() <= 1.0
+            assert current_deadline() is inner
+        with deadline(None) as inner:
+            assert inner is outer
+        assert current_deadline() is outer
+
+
+@pytest.mark.asyncio
+async def test_deadline_propagates_to_tasks():
+    async def remaining():
+        return current_deadline().remaining()
+
+    with deadline(5.0):
+        results = await asyncio.gather(remaining(), remaining())
+    assert all(0 < r <= 5.0 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_enforce_without_deadline_does_nothing():
+    async with _enforce("Request"):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_enforce_cancels_on_expiry():
+    with deadline(0.05):
+        with pytest.raises(DeadlineExceededError, match="Request did not finish within"):
+            async with _enforce("Request"):
+                await asyncio.sleep(1)
+
+
+@pytest.mark.asyncio
+async def test_enforce_fails_fast_when_expired():
+    with deadline(0.0):
+        with pytest.raises(DeadlineExceededError, match="not started"):
+            async with _enforce("Request"):
+                pytest.fail("should not run")
+
+
+@pytest.mark.asyncio
+async def test_enforce_reports_inner_timeout_at_deadline():
+    with deadline(0.01):
+        with pytest.raises(DeadlineExceededError, match="Timed out waiting"):
+            async with _enforce("Request"):
+                time.sleep(0.02)  # past the deadline without yielding
+                raise CommunicationError("Timed out waiting for USP response")
+
+
+@pytest.mark.asyncio
+async def test_enforce_passes_other_errors_through():
+    with deadline(5.0):
+        with pytest.raises(CommunicationError) as info:
+            async with _enforce("Request"):
+                raise CommunicationError("MQTT communication failed")
+    assert not isinstance(info.value, DeadlineExceededError)
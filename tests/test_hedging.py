@@ -0,0 +1,37 @@
+import pytest
+
+from ee_smarthub.hedging import HedgePolicy
+
+
+def test_initial_delay_until_enough_samples():
+    policy = HedgePolicy(initial_delay=0.5, min_samples=3)
+    policy.observe(0.1)
+    policy.observe(0.1)
+    assert policy.delay() == 0.5
+
+
+def test_delay_tracks_percentile():
+    policy = HedgePolicy(percentile=95, min_samples=1)
+    for ms in range(1, 101):
+        policy.observe(ms / 1000)
+    assert policy.delay() == pytest.approx(0.095)
+
+
+def test_delay_uses_recent_window():
+    policy = HedgePolicy(percentile=50, window=10, min_samples=1)
+    for _ in range(10):
+        policy.observe(5.0)
+    for _ in range(10):
+        policy.observe(0.2)
+    assert policy.delay() == 0.2
+
+
+def test_delay_has_floor():
+    policy = HedgePolicy(min_delay=0.05, min_samples=1)
+    policy.observe(0.001)
+    assert policy.delay() == 0.05
+
+
+def test_invalid_percentile():
+    with pytest.raises(ValueError, match="Percentile"):
+        HedgePolicy(percentile=0)
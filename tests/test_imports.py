@@ -0,0 +1,24 @@
+import subprocess
+import sys
+
+
+def _loaded_modules(statement: str) -> set[str]:
+    result = subprocess.run(
+        [sys.executable, "-c", f"{statement}; import sys; print('\\n'.join(sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.split())
+
+
+def test_package_import_does_not_load_protobuf():
+    modules = _loaded_modules("import ee_smarthub")
+    assert "ee_smarthub.proto.usp" not in modules
+    assert "ee_smarthub.proto.usp_record" not in modules
+    assert "betterproto2" not in modules
+
+
+def test_usp_codec_loads_protobuf():
+    modules = _loaded_modules("import ee_smarthub._usp")
+    assert "ee_smarthub.proto.usp" in modules
@@ -0,0 +1,114 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ee_smarthub.client import SmartHubClient
+from ee_smarthub.exceptions import CommunicationError
+from ee_smarthub.metrics import MetricsRegistry, _ClientMetrics
+from ee_smarthub.serial_store import MemorySerialStore
+
+from test_client import _mock_connect, _mock_exchange
+
+
+def test_counter_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests.")
+
+    counter.inc(type="get")
+    counter.inc(2, type="get")
+    counter.inc(type="set")
+
+    assert counter.value(type="get") == 3
+    assert counter.value(type="set") == 1
+    assert counter.value(type="add") == 0
+
+
+def test_registry_returns_existing_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("a_total", "A.") is registry.counter("a_total", "A.")
+
+
+def test_registry_rejects_type_conflict():
+    registry = MetricsRegistry()
+    registry.counter("a_total", "A.")
+    with pytest.raises(ValueError, match="already registered"):
+        registry.histogram("a_total", "A.")
+
+
+def test_histogram_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5.0)
+
+    assert histogram.count() == 3
+    assert histogram.sum() == pytest.approx(5.55)
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors.").inc(exception="ProtocolError")
+    registry.histogram("decode_seconds", "Decode.", buckets=(0.1, 1.0)).observe(0.5)
+
+    assert registry.render() == (
+        "# HELP errors_total Errors.\n"
+        "# TYPE errors_total counter\n"
+        'errors_total{exception="ProtocolError"} 1\n'
+        "# HELP decode_seconds Decode.\n"
+        "# TYPE decode_seconds histogram\n"
+        'decode_seconds_bucket{le="0.1"} 0\n'
+        'decode_seconds_bucket{le="1"} 1\n'
+        'decode_seconds_bucket{le="+Inf"} 1\n'
+        "decode_seconds_sum 0.5\n"
+        "decode_seconds_count 1\n"
+    )
+
+
+def test_render_escapes_label_values():
+    registry = MetricsRegistry()
+    registry.counter("a_total", "A.").inc(name='say "hi"\n')
+    assert 'a_total{name="say \\"hi\\"\\n"} 1' in registry.render()
+
+
+def test_render_empty_registry():
+    assert MetricsRegistry().render() == ""
+
+
+def test_track_counts_errors_by_class():
+    metrics = _ClientMetrics(MetricsRegistry())
+
+    with pytest.raises(CommunicationError):
+        with metrics.track("get"):
+            raise CommunicationError("offline")
+
+    assert metrics.requests.value(type="get") == 1
+    assert metrics.errors.value(exception="CommunicationError") == 1
+    assert metrics.request_seconds.count(type="get") == 1
+
+
+@pytest.mark.asyncio
+async def test_client_records_get_hosts():
+    registry = MetricsRegistry()
+    store = MemorySerialStore()
+    store.set("192.168.1.1", "CP2231TEST")
+    client = SmartHubClient(
+        "192.168.1.1", "secret", MagicMock(), metrics=registry, serial_store=store
+    )
+
+    with (
+        _mock_connect(),
+        _mock_exchange(return_value=b"\x01\x02\x03"),
+        patch("ee_smarthub._usp.build_get_request", return_value=b"\xaa\xbb"),
+        patch("ee_smarthub._usp.parse_get_response", return_value=[]),
+    ):
+        await client.get_hosts()
+
+    metrics = client._metrics
+    assert metrics.requests.value(type="get") == 1
+    assert metrics.bytes_sent.value() == 2
+    assert metrics.bytes_received.value() == 3
+    assert metrics.decode_seconds.count() == 1
+    assert metrics.connections.value(reused="false") == 1
+    assert metrics.serial_cache.value(result="hit") == 1
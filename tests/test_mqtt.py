@@ -7,11 +7,21 @@ import pytest
 from ee_smarthub._mqtt import (
     AGENT_ID_PREFIX,
     CONTROLLER_ID,
+    UspConnection,
     _build_connect_record,
     send_request,
 )
-from ee_smarthub.exceptions import AuthenticationError, CommunicationError
-from ee_smarthub.proto.usp_record import Record
+from ee_smarthub._usp import build_get_request
+from ee_smarthub._wire import peek_header
+from ee_smarthub.exceptions import AuthenticationError, CommunicationError, ProtocolError
+from ee_smarthub.proto.usp import Header, HeaderMsgType, Msg
+from ee_smarthub.proto.usp_record import (
+    NoSessionContextRecord,
+    Record,
+    RecordPayloadSecurity,
+    SessionContextRecord,
+    SessionContextRecordPayloadSarState,
+)
 
 _PATCH_TARGET = "ee_smarthub._mqtt.aiomqtt.Client"
 
@@ -29,6 +39,7 @@ def _mock_client(messages) -> MagicMock:
     mock = MagicMock()
     mock.subscribe = AsyncMock()
     mock.publish = AsyncMock()
+    mock.unsubscribe = AsyncMock()
     mock.messages = messages
     mock.__aenter__ = AsyncMock(return_value=mock)
     mock.__aexit__ = AsyncMock(return_value=False)
@@ -122,6 +133,113 @@ async def test_send_request_timeout():
             )
 
 
+@pytest.mark.asyncio
+async def test_send_request_qos0_resends_until_answered():
+    mock, inbox = _queue_client()
+    request = b"\x04\x05\x06"
+
+    async def publish(topic, payload, qos):
+        # The first copy of the request is "lost"; the second is answered.
+        if payload == request and mock.publish.await_count == 3:
+            inbox.put_nowait(b"\x01\x02\x03")
+
+    mock.publish.side_effect = publish
+    with patch(_PATCH_TARGET, return_value=mock):
+        result = await send_request(
+            hostname="192.168.1.1",
+            password="secret",
+            serial="ABC123",
+            request_payload=request,
+            qos=0,
+            retry_interval=0.01,
+        )
+
+    assert result == b"\x01\x02\x03"
+    assert mock.subscribe.call_args.kwargs["qos"] == 0
+    assert [c.kwargs["qos"] for c in mock.publish.call_args_list] == [0, 0, 0]
+    assert [c.kwargs["payload"] for c in mock.publish.call_args_list][1:] == [request, request]
+
+
+def _acking_after(count: int, mock: MagicMock, sent: list) -> None:
+    """Ack subscribe/publish calls only once ``count`` packets have been sent."""
+    all_sent = asyncio.Event()
+
+    def packet(kind):
+        async def call(topic, payload=None, qos=0):
+            sent.append((kind, payload))
+            if len(sent) == count:
+                all_sent.set()
+            await all_sent.wait()
+
+        return call
+
+    mock.subscribe.side_effect = packet("subscribe")
+    mock.publish.side_effect = packet("publish")
+
+
+@pytest.mark.asyncio
+async def test_send_request_pipelines_subscribe_and_publishes():
+    request = b"\x04\x05\x06"
+    mock = _mock_client(_one_message(b"\x01"))
+    sent = []
+    # Sending one packet at a time and waiting for its ack would deadlock.
+    _acking_after(3, mock, sent)
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        async with asyncio.timeout(1):
+            result = await send_request(
+                hostname="192.168.1.1",
+                password="secret",
+                serial="ABC123",
+                request_payload=request,
+            )
+
+    assert result == b"\x01"
+    kinds = [kind for kind, _ in sent]
+    assert kinds == ["subscribe", "publish", "publish"]
+    assert Record().parse(sent[1][1]).mqtt_connect is not None
+    assert sent[2][1] == request
+
+
+@pytest.mark.asyncio
+async def test_send_request_subscribe_failure_stops_pipeline():
+    mock = _mock_client(_hang_forever())
+    mock.subscribe.side_effect = aiomqtt.MqttError("Subscribe failed")
+    published = asyncio.Event()
+
+    async def publish(*args, **kwargs):
+        await asyncio.sleep(1)
+        published.set()
+
+    mock.publish.side_effect = publish
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        with pytest.raises(CommunicationError, match="Subscribe failed"):
+            await send_request(
+                hostname="192.168.1.1",
+                password="secret",
+                serial="ABC123",
+                request_payload=b"",
+            )
+    assert not published.is_set()
+
+
+@pytest.mark.asyncio
+async def test_connection_start_pipelines_subscribe_and_connect_record():
+    mock, _ = _queue_client()
+    sent = []
+    _acking_after(2, mock, sent)
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        async with asyncio.timeout(1):
+            await connection.open("ABC123")
+        mock.publish.side_effect = None
+        await connection.close()
+
+    assert [kind for kind, _ in sent] == ["subscribe", "publish"]
+
+
 def test_build_connect_record():
     agent_id = "os::012345-SERIAL123"
     topic = "/SERIAL123/usp/admin/response"
@@ -133,3 +251,349 @@ def test_build_connect_record():
     assert record.from_id == CONTROLLER_ID
     assert record.mqtt_connect is not None
     assert record.mqtt_connect.subscribed_topic == topic
+
+
+# --- UspConnection ---
+
+
+def _get_request(path: str = "Device.Hosts.Host.") -> tuple[bytes, str]:
+    data = build_get_request("os::012345-ABC123", CONTROLLER_ID, path)
+    return data, peek_header(data)[0]
+
+
+def _response_for(msg_id: str, body: bytes = b"") -> bytes:
+    header = Header(msg_id=msg_id, msg_type=HeaderMsgType.GET_RESP)
+    record = Record(
+        version="1.4",
+        to_id=CONTROLLER_ID,
+        from_id="agent",
+        payload_security=RecordPayloadSecurity.PLAINTEXT,
+        no_session_context=NoSessionContextRecord(payload=bytes(Msg(header=header)) + body),
+    )
+    return bytes(record)
+
+
+def _queue_client() -> tuple[MagicMock, asyncio.Queue]:
+    inbox: asyncio.Queue = asyncio.Queue()
+
+    async def messages():
+        while True:
+            item = await inbox.get()
+            if isinstance(item, Exception):
+                raise item
+            yield MagicMock(payload=item)
+
+    return _mock_client(messages()), inbox
+
+
+@pytest.mark.asyncio
+async def test_connection_routes_responses_by_msg_id():
+    mock, inbox = _queue_client()
+    first, first_id = _get_request("Device.Hosts.")
+    second, second_id = _get_request("Device.WiFi.")
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        await connection.open("ABC123")
+        try:
+            first_task = asyncio.create_task(connection.request(first))
+            second_task = asyncio.create_task(connection.request(second))
+            await asyncio.sleep(0)
+            # Answer out of order.
+            inbox.put_nowait(_response_for(second_id))
+            inbox.put_nowait(_response_for(first_id))
+
+            assert peek_header(await first_task)[0] == first_id
+            assert peek_header(await second_task)[0] == second_id
+        finally:
+            await connection.close()
+
+    mock.subscribe.assert_called_once()
+    assert Record().parse(mock.publish.call_args_list[0][1]["payload"]).mqtt_connect is not None
+    assert connection.closed
+
+
+@pytest.mark.asyncio
+async def test_connection_passes_unsolicited_messages():
+    mock, inbox = _queue_client()
+    received = []
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret", on_message=received.append)
+        await connection.open("ABC123")
+        inbox.put_nowait(_response_for("not-a-request"))
+        await asyncio.sleep(0.01)
+        await connection.close()
+
+    assert len(received) == 1
+
+
+@pytest.mark.asyncio
+async def test_connection_loss_fails_pending_requests():
+    mock, inbox = _queue_client()
+    request, _ = _get_request()
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        await connection.open("ABC123")
+        task = asyncio.create_task(connection.request(request))
+        await asyncio.sleep(0)
+        inbox.put_nowait(aiomqtt.MqttError("Connection lost"))
+
+        with pytest.raises(CommunicationError, match="Connection lost"):
+            await task
+        await connection.wait_closed()
+        assert connection.closed
+        await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_connection_close_sends_disconnect_record():
+    mock, _ = _queue_client()
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        await connection.open("ABC123")
+        await connection.close()
+
+    record = Record().parse(mock.publish.call_args_list[-1][1]["payload"])
+    assert record.to_id == AGENT_ID_PREFIX + "ABC123"
+    assert record.disconnect is not None
+    mock.unsubscribe.assert_awaited_once()
+    mock.__aexit__.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_connection_close_after_loss_skips_disconnect_record():
+    mock, inbox = _queue_client()
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        await connection.open("ABC123")
+        inbox.put_nowait(aiomqtt.MqttError("Connection lost"))
+        await connection.wait_closed()
+        published = mock.publish.await_count
+        await connection.close()
+
+    assert mock.publish.await_count == published
+    mock.unsubscribe.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_connection_request_qos0_resends():
+    mock, inbox = _queue_client()
+    request, msg_id = _get_request()
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        await connection.open("ABC123")
+        mock.publish.reset_mock()
+        mock.publish.side_effect = lambda *a, **kw: (
+            inbox.put_nowait(_response_for(msg_id)) if mock.publish.await_count == 2 else None
+        )
+        response = await connection.request(request, qos=0, retry_interval=0.01)
+        await connection.close()
+
+    assert peek_header(response)[0] == msg_id
+    assert [c.kwargs["qos"] for c in mock.publish.call_args_list[:2]] == [0, 0]
+
+
+@pytest.mark.asyncio
+async def test_connection_request_timeout():
+    mock, _ = _queue_client()
+    request, _ = _get_request()
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        await connection.open("ABC123")
+        with pytest.raises(CommunicationError, match="Timed out"):
+            await connection.request(request, timeout=0.05)
+        await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_connection_publish_failure_is_communication_error():
+    mock, _ = _queue_client()
+    request, _ = _get_request()
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        await connection.open("ABC123")
+        # aiomqtt's error for a publish after the link has dropped.
+        mock.publish.side_effect = aiomqtt.MqttCodeError(4, "Could not publish message")
+        try:
+            with pytest.raises(CommunicationError, match="MQTT communication failed"):
+                await connection.request(request)
+        finally:
+            await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_connection_rejects_msg_id_already_pending():
+    mock, inbox = _queue_client()
+    request, msg_id = _get_request("Device.Hosts.")
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        await connection.open("ABC123")
+        try:
+            first = asyncio.create_task(connection.request(request))
+            await asyncio.sleep(0)
+            with pytest.raises(ValueError, match="already pending"):
+                await connection.request(request)
+            inbox.put_nowait(_response_for(msg_id))
+            # The first request's waiter was left in place.
+            assert peek_header(await first)[0] == msg_id
+        finally:
+            await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_connection_rejects_non_usp_payload():
+    mock, _ = _queue_client()
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        await connection.open("ABC123")
+        with pytest.raises(ValueError):
+            await connection.request(b"\x01\x02")
+        await connection.close()
+
+
+def _segments(record: bytes, count: int) -> list[bytes]:
+    """Split the Msg in a NoSessionContext Record across SessionContext Records."""
+    payload = Record().parse(record).no_session_context.payload
+    size = -(-len(payload) // count)
+    states = [SessionContextRecordPayloadSarState.BEGIN]
+    states += [SessionContextRecordPayloadSarState.INPROCESS] * (count - 2)
+    states += [SessionContextRecordPayloadSarState.COMPLETE]
+    return [
+        bytes(Record(
+            version="1.4",
+            to_id=CONTROLLER_ID,
+            from_id="agent",
+            session_context=SessionContextRecord(
+                session_id=1,
+                sequence_id=i + 1,
+                payload_sar_state=state,
+                payloadrec_sar_state=state,
+                payload=[payload[i * size:(i + 1) * size]],
+            ),
+        ))
+        for i, state in enumerate(states)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_connection_reassembles_segmented_response():
+    mock, inbox = _queue_client()
+    request, msg_id = _get_request("Device.Hosts.")
+    expected = _response_for(msg_id, body=b"\x12\x00" * 50)
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret")
+        await connection.open("ABC123")
+        try:
+            task = asyncio.create_task(connection.request(request))
+            await asyncio.sleep(0)
+            first, second, third = _segments(expected, 3)
+            for segment in (first, third, second):  # second arrives late
+                inbox.put_nowait(segment)
+            response = await task
+        finally:
+            await connection.close()
+
+    assert Record().parse(response).no_session_context.payload == (
+        Record().parse(expected).no_session_context.payload
+    )
+    # The out-of-order segment triggered one retransmit request.
+    retransmits = [
+        Record().parse(c[1]["payload"]).session_context
+        for c in mock.publish.call_args_list
+        if Record().parse(c[1]["payload"]).session_context is not None
+    ]
+    assert [r.retransmit_id for r in retransmits] == [2]
+
+
+@pytest.mark.asyncio
+async def test_send_request_rejects_oversized_response():
+    mock = _mock_client(_one_message(b"\x00" * 200))
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        with pytest.raises(ProtocolError, match="200 bytes exceeds the 100 byte limit"):
+            await send_request(
+                "192.168.1.1", "secret", "ABC123", b"\x01", max_response_bytes=100
+            )
+
+
+@pytest.mark.asyncio
+async def test_connection_fails_request_on_oversized_response():
+    mock, inbox = _queue_client()
+    request, msg_id = _get_request("Device.Hosts.")
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret", max_response_bytes=256)
+        await connection.open("ABC123")
+        try:
+            task = asyncio.create_task(connection.request(request))
+            await asyncio.sleep(0)
+            inbox.put_nowait(_response_for(msg_id, body=b"\x12\x00" * 200))
+            with pytest.raises(ProtocolError, match="exceeds the 256 byte limit"):
+                await task
+            assert not connection.closed
+        finally:
+            await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_connection_fails_request_on_oversized_segmented_response():
+    mock, inbox = _queue_client()
+    request, msg_id = _get_request("Device.Hosts.")
+    other_request, other_id = _get_request("Device.Hosts.")
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret", max_response_bytes=256)
+        await connection.open("ABC123")
+        try:
+            task = asyncio.create_task(connection.request(request, timeout=5))
+            other = asyncio.create_task(connection.request(other_request, timeout=5))
+            await asyncio.sleep(0)
+            for segment in _segments(_response_for(msg_id, body=b"\x12\x00" * 200), 4):
+                inbox.put_nowait(segment)
+            with pytest.raises(ProtocolError, match="exceeds the 256 byte limit"):
+                await task
+            assert not other.done()
+        finally:
+            await connection.close()
+    with pytest.raises(CommunicationError):
+        await other
+
+
+@pytest.mark.asyncio
+async def test_connection_fails_only_request_on_unidentified_oversized_record():
+    mock, inbox = _queue_client()
+    request, msg_id = _get_request("Device.Hosts.")
+    # A single SessionContext Record: too large to parse for its msg_id.
+    record = bytes(Record(
+        version="1.4",
+        to_id=CONTROLLER_ID,
+        from_id="agent",
+        session_context=SessionContextRecord(
+            session_id=1,
+            sequence_id=1,
+            payload=[Record().parse(_response_for(msg_id, body=b"\x12\x00" * 200))
+                     .no_session_context.payload],
+        ),
+    ))
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        connection = UspConnection("192.168.1.1", "secret", max_response_bytes=256)
+        await connection.open("ABC123")
+        try:
+            task = asyncio.create_task(connection.request(request, timeout=5))
+            await asyncio.sleep(0)
+            inbox.put_nowait(record)
+            with pytest.raises(ProtocolError, match="exceeds the 256 byte limit"):
+                await task
+        finally:
+            await connection.close()
@@ -0,0 +1,164 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from ee_smarthub.breaker import CircuitState
+from ee_smarthub.pool import SmartHubConnectionPool
+
+
+def _patch_aclose():
+    return patch("ee_smarthub.client.SmartHubClient.aclose", new_callable=AsyncMock)
+
+
+@pytest.mark.asyncio
+async def test_reuses_client_per_router_and_password():
+    async with SmartHubConnectionPool(MagicMock()) as pool:
+        async with pool.acquire("192.168.1.1", "secret") as first:
+            pass
+        async with pool.acquire("192.168.1.1", "secret") as again:
+            pass
+        async with pool.acquire("192.168.1.1", "other") as other_password:
+            pass
+
+    assert first is again
+    assert other_password is not first
+    assert first._persistent
+    # Clients share the pool's serial store.
+    assert first._serial_store is other_password._serial_store
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used_idle_client():
+    with _patch_aclose() as aclose:
+        pool = SmartHubConnectionPool(MagicMock(), max_size=2)
+        async with pool.acquire("10.0.0.1", "pw") as first:
+            pass
+        async with pool.acquire("10.0.0.2", "pw"):
+            pass
+        async with pool.acquire("10.0.0.1", "pw"):
+            pass  # 10.0.0.2 is now least recently used
+        async with pool.acquire("10.0.0.3", "pw"):
+            pass
+
+        assert len(pool) == 2
+        await asyncio.sleep(0)  # closed in the background
+        assert aclose.await_count == 1
+        async with pool.acquire("10.0.0.1", "pw") as still_pooled:
+            assert still_pooled is first
+        await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_clients_in_use_are_not_evicted():
+    with _patch_aclose() as aclose:
+        pool = SmartHubConnectionPool(MagicMock(), max_size=1)
+        async with pool.acquire("10.0.0.1", "pw"):
+            async with pool.acquire("10.0.0.2", "pw"):
+                assert len(pool) == 2
+                aclose.assert_not_awaited()
+        async with pool.acquire("10.0.0.3", "pw"):
+            pass
+        assert len(pool) == 1
+        await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_acquire_does_not_wait_for_evicted_client_to_close():
+    release = asyncio.Event()
+
+    async def slow_aclose():
+        await release.wait()
+
+    with _patch_aclose() as aclose:
+        aclose.side_effect = slow_aclose
+        pool = SmartHubConnectionPool(MagicMock(), max_size=1)
+        async with pool.acquire("10.0.0.1", "pw"):
+            pass
+        async with asyncio.timeout(1):
+            async with pool.acquire("10.0.0.2", "pw"):
+                await asyncio.sleep(0)
+                aclose.assert_awaited_once()
+
+        closing = asyncio.create_task(pool.aclose())
+        await asyncio.sleep(0.01)
+        assert not closing.done()
+        release.set()
+        await closing
+
+
+@pytest.mark.asyncio
+async def test_idle_clients_are_closed():
+    with _patch_aclose() as aclose:
+        pool = SmartHubConnectionPool(MagicMock(), idle_timeout=0.02)
+        async with pool.acquire("10.0.0.1", "pw"):
+            await asyncio.sleep(0.05)  # in use, so not reaped
+            assert len(pool) == 1
+        await asyncio.sleep(0.05)
+
+        assert len(pool) == 0
+        aclose.assert_awaited_once()
+        await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_aclose_closes_all_clients():
+    with _patch_aclose() as aclose:
+        pool = SmartHubConnectionPool(MagicMock())
+        for host in ("10.0.0.1", "10.0.0.2"):
+            async with pool.acquire(host, "pw"):
+                pass
+        await pool.aclose()
+
+    assert aclose.await_count == 2
+    with pytest.raises(RuntimeError, match="closed"):
+        async with pool.acquire("10.0.0.1", "pw"):
+            pass
+
+
+def test_max_size_must_be_positive():
+    with pytest.raises(ValueError):
+        SmartHubConnectionPool(MagicMock(), max_size=0)
+
+
+@pytest.mark.asyncio
+async def test_clients_of_a_router_share_a_circuit_breaker():
+    async with SmartHubConnectionPool(MagicMock(), failure_threshold=1) as pool:
+        async with pool.acquire("192.168.1.1", "secret") as first:
+            pass
+        async with pool.acquire("192.168.1.1", "other") as second:
+            pass
+        async with pool.acquire("192.168.1.2", "secret") as third:
+            pass
+
+        assert first._breaker is second._breaker
+        assert third._breaker is not first._breaker
+        first._breaker.record_failure()
+        assert pool.circuit_states() == {
+            "192.168.1.1": CircuitState.OPEN,
+            "192.168.1.2": CircuitState.CLOSED,
+        }
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaking_can_be_disabled():
+    async with SmartHubConnectionPool(MagicMock(), failure_threshold=None) as pool:
+        async with pool.acquire("192.168.1.1", "secret") as client:
+            assert client._breaker is None
+        assert pool.circuit_states() == {}
+
+
+@pytest.mark.asyncio
+async def test_failing_router_keeps_breaker_after_eviction():
+    with _patch_aclose():
+        pool = SmartHubConnectionPool(MagicMock(), max_size=1)
+        async with pool.acquire("10.0.0.1", "pw") as client:
+            client._breaker.record_failure()
+        async with pool.acquire("10.0.0.2", "pw"):
+            pass
+        async with pool.acquire("10.0.0.3", "pw"):
+            pass
+
+        # 10.0.0.2 was healthy, so its breaker went with its client.
+        assert set(pool.circuit_states()) == {"10.0.0.1", "10.0.0.3"}
+        await pool.aclose()
@@ -0,0 +1,80 @@
+import pytest
+
+from ee_smarthub.query import SearchPath, expand_paths
+
+
+def test_plain_table():
+    assert str(SearchPath("Device.Hosts.Host.")) == "Device.Hosts.Host."
+
+
+def test_equality_condition():
+    path = SearchPath("Device.Hosts.Host.").where("Active", True)
+    assert str(path) == "Device.Hosts.Host.[Active==true]."
+
+
+def test_conditions_are_combined_with_and():
+    path = (
+        SearchPath("Device.NAT.PortMapping.")
+        .where("Enable", False)
+        .where("ExternalPort", 8080, ">=")
+        .where("Protocol", "TCP")
+    )
+    assert str(path) == (
+        'Device.NAT.PortMapping.[Enable==false&&ExternalPort>=8080&&Protocol=="TCP"].'
+    )
+
+
+def test_string_literal_is_escaped():
+    path = SearchPath("Device.Hosts.Host.").where("HostName", 'Bob\'s "50%" phone')
+    assert str(path) == 'Device.Hosts.Host.[HostName=="Bob\'s %2250%25%22 phone"].'
+
+
+def test_select_sub_path():
+    path = SearchPath("Device.Hosts.Host.").where("Active", True).select("WANStats.")
+    assert str(path) == "Device.Hosts.Host.[Active==true].WANStats."
+    assert str(SearchPath("Device.Hosts.Host.").select("HostName")) == "Device.Hosts.Host.*.HostName"
+
+
+def test_instance_range_expands_to_several_paths():
+    path = SearchPath("Device.Hosts.Host.").instances(range(2, 5)).select("HostName")
+    assert path.paths() == [
+        "Device.Hosts.Host.2.HostName",
+        "Device.Hosts.Host.3.HostName",
+        "Device.Hosts.Host.4.HostName",
+    ]
+    with pytest.raises(ValueError, match="use paths"):
+        str(path)
+
+
+def test_builder_is_immutable():
+    base = SearchPath("Device.Hosts.Host.")
+    base.where("Active", True)
+    assert str(base) == "Device.Hosts.Host."
+
+
+@pytest.mark.parametrize(
+    ("build", "message"),
+    [
+        (lambda: SearchPath("Device.Hosts.Host"), "Not a table path"),
+        (lambda: SearchPath("Device.Hosts.Host.").where("Active", True, "=~"), "Unsupported operator"),
+        (lambda: SearchPath("Device.Hosts.Host.").where("Active]", True), "Not a parameter name"),
+        (lambda: SearchPath("Device.Hosts.Host.").instances([0]), "start at 1"),
+        (lambda: SearchPath("Device.Hosts.Host.").instances([1]).where("Active", True), "Cannot combine"),
+        (lambda: SearchPath("Device.Hosts.Host.").select(".HostName"), "Not a relative path"),
+    ],
+)
+def test_invalid_input(build, message):
+    with pytest.raises(ValueError, match=message):
+        build()
+
+
+def test_expand_paths():
+    assert expand_paths("Device.DeviceInfo.") == ["Device.DeviceInfo."]
+    assert expand_paths(SearchPath("Device.Hosts.Host.").instances([1, 2])) == [
+        "Device.Hosts.Host.1.",
+        "Device.Hosts.Host.2.",
+    ]
+    assert expand_paths(["Device.DeviceInfo.", SearchPath("Device.Hosts.Host.")]) == [
+        "Device.DeviceInfo.",
+        "Device.Hosts.Host.",
+    ]
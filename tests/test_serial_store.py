@@ -0,0 +1,46 @@
+import json
+
+from ee_smarthub.serial_store import JsonFileSerialStore, MemorySerialStore
+
+
+def test_memory_store():
+    store = MemorySerialStore()
+    assert store.get("192.168.1.1") is None
+
+    store.set("192.168.1.1", "CP2231TEST")
+    assert store.get("192.168.1.1") == "CP2231TEST"
+
+    store.discard("192.168.1.1")
+    store.discard("192.168.1.1")
+    assert store.get("192.168.1.1") is None
+
+
+def test_json_store_persists(tmp_path):
+    path = tmp_path / "serials.json"
+    JsonFileSerialStore(path).set("192.168.1.1", "CP2231TEST")
+
+    assert json.loads(path.read_text()) == {"192.168.1.1": "CP2231TEST"}
+    assert JsonFileSerialStore(path).get("192.168.1.1") == "CP2231TEST"
+
+
+def test_json_store_discard(tmp_path):
+    path = tmp_path / "serials.json"
+    store = JsonFileSerialStore(path)
+    store.set("192.168.1.1", "CP2231TEST")
+    store.discard("192.168.1.1")
+
+    assert JsonFileSerialStore(path).get("192.168.1.1") is None
+
+
+def test_json_store_missing_file(tmp_path):
+    assert JsonFileSerialStore(tmp_path / "absent.json").get("192.168.1.1") is None
+
+
+def test_json_store_corrupt_file(tmp_path):
+    path = tmp_path / "serials.json"
+    path.write_text("{not json")
+    store = JsonFileSerialStore(path)
+
+    assert store.get("192.168.1.1") is None
+    store.set("192.168.1.1", "CP2231TEST")
+    assert JsonFileSerialStore(path).get("192.168.1.1") == "CP2231TEST"
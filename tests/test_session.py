@@ -0,0 +1,151 @@
+import pytest
+
+from ee_smarthub._session import UspSession
+from ee_smarthub._wire import peek_header
+from ee_smarthub.exceptions import ProtocolError
+from ee_smarthub.proto.usp import Header, HeaderMsgType, Msg
+from ee_smarthub.proto.usp_record import (
+    NoSessionContextRecord,
+    Record,
+    SessionContextRecord,
+    SessionContextRecordPayloadSarState as Sar,
+)
+
+
+def _msg(msg_id: str) -> bytes:
+    return bytes(Msg(header=Header(msg_id=msg_id, msg_type=HeaderMsgType.GET_RESP)))
+
+
+def _session_record(
+    sequence_id: int,
+    payload: list[bytes],
+    sar: Sar = Sar.NONE,
+    *,
+    session_id: int = 7,
+    retransmit_id: int = 0,
+) -> bytes:
+    return bytes(Record(
+        version="1.4",
+        to_id="controller",
+        from_id="agent",
+        session_context=SessionContextRecord(
+            session_id=session_id,
+            sequence_id=sequence_id,
+            retransmit_id=retransmit_id,
+            payload_sar_state=sar,
+            payloadrec_sar_state=sar,
+            payload=payload,
+        ),
+    ))
+
+
+def test_no_session_context_passes_through():
+    data = bytes(Record(no_session_context=NoSessionContextRecord(payload=_msg("a"))))
+    assert UspSession().receive(data) == ([data], [])
+
+
+def test_unsegmented_payload_is_reframed():
+    messages, replies = UspSession().receive(_session_record(1, [_msg("a")]))
+
+    assert replies == []
+    assert len(messages) == 1
+    record = Record().parse(messages[0])
+    assert record.no_session_context.payload == _msg("a")
+    assert (record.to_id, record.from_id) == ("controller", "agent")
+    assert peek_header(messages[0]) == ("a", HeaderMsgType.GET_RESP)
+
+
+def test_segmented_payload_is_reassembled():
+    payload = _msg("big") * 3  # stand-in for a large Msg
+    chunks = [payload[:10], payload[10:20], payload[20:]]
+    session = UspSession()
+
+    assert session.receive(_session_record(1, [chunks[0]], Sar.BEGIN)) == ([], [])
+    assert session.receive(_session_record(2, [chunks[1]], Sar.INPROCESS)) == ([], [])
+    messages, _ = session.receive(_session_record(3, [chunks[2]], Sar.COMPLETE))
+
+    assert [Record().parse(m).no_session_context.payload for m in messages] == [payload]
+
+
+def test_out_of_order_records_are_delivered_in_sequence():
+    session = UspSession()
+    session.receive(_session_record(1, [_msg("a")]))
+
+    messages, replies = session.receive(_session_record(3, [_msg("c")]))
+    assert messages == []
+    # The gap triggers a single retransmit request for record 2.
+    [request] = replies
+    context = Record().parse(request).session_context
+    assert (context.session_id, context.retransmit_id, context.expected_id) == (7, 2, 2)
+    assert Record().parse(request).to_id == "agent"
+    assert session.receive(_session_record(4, [_msg("d")])) == ([], [])
+
+    messages, replies = session.receive(_session_record(2, [_msg("b")]))
+    assert replies == []
+    assert [peek_header(m)[0] for m in messages] == ["b", "c", "d"]
+
+
+def test_duplicate_record_is_dropped():
+    session = UspSession()
+    session.receive(_session_record(1, [_msg("a")]))
+    assert session.receive(_session_record(1, [_msg("a")])) == ([], [])
+
+
+def test_agent_retransmit_request_resends_record():
+    session = UspSession()
+    session.receive(_session_record(1, [_msg("a")]))
+    _, [request] = session.receive(_session_record(3, [_msg("c")]))
+    sent_id = Record().parse(request).session_context.sequence_id
+
+    _, replies = session.receive(_session_record(2, [], retransmit_id=sent_id))
+    assert replies == [request]
+
+
+def test_new_session_resets_state():
+    session = UspSession()
+    session.receive(_session_record(1, [b"partial"], Sar.BEGIN))
+
+    messages, _ = session.receive(_session_record(1, [_msg("a")], session_id=8))
+    assert session.session_id == 8
+    assert [peek_header(m)[0] for m in messages] == ["a"]
+
+
+def test_stalled_session_raises():
+    session = UspSession()
+    session.receive(_session_record(1, [_msg("a")]))
+    with pytest.raises(ProtocolError, match="stalled waiting for record 2"):
+        for sequence_id in range(3, 100):
+            session.receive(_session_record(sequence_id, [_msg("x")]))
+
+
+def test_malformed_record_raises():
+    with pytest.raises(ProtocolError, match="Malformed USP Record"):
+        UspSession().receive(b"\x42\x10short")
+
+
+def test_oversized_record_is_rejected():
+    data = _session_record(1, [b"x" * 100])
+    with pytest.raises(ProtocolError, match="exceeds the 64 byte limit"):
+        UspSession(max_payload_bytes=64).receive(data)
+
+
+def test_oversized_segmented_payload_is_rejected():
+    session = UspSession(max_payload_bytes=100)
+    session.receive(_session_record(1, [b"x" * 60], Sar.BEGIN))
+    with pytest.raises(ProtocolError, match="120 bytes exceeds the 100 byte limit"):
+        session.receive(_session_record(2, [b"x" * 60], Sar.INPROCESS))
+
+
+def test_rest_of_oversized_payload_is_discarded():
+    session = UspSession(max_payload_bytes=100)
+    first = _msg("big") + b"x" * 40
+    session.receive(_session_record(1, [first], Sar.BEGIN))
+    with pytest.raises(ProtocolError):
+        session.receive(_session_record(2, [b"x" * 60], Sar.INPROCESS))
+    assert session.rejected_msg_id == "big"
+
+    assert session.receive(_session_record(3, [b"x" * 10], Sar.INPROCESS)) == ([], [])
+    assert session.receive(_session_record(4, [b"x" * 10], Sar.COMPLETE)) == ([], [])
+    assert session.rejected_msg_id is None
+    messages, _ = session.receive(_session_record(5, [_msg("a")]))
+    assert [peek_header(m) for m in messages] == [("a", HeaderMsgType.GET_RESP)]
@@ -0,0 +1,116 @@
+import json
+from dataclasses import asdict
+
+import pytest
+
+from ee_smarthub.models import Host
+from ee_smarthub.snapshots import Snapshot, SnapshotReader, SnapshotWriter
+
+LAPTOP = Host(
+    mac_address="AA:BB:CC:DD:EE:01",
+    ip_address="192.168.1.10",
+    hostname="laptop",
+    user_friendly_name="Work Laptop",
+    interface_type="Wi-Fi",
+    active=True,
+    frequency_band="5GHz",
+    bytes_sent=12_345_678_901,
+    bytes_received=42,
+)
+DESKTOP = Host(mac_address="AA:BB:CC:DD:EE:02", interface_type="Ethernet")
+
+
+def _read(path, **kwargs):
+    with SnapshotReader(path) as reader:
+        return list(reader.snapshots(**kwargs))
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "hosts.snap"
+    with SnapshotWriter(path) as writer:
+        writer.append([LAPTOP, DESKTOP], timestamp=1000.0)
+        writer.append([], timestamp=1060.0)
+        writer.append([DESKTOP], timestamp=1120.0)
+
+    assert _read(path) == [
+        Snapshot(1000.0, [LAPTOP, DESKTOP]),
+        Snapshot(1060.0, []),
+        Snapshot(1120.0, [DESKTOP]),
+    ]
+
+
+def test_strings_are_stored_once(tmp_path):
+    path = tmp_path / "hosts.snap"
+    with SnapshotWriter(path) as writer:
+        writer.append([LAPTOP], timestamp=1000.0)
+        first = path.stat().st_size
+        writer.append([LAPTOP], timestamp=1060.0)
+
+    assert path.stat().st_size - first < len(json.dumps(asdict(LAPTOP))) / 2
+
+
+def test_reopened_writer_appends_with_existing_strings(tmp_path):
+    path = tmp_path / "hosts.snap"
+    with SnapshotWriter(path) as writer:
+        writer.append([LAPTOP], timestamp=1000.0)
+    with SnapshotWriter(path) as writer:
+        writer.append([DESKTOP, LAPTOP], timestamp=1060.0)
+
+    assert [s.hosts for s in _read(path)] == [[LAPTOP], [DESKTOP, LAPTOP]]
+
+
+def test_failed_append_leaves_log_usable(tmp_path):
+    path = tmp_path / "hosts.snap"
+    with SnapshotWriter(path) as writer:
+        with pytest.raises(TypeError):
+            writer.append([DESKTOP, Host(mac_address="AA:BB:CC:DD:EE:03", bytes_sent="5")])
+        writer.append([LAPTOP], timestamp=1000.0)
+
+    assert _read(path) == [Snapshot(1000.0, [LAPTOP])]
+
+
+def test_counters_are_clamped(tmp_path):
+    path = tmp_path / "hosts.snap"
+    with SnapshotWriter(path) as writer:
+        writer.append([Host(mac_address="AA", bytes_sent=-1, bytes_received=2**64)], timestamp=1.0)
+
+    [snapshot] = _read(path)
+    assert snapshot.hosts == [Host(mac_address="AA", bytes_sent=0, bytes_received=2**64 - 1)]
+
+
+def test_time_range(tmp_path):
+    path = tmp_path / "hosts.snap"
+    with SnapshotWriter(path) as writer:
+        for i, hosts in enumerate([[LAPTOP], [DESKTOP], [LAPTOP, DESKTOP]]):
+            writer.append(hosts, timestamp=1000.0 + 60 * i)
+
+    # Strings first seen in skipped frames still resolve.
+    assert _read(path, since=1060.0) == [
+        Snapshot(1060.0, [DESKTOP]),
+        Snapshot(1120.0, [LAPTOP, DESKTOP]),
+    ]
+    assert _read(path, until=1060.0) == [Snapshot(1000.0, [LAPTOP])]
+
+
+def test_incomplete_frame_is_ignored_and_dropped(tmp_path):
+    path = tmp_path / "hosts.snap"
+    with SnapshotWriter(path) as writer:
+        writer.append([LAPTOP], timestamp=1000.0)
+        writer.append([DESKTOP], timestamp=1060.0)
+    path.write_bytes(path.read_bytes()[:-5])
+
+    assert _read(path) == [Snapshot(1000.0, [LAPTOP])]
+
+    with SnapshotWriter(path) as writer:
+        writer.append([DESKTOP], timestamp=1120.0)
+    assert _read(path) == [Snapshot(1000.0, [LAPTOP]), Snapshot(1120.0, [DESKTOP])]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "hosts.json"
+    path.write_text("[]")
+
+    with pytest.raises(ValueError, match="Not a snapshot log"):
+        _read(path)
+    with pytest.raises(ValueError, match="Not a snapshot log"):
+        SnapshotWriter(path)
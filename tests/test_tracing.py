@@ -0,0 +1,86 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ee_smarthub._mqtt import send_request
+from ee_smarthub.tracing import OpenTelemetryTracer, Span, _phase
+
+from test_mqtt import _PATCH_TARGET, _mock_client, _one_message
+
+
+def test_phase_records_span():
+    spans: list[Span] = []
+
+    with _phase(spans.append, "usp.decode", response_bytes=10) as attributes:
+        attributes["hosts"] = 2
+
+    assert len(spans) == 1
+    span = spans[0]
+    assert span.name == "usp.decode"
+    assert span.duration >= 0
+    assert span.attributes == {"response_bytes": 10, "hosts": 2}
+    assert span.error is None
+
+
+def test_phase_records_error():
+    spans: list[Span] = []
+
+    with pytest.raises(ValueError):
+        with _phase(spans.append, "fetch_serial"):
+            raise ValueError("boom")
+
+    assert isinstance(spans[0].error, ValueError)
+
+
+def test_phase_tracer_failure_is_swallowed():
+    def broken_tracer(span: Span) -> None:
+        raise RuntimeError("tracer bug")
+
+    with _phase(broken_tracer, "mqtt.connect"):
+        pass
+
+
+def test_phase_without_tracer():
+    with _phase(None, "mqtt.connect", hostname="h") as attributes:
+        attributes["extra"] = 1
+
+
+def test_open_telemetry_tracer():
+    otel_span = MagicMock()
+    otel_tracer = MagicMock()
+    otel_tracer.start_span.return_value = otel_span
+    error = ValueError("boom")
+
+    OpenTelemetryTracer(otel_tracer)(
+        Span("usp.wait", start=1.5, duration=0.25, attributes={"a": 1}, error=error)
+    )
+
+    otel_tracer.start_span.assert_called_once_with(
+        "usp.wait", start_time=1_500_000_000, attributes={"a": 1}
+    )
+    otel_span.record_exception.assert_called_once_with(error)
+    otel_span.end.assert_called_once_with(end_time=1_750_000_000)
+
+
+@pytest.mark.asyncio
+async def test_send_request_emits_phases():
+    spans: list[Span] = []
+    mock = _mock_client(_one_message(b"\x01\x02\x03"))
+
+    with patch(_PATCH_TARGET, return_value=mock):
+        await send_request(
+            hostname="192.168.1.1",
+            password="secret",
+            serial="CP2231TEST",
+            request_payload=b"\x04\x05",
+            tracer=spans.append,
+        )
+
+    assert [s.name for s in spans] == [
+        "mqtt.connect",
+        "mqtt.subscribe",
+        "mqtt.publish",
+        "usp.wait",
+    ]
+    assert spans[2].attributes["request_bytes"] == 2
+    assert spans[3].attributes["response_bytes"] == 3
@@ -0,0 +1,158 @@
+import ast
+import importlib.util
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+_ROOT = Path(__file__).resolve().parent.parent
+_spec = importlib.util.spec_from_file_location("trim_proto", _ROOT / "scripts" / "trim_proto.py")
+trim_proto = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(trim_proto)
+
+_PROTO = """\
+syntax = "proto3";
+
+package usp;
+
+// Top-level message; unlike message Unused { it is always kept.
+message Msg {
+  Header header = 1;
+  Body body = 2;
+}
+
+message Header {
+  string msg_id = 1;
+  MsgType msg_type = 2;
+
+  enum MsgType {
+    ERROR = 0;
+    GET = 1;
+  }
+}
+
+message Body {
+  oneof msg_body {
+    Request request = 1;
+    // Error is only sent by the Agent
+    Error error = 3;
+  }
+}
+
+message Request {
+  oneof req_type {
+    Get get = 1;
+    // Set changes parameters
+    Set set = 2;
+  }
+}
+
+// Get reads parameters.
+message Get {
+  repeated string param_paths = 1;
+  Filter filter = 2;  // like Set, but read-only {
+  // Unused unused = 3;
+}
+
+message Filter {
+  map<string, Expression> expressions = 1;
+
+  message Nested {
+    Operator op = 1;
+  }
+}
+
+message Expression {
+  Operator op = 1;
+}
+
+enum Operator {
+  EQ = 0;
+}
+
+message Set {
+  string path = 1;
+}
+
+message Error {
+  fixed32 err_code = 1;
+}
+
+message Unused {
+  string name = 1;
+}
+"""
+
+
+# Like DEFAULT_ROOTS: oneof members do not pull their types in, so the
+# messages that select a payload are roots themselves.
+_ROOTS = ("Msg", "Body", "Request", "Get")
+
+
+def _names(text: str) -> set[str]:
+    return set(trim_proto._find_definitions(text))
+
+
+def test_keeps_references_across_levels():
+    trimmed = trim_proto.trim(_PROTO, _ROOTS)
+
+    # Get -> Filter -> (map value) Expression -> Operator
+    assert _names(trimmed) == {
+        "Msg", "Header", "Body", "Request", "Get", "Filter", "Expression", "Operator",
+    }
+
+
+def test_prunes_unused_oneof_arms_with_their_comments():
+    trimmed = trim_proto.trim(_PROTO, _ROOTS)
+
+    assert "Request request = 1;" in trimmed
+    assert "Get get = 1;" in trimmed
+    for dropped in ("Error error = 3;", "Set set = 2;", "Error is only", "Set changes"):
+        assert dropped not in trimmed
+
+
+def test_comments_mentioning_messages_are_ignored():
+    trimmed = trim_proto.trim(_PROTO, ("Get",))
+
+    # Neither "// like Set ... {" nor the commented-out Unused field count.
+    assert "Set" not in _names(trimmed)
+    assert "Unused" not in _names(trimmed)
+    # The comment above a kept definition stays with it.
+    assert "// Get reads parameters.\nmessage Get {" in trimmed
+
+
+def test_unknown_root_is_rejected():
+    with pytest.raises(ValueError, match="Unknown root message"):
+        trim_proto.trim(_PROTO, ("Msg", "Missing"))
+
+
+def _imported_proto_classes() -> set[str]:
+    """Names the library imports from its generated ``proto.usp`` module."""
+    names = set()
+    for path in (_ROOT / "src" / "ee_smarthub").glob("*.py"):
+        for node in ast.walk(ast.parse(path.read_text())):
+            if isinstance(node, ast.ImportFrom) and node.module == "proto.usp":
+                names.update(alias.name for alias in node.names)
+    return names
+
+
+def test_real_proto_keeps_every_imported_class():
+    # The USP spec proto is not vendored; point USP_MSG_PROTO at a copy of
+    # usp-msg-1-3.proto (or later) from github.com/BroadbandForum/usp.
+    source = os.environ.get("USP_MSG_PROTO")
+    if not source:
+        pytest.skip("USP_MSG_PROTO not set")
+    text = Path(source).read_text()
+    definitions = _names(text)
+    kept = _names(trim_proto.trim(text))
+
+    imported = _imported_proto_classes()
+    assert imported
+    for name in imported:
+        # betterproto names nested types after their parents, e.g.
+        # SetRespUpdatedObjectResult lives in the top-level SetResp.
+        top = max((d for d in definitions if name.startswith(d)), key=len, default=None)
+        assert top is not None, name
+        assert top in kept, f"{name} needs {top}, which was trimmed"
+        assert re.search(rf"^(message|enum)\s+{top}\s*\{{", text, re.MULTILINE)
@@ -4,21 +4,70 @@ from ee_smarthub._usp import (
     _extract_frequency,
     _params_to_host,
     _safe_int,
+    build_add_request,
+    build_delete_request,
     build_get_request,
+    build_notify_response,
+    build_operate_request,
+    build_set_request,
+    iter_get_response,
+    operation_complete_result,
+    parse_add_response,
+    parse_delete_response,
+    parse_get_params,
     parse_get_response,
+    parse_notify,
+    parse_operate_response,
+    parse_set_response,
 )
 from ee_smarthub.exceptions import ProtocolError
-from ee_smarthub.models import Host
+from ee_smarthub.models import (
+    AddResult,
+    DeleteResult,
+    Host,
+    OperationResult,
+    ParameterResult,
+)
 from ee_smarthub.proto.usp import (
+    AddResp,
+    AddRespCreatedObjectResult,
+    AddRespCreatedObjectResultOperationStatus,
+    AddRespCreatedObjectResultOperationStatusOperationFailure,
+    AddRespCreatedObjectResultOperationStatusOperationSuccess,
+    AddRespParameterError,
     Body,
+    DeleteResp,
+    DeleteRespDeletedObjectResult,
+    DeleteRespDeletedObjectResultOperationStatus,
+    DeleteRespDeletedObjectResultOperationStatusOperationFailure,
+    DeleteRespDeletedObjectResultOperationStatusOperationSuccess,
+    DeleteRespUnaffectedPathError,
     Error,
+    ErrorParamError,
     GetResp,
     GetRespRequestedPathResult,
     GetRespResolvedPathResult,
     Header,
     HeaderMsgType,
     Msg,
+    Notify,
+    NotifyOperationComplete,
+    NotifyOperationCompleteCommandFailure,
+    NotifyOperationCompleteOutputArgs,
+    OperateResp,
+    OperateRespOperationResult,
+    OperateRespOperationResultCommandFailure,
+    OperateRespOperationResultOutputArgs,
+    Request,
     Response,
+    SetResp,
+    SetRespParameterError,
+    SetRespUpdatedInstanceFailure,
+    SetRespUpdatedInstanceResult,
+    SetRespUpdatedObjectResult,
+    SetRespUpdatedObjectResultOperationStatus,
+    SetRespUpdatedObjectResultOperationStatusOperationFailure,
+    SetRespUpdatedObjectResultOperationStatusOperationSuccess,
 )
 from ee_smarthub.proto.usp_record import (
     NoSessionContextRecord,
@@ -27,24 +76,23 @@ from ee_smarthub.proto.usp_record import (
 )
 
 
-def _build_response_bytes(
-    path_results: list[GetRespRequestedPathResult],
-) -> bytes:
-    """Build a complete Record-framed USP GetResp from path results."""
-    get_resp = GetResp(req_path_results=path_results)
-    response = Response(get_resp=get_resp)
-    body = Body(response=response)
-    header = Header(msg_id="test-1", msg_type=HeaderMsgType.GET_RESP)
-    msg = Msg(header=header, body=body)
-    msg_bytes = bytes(msg)
-    record = Record(
+def _msg_record(msg: Msg) -> bytes:
+    """Frame a Msg in a NoSessionContext Record from the Agent."""
+    return bytes(Record(
         version="1.4",
         to_id="controller",
         from_id="agent",
         payload_security=RecordPayloadSecurity.PLAINTEXT,
-        no_session_context=NoSessionContextRecord(payload=msg_bytes),
-    )
-    return bytes(record)
+        no_session_context=NoSessionContextRecord(payload=bytes(msg)),
+    ))
+
+
+def _build_response_bytes(
+    path_results: list[GetRespRequestedPathResult],
+) -> bytes:
+    """Build a complete Record-framed USP GetResp from path results."""
+    body = Body(response=Response(get_resp=GetResp(req_path_results=path_results)))
+    return _msg_record(Msg(header=Header(msg_id="test-1", msg_type=HeaderMsgType.GET_RESP), body=body))
 
 
 def _host_path_result(
@@ -148,6 +196,27 @@ def test_params_to_host_empty_mac():
     assert _params_to_host({"PhysAddress": ""}) is None
 
 
+def test_params_to_host_active_true():
+    host = _params_to_host({"PhysAddress": "AA:BB:CC:DD:EE:FF", "Active": "true"})
+    assert host is not None
+    assert host.active is True
+
+
+def test_parse_ignores_paths_outside_host_table():
+    data = _build_response_bytes([
+        GetRespRequestedPathResult(
+            requested_path="Device.",
+            resolved_path_results=[
+                GetRespResolvedPathResult(resolved_path="Device.Hosts.", result_params={"HostNumberOfEntries": "1"}),
+                GetRespResolvedPathResult(resolved_path="Device.Hosts.Host.x.", result_params={"PhysAddress": "AA"}),
+                _host_path_result(12, {"PhysAddress": "AA:BB"}),
+                _host_path_result(12, {"BytesSent": "5"}, "WANStats."),
+            ],
+        ),
+    ])
+    assert parse_get_response(data) == [Host(mac_address="AA:BB", bytes_sent=5)]
+
+
 def test_params_to_host_inactive():
     host = _params_to_host({"PhysAddress": "AA:BB:CC:DD:EE:FF", "Active": "0"})
     assert host is not None
@@ -318,6 +387,78 @@ def test_parse_missing_no_session_context():
         parse_get_response(bytes(record))
 
 
+def test_build_get_request_multiple_paths():
+    data = build_get_request(
+        "agent", "controller", ["Device.Hosts.Host.[Active==true].", "Device.DeviceInfo."]
+    )
+    msg = Msg().parse(Record().parse(data).no_session_context.payload)
+    assert msg.body.request.get.param_paths == [
+        "Device.Hosts.Host.[Active==true].",
+        "Device.DeviceInfo.",
+    ]
+
+
+def test_parse_get_params_merges_by_object():
+    data = _build_response_bytes([
+        GetRespRequestedPathResult(
+            requested_path="Device.Hosts.Host.1.HostName",
+            resolved_path_results=[_host_path_result(1, {"HostName": "laptop"})],
+        ),
+        GetRespRequestedPathResult(
+            requested_path="Device.Hosts.Host.1.",
+            resolved_path_results=[
+                _host_path_result(1, {"PhysAddress": "AA:BB"}),
+                _host_path_result(1, {"BytesSent": "12"}, "WANStats."),
+            ],
+        ),
+    ])
+    assert parse_get_params(data) == {
+        "Device.Hosts.Host.1.": {"HostName": "laptop", "PhysAddress": "AA:BB"},
+        "Device.Hosts.Host.1.WANStats.": {"BytesSent": "12"},
+    }
+
+
+def test_iter_get_response_yields_each_resolved_path():
+    data = _build_response_bytes([
+        GetRespRequestedPathResult(
+            requested_path="Device.Hosts.Host.",
+            resolved_path_results=[
+                _host_path_result(1, {"PhysAddress": "AA:BB", "HostName": "laptop"}),
+                _host_path_result(1, {"BytesSent": "12"}, "WANStats."),
+            ],
+        ),
+    ])
+    assert list(iter_get_response(data)) == [
+        ("Device.Hosts.Host.1.", {"PhysAddress": "AA:BB", "HostName": "laptop"}),
+        ("Device.Hosts.Host.1.WANStats.", {"BytesSent": "12"}),
+    ]
+
+
+def test_iter_get_response_raises_at_failed_path():
+    data = _build_response_bytes([
+        GetRespRequestedPathResult(
+            requested_path="Device.Hosts.",
+            resolved_path_results=[_host_path_result(1, {"PhysAddress": "AA:BB"})],
+        ),
+        GetRespRequestedPathResult(requested_path="Device.Nope.", err_code=7026, err_msg="Invalid path"),
+    ])
+    results = iter_get_response(data)
+    assert next(results)[0] == "Device.Hosts.Host.1."
+    with pytest.raises(ProtocolError, match="USP error 7026: Invalid path"):
+        next(results)
+
+
+def test_parse_truncated_response():
+    data = _build_response_bytes([
+        GetRespRequestedPathResult(
+            requested_path="Device.Hosts.Host.",
+            resolved_path_results=[_host_path_result(1, {"PhysAddress": "AA:BB"})],
+        ),
+    ])
+    with pytest.raises(ProtocolError, match="Malformed"):
+        parse_get_response(data[:-3])
+
+
 def test_parse_missing_get_resp():
     """Response with body but no get_resp should raise ProtocolError."""
     body = Body(response=Response())
@@ -332,3 +473,380 @@ def test_parse_missing_get_resp():
     )
     with pytest.raises(ProtocolError, match="missing expected get_resp"):
         parse_get_response(bytes(record))
+
+
+# --- build_set_request ---
+
+
+def _set_response_bytes(obj_results: list[SetRespUpdatedObjectResult]) -> bytes:
+    body = Body(response=Response(set_resp=SetResp(updated_obj_results=obj_results)))
+    return _msg_record(Msg(header=Header(msg_id="test-1", msg_type=HeaderMsgType.SET_RESP), body=body))
+
+
+def test_build_set_request_groups_by_object():
+    data = build_set_request(
+        to_id="os::012345-SERIAL",
+        from_id="usp-gui-admin",
+        updates={
+            "Device.Hosts.Host.1.X_BT-COM_UserHostName": "Kitchen",
+            "Device.Hosts.Host.2.X_BT-COM_UserHostName": "Lounge",
+            "Device.Hosts.Host.1.HostName": "kitchen",
+        },
+        allow_partial=True,
+    )
+    record = Record().parse(data)
+    msg = Msg().parse(record.no_session_context.payload)
+
+    assert msg.header.msg_type == HeaderMsgType.SET
+    set_ = msg.body.request.set
+    assert set_.allow_partial is True
+    assert [obj.obj_path for obj in set_.update_objs] == [
+        "Device.Hosts.Host.1.",
+        "Device.Hosts.Host.2.",
+    ]
+    first = set_.update_objs[0].param_settings
+    assert [(p.param, p.value, p.required) for p in first] == [
+        ("X_BT-COM_UserHostName", "Kitchen", True),
+        ("HostName", "kitchen", True),
+    ]
+
+
+def test_build_set_request_rejects_object_path():
+    with pytest.raises(ValueError, match="Not a parameter path"):
+        build_set_request("agent", "controller", {"Device.Hosts.Host.1.": "x"})
+
+
+# --- parse_set_response ---
+
+
+def test_parse_set_response_success():
+    data = _set_response_bytes([
+        SetRespUpdatedObjectResult(
+            requested_path="Device.Hosts.Host.1.",
+            oper_status=SetRespUpdatedObjectResultOperationStatus(
+                oper_success=SetRespUpdatedObjectResultOperationStatusOperationSuccess(
+                    updated_inst_results=[
+                        SetRespUpdatedInstanceResult(
+                            affected_path="Device.Hosts.Host.1.",
+                            updated_params={"X_BT-COM_UserHostName": "Kitchen"},
+                        ),
+                    ],
+                ),
+            ),
+        ),
+    ])
+    results = parse_set_response(data, {"Device.Hosts.Host.1.X_BT-COM_UserHostName": "Kitchen"})
+    assert results == [
+        ParameterResult("Device.Hosts.Host.1.X_BT-COM_UserHostName", True, "Kitchen"),
+    ]
+
+
+def test_parse_set_response_partial_failure():
+    data = _set_response_bytes([
+        SetRespUpdatedObjectResult(
+            requested_path="Device.Hosts.Host.2.",
+            oper_status=SetRespUpdatedObjectResultOperationStatus(
+                oper_failure=SetRespUpdatedObjectResultOperationStatusOperationFailure(
+                    err_code=7004,
+                    err_msg="Invalid arguments",
+                    updated_inst_failures=[
+                        SetRespUpdatedInstanceFailure(
+                            affected_path="Device.Hosts.Host.2.",
+                            param_errs=[
+                                SetRespParameterError(
+                                    param="HostName", err_code=7011, err_msg="Invalid value"
+                                ),
+                            ],
+                        ),
+                    ],
+                ),
+            ),
+        ),
+    ])
+    results = parse_set_response(data, {"Device.Hosts.Host.2.HostName": ""})
+    assert results == [
+        ParameterResult("Device.Hosts.Host.2.HostName", False, err_code=7011, err_msg="Invalid value"),
+    ]
+
+
+def test_parse_set_response_failure_without_details():
+    data = _set_response_bytes([
+        SetRespUpdatedObjectResult(
+            requested_path="Device.Hosts.Host.9.",
+            oper_status=SetRespUpdatedObjectResultOperationStatus(
+                oper_failure=SetRespUpdatedObjectResultOperationStatusOperationFailure(
+                    err_code=7016, err_msg="Object does not exist",
+                ),
+            ),
+        ),
+    ])
+    updates = {
+        "Device.Hosts.Host.9.HostName": "a",
+        "Device.Hosts.Host.9.WANStats.BytesSent": "0",
+        "Device.Hosts.Host.1.HostName": "b",
+    }
+    results = parse_set_response(data, updates)
+    assert results == [
+        ParameterResult("Device.Hosts.Host.9.HostName", False, err_code=7016, err_msg="Object does not exist"),
+    ]
+
+
+def test_parse_set_response_error_lists_params():
+    body = Body(error=Error(
+        err_code=7004,
+        err_msg="Invalid arguments",
+        param_errs=[ErrorParamError(param_path="Device.Hosts.Host.1.HostName", err_code=7011, err_msg="Bad")],
+    ))
+    header = Header(msg_id="test-1", msg_type=HeaderMsgType.ERROR)
+    record = Record(
+        version="1.4",
+        to_id="controller",
+        from_id="agent",
+        payload_security=RecordPayloadSecurity.PLAINTEXT,
+        no_session_context=NoSessionContextRecord(payload=bytes(Msg(header=header, body=body))),
+    )
+    with pytest.raises(ProtocolError, match="Device.Hosts.Host.1.HostName: 7011 Bad"):
+        parse_set_response(bytes(record), {})
+
+
+def test_parse_set_response_missing_set_resp():
+    with pytest.raises(ProtocolError, match="missing expected set_resp"):
+        parse_set_response(_build_response_bytes([]), {})
+
+
+# --- Add / Delete ---
+
+
+def _add_response_bytes(results: list[AddRespCreatedObjectResult]) -> bytes:
+    body = Body(response=Response(add_resp=AddResp(created_obj_results=results)))
+    return _msg_record(Msg(header=Header(msg_id="test-1", msg_type=HeaderMsgType.ADD_RESP), body=body))
+
+
+def _delete_response_bytes(results: list[DeleteRespDeletedObjectResult]) -> bytes:
+    body = Body(response=Response(delete_resp=DeleteResp(deleted_obj_results=results)))
+    return _msg_record(Msg(header=Header(msg_id="test-1", msg_type=HeaderMsgType.DELETE_RESP), body=body))
+
+
+def test_build_add_request_batches_objects():
+    data = build_add_request(
+        "agent",
+        "controller",
+        [
+            ("Device.NAT.PortMapping.", {"ExternalPort": "8080", "InternalPort": "80"}),
+            ("Device.NAT.PortMapping.", {"ExternalPort": "2222"}),
+        ],
+        allow_partial=True,
+    )
+    msg = Msg().parse(Record().parse(data).no_session_context.payload)
+
+    assert msg.header.msg_type == HeaderMsgType.ADD
+    add = msg.body.request.add
+    assert add.allow_partial is True
+    assert [obj.obj_path for obj in add.create_objs] == ["Device.NAT.PortMapping."] * 2
+    assert [(p.param, p.value, p.required) for p in add.create_objs[0].param_settings] == [
+        ("ExternalPort", "8080", True),
+        ("InternalPort", "80", True),
+    ]
+
+
+def test_parse_add_response():
+    data = _add_response_bytes([
+        AddRespCreatedObjectResult(
+            requested_path="Device.NAT.PortMapping.",
+            oper_status=AddRespCreatedObjectResultOperationStatus(
+                oper_success=AddRespCreatedObjectResultOperationStatusOperationSuccess(
+                    instantiated_path="Device.NAT.PortMapping.4.",
+                    unique_keys={"Alias": "cpe-4"},
+                    param_errs=[AddRespParameterError(param="Description", err_code=7012, err_msg="Not writable")],
+                ),
+            ),
+        ),
+        AddRespCreatedObjectResult(
+            requested_path="Device.NAT.PortMapping.",
+            oper_status=AddRespCreatedObjectResultOperationStatus(
+                oper_failure=AddRespCreatedObjectResultOperationStatusOperationFailure(
+                    err_code=7019, err_msg="Resources exceeded",
+                ),
+            ),
+        ),
+    ])
+
+    assert parse_add_response(data) == [
+        AddResult(
+            "Device.NAT.PortMapping.",
+            True,
+            "Device.NAT.PortMapping.4.",
+            {"Alias": "cpe-4"},
+            [ParameterResult("Device.NAT.PortMapping.4.Description", False, err_code=7012, err_msg="Not writable")],
+        ),
+        AddResult("Device.NAT.PortMapping.", False, err_code=7019, err_msg="Resources exceeded"),
+    ]
+
+
+def test_parse_add_response_missing_oper_status():
+    data = _add_response_bytes([
+        AddRespCreatedObjectResult(requested_path="Device.NAT.PortMapping."),
+    ])
+    with pytest.raises(ProtocolError, match="missing oper_status"):
+        parse_add_response(data)
+
+
+def test_parse_add_response_missing_add_resp():
+    with pytest.raises(ProtocolError, match="missing expected add_resp"):
+        parse_add_response(_build_response_bytes([]))
+
+
+def test_build_delete_request():
+    data = build_delete_request(
+        "agent", "controller", ["Device.NAT.PortMapping.4.", "Device.NAT.PortMapping.5."]
+    )
+    msg = Msg().parse(Record().parse(data).no_session_context.payload)
+
+    assert msg.header.msg_type == HeaderMsgType.DELETE
+    assert msg.body.request.delete.allow_partial is False
+    assert msg.body.request.delete.obj_paths == [
+        "Device.NAT.PortMapping.4.",
+        "Device.NAT.PortMapping.5.",
+    ]
+
+
+def test_parse_delete_response():
+    data = _delete_response_bytes([
+        DeleteRespDeletedObjectResult(
+            requested_path="Device.NAT.PortMapping.[Enable==false].",
+            oper_status=DeleteRespDeletedObjectResultOperationStatus(
+                oper_success=DeleteRespDeletedObjectResultOperationStatusOperationSuccess(
+                    affected_paths=["Device.NAT.PortMapping.4."],
+                    unaffected_path_errs=[DeleteRespUnaffectedPathError(
+                        unaffected_path="Device.NAT.PortMapping.5.", err_code=7015, err_msg="Not deletable",
+                    )],
+                ),
+            ),
+        ),
+        DeleteRespDeletedObjectResult(
+            requested_path="Device.NAT.PortMapping.9.",
+            oper_status=DeleteRespDeletedObjectResultOperationStatus(
+                oper_failure=DeleteRespDeletedObjectResultOperationStatusOperationFailure(
+                    err_code=7016, err_msg="Object does not exist",
+                ),
+            ),
+        ),
+    ])
+
+    assert parse_delete_response(data) == [
+        DeleteResult(
+            "Device.NAT.PortMapping.[Enable==false].",
+            True,
+            ["Device.NAT.PortMapping.4."],
+            [ParameterResult("Device.NAT.PortMapping.5.", False, err_code=7015, err_msg="Not deletable")],
+        ),
+        DeleteResult("Device.NAT.PortMapping.9.", False, err_code=7016, err_msg="Object does not exist"),
+    ]
+
+
+def test_parse_delete_response_missing_delete_resp():
+    with pytest.raises(ProtocolError, match="missing expected delete_resp"):
+        parse_delete_response(_build_response_bytes([]))
+
+
+# --- Operate / Notify ---
+
+
+def _operate_response_bytes(results: list[OperateRespOperationResult]) -> bytes:
+    body = Body(response=Response(operate_resp=OperateResp(operation_results=results)))
+    return _msg_record(Msg(header=Header(msg_id="op-1", msg_type=HeaderMsgType.OPERATE_RESP), body=body))
+
+
+def _notify_bytes(notify: Notify, msg_id: str = "notify-1") -> bytes:
+    body = Body(request=Request(notify=notify))
+    return _msg_record(Msg(header=Header(msg_id=msg_id, msg_type=HeaderMsgType.NOTIFY), body=body))
+
+
+def test_build_operate_request():
+    data = build_operate_request(
+        "agent", "controller", "Device.IP.Diagnostics.IPPing()", {"Host": "1.1.1.1"}, "key-1"
+    )
+    msg = Msg().parse(Record().parse(data).no_session_context.payload)
+
+    assert msg.header.msg_type == HeaderMsgType.OPERATE
+    operate = msg.body.request.operate
+    assert operate.command == "Device.IP.Diagnostics.IPPing()"
+    assert operate.command_key == "key-1"
+    assert operate.send_resp is True
+    assert operate.input_args == {"Host": "1.1.1.1"}
+
+
+def test_parse_operate_response_sync_and_async():
+    data = _operate_response_bytes([
+        OperateRespOperationResult(
+            executed_command="Device.Reboot()",
+            req_output_args=OperateRespOperationResultOutputArgs(output_args={"Status": "ok"}),
+        ),
+        OperateRespOperationResult(
+            executed_command="Device.IP.Diagnostics.IPPing()",
+            req_obj_path="Device.LocalAgent.Request.1",
+        ),
+    ])
+    assert parse_operate_response(data, "key-1") == [
+        OperationResult("Device.Reboot()", "key-1", output_args={"Status": "ok"}),
+        OperationResult("Device.IP.Diagnostics.IPPing()", "key-1", completed=False),
+    ]
+
+
+def test_parse_operate_response_command_failure():
+    data = _operate_response_bytes([
+        OperateRespOperationResult(
+            executed_command="Device.Reboot()",
+            cmd_failure=OperateRespOperationResultCommandFailure(err_code=7022, err_msg="Command failure"),
+        ),
+    ])
+    with pytest.raises(ProtocolError, match="Device.Reboot\\(\\) failed: USP error 7022"):
+        parse_operate_response(data, "key-1")
+
+
+def test_parse_notify_operation_complete():
+    data = _notify_bytes(Notify(
+        subscription_id="sub-1",
+        send_resp=True,
+        oper_complete=NotifyOperationComplete(
+            obj_path="Device.IP.Diagnostics.",
+            command_name="IPPing()",
+            command_key="key-1",
+            req_output_args=NotifyOperationCompleteOutputArgs(output_args={"AverageResponseTime": "12"}),
+        ),
+    ))
+    msg_id, notify = parse_notify(data)
+
+    assert msg_id == "notify-1"
+    assert notify.send_resp is True
+    assert operation_complete_result(notify) == OperationResult(
+        "Device.IP.Diagnostics.IPPing()", "key-1", output_args={"AverageResponseTime": "12"}
+    )
+
+
+def test_operation_complete_failure():
+    notify = Notify(oper_complete=NotifyOperationComplete(
+        obj_path="Device.IP.Diagnostics.",
+        command_name="IPPing()",
+        command_key="key-1",
+        cmd_failure=NotifyOperationCompleteCommandFailure(err_code=7022, err_msg="Unreachable"),
+    ))
+    with pytest.raises(ProtocolError, match="Unreachable"):
+        operation_complete_result(notify)
+
+
+def test_operation_complete_other_notification():
+    assert operation_complete_result(Notify(subscription_id="sub-1")) is None
+
+
+def test_parse_notify_ignores_responses():
+    assert parse_notify(_build_response_bytes([])) is None
+
+
+def test_build_notify_response():
+    data = build_notify_response("agent", "controller", "notify-1", "sub-1")
+    msg = Msg().parse(Record().parse(data).no_session_context.payload)
+
+    assert msg.header.msg_id == "notify-1"
+    assert msg.header.msg_type == HeaderMsgType.NOTIFY_RESP
+    assert msg.body.response.notify_resp.subscription_id == "sub-1"
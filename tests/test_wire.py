@@ -0,0 +1,88 @@
+import pytest
+
+from ee_smarthub._usp import build_get_request
+from ee_smarthub._wire import (
+    frame_record,
+    get_field,
+    iter_fields,
+    peek_header,
+    read_string_pair,
+    read_varint,
+    record_msg,
+)
+from ee_smarthub.proto.usp import HeaderMsgType, Msg
+from ee_smarthub.proto.usp_record import NoSessionContextRecord, Record, RecordPayloadSecurity
+
+
+def test_read_varint():
+    assert read_varint(b"\x96\x01", 0) == (150, 2)
+    assert read_varint(b"\x00\x01", 1) == (1, 2)
+
+
+def test_iter_fields():
+    # field 1 varint 150, field 2 bytes "hi"
+    fields = list(iter_fields(b"\x08\x96\x01\x12\x02hi"))
+    assert fields[0] == (1, 150)
+    assert fields[1][0] == 2
+    assert bytes(fields[1][1]) == b"hi"
+
+
+def test_iter_fields_truncated():
+    with pytest.raises(ValueError):
+        list(iter_fields(b"\x12\x05hi"))
+
+
+def test_get_field_missing():
+    assert get_field(b"\x08\x01", 2) is None
+
+
+def test_peek_header():
+    data = build_get_request("agent", "controller", "Device.Hosts.Host.")
+    msg = Msg().parse(Record().parse(data).no_session_context.payload)
+
+    assert peek_header(data) == (msg.header.msg_id, HeaderMsgType.GET)
+
+
+def test_peek_header_not_a_record():
+    assert peek_header(b"\x01\x02\x03") is None
+    assert peek_header(b"") is None
+
+
+@pytest.mark.parametrize(
+    "entry",
+    [
+        b"\x0a\x02ok\x12\x03yes",  # short key then value
+        b"\x12\x03yes\x0a\x02ok",  # value first
+        b"\x0a\x02ok\x12\x03yes\x18\x01",  # unknown trailing field
+    ],
+)
+def test_read_string_pair(entry):
+    assert read_string_pair(memoryview(entry)) == ("ok", "yes")
+
+
+def test_read_string_pair_long_value():
+    value = "x" * 200
+    entry = b"\x0a\x01k\x12\xc8\x01" + value.encode()
+    assert read_string_pair(memoryview(entry)) == ("k", value)
+
+
+def test_read_string_pair_empty_value():
+    assert read_string_pair(memoryview(b"\x0a\x01k")) == ("k", "")
+
+
+@pytest.mark.parametrize("payload", [b"", b"\x0a\x02hi", b"x" * 300])
+def test_frame_record_matches_generated_encoding(payload):
+    expected = Record(
+        version="1.4",
+        to_id="os::012345-ABC123",
+        from_id="self::controller",
+        payload_security=RecordPayloadSecurity.PLAINTEXT,
+        no_session_context=NoSessionContextRecord(payload=payload),
+    )
+    data = frame_record("os::012345-ABC123", "self::controller", payload)
+    assert data == bytes(expected)
+    assert bytes(record_msg(data) or b"") == payload
+
+
+def test_record_msg_of_other_record():
+    assert record_msg(bytes(Record(version="1.4"))) is None